@@ -0,0 +1,346 @@
+"""
+JSON REST API under /api/v1 for the seven models.
+
+Every resource has the same five routes:
+
+    GET    /api/v1/<resource>          keyset-paginated list (cursor, limit)
+    POST   /api/v1/<resource>          create from a JSON object
+    GET    /api/v1/<resource>/<key>    one record
+    PATCH  /api/v1/<resource>/<key>    update the fields given in a JSON object
+    DELETE /api/v1/<resource>/<key>    delete
+
+Records are the model's columns (never users.password). Writes go through
+the ORM like the HTML views, so the earnings summary, dashboard counts,
+entity cache, search index and appointment conflict checks all apply.
+Errors come back as {"error": message} with a 400, 404 or 409 status.
+
+Appointments and applications also take batches: POST (create) or PATCH
+(update by key) /api/v1/<resource>/bulk with a JSON array of objects or a
+text/csv body. Rows that fail validation are returned as {"row", "error"}
+entries while the rest are written.
+
+The views share the request session of the HTML views (app.get_db(),
+reached through current_app.extensions). It is closed in the app teardown, before the WSGI server sends the response body, so a slow
+client never holds a pooled connection while it reads.
+"""
+
+import csv
+import io
+from datetime import date, time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from flask import Blueprint, current_app, request, jsonify, abort, url_for
+from sqlalchemy import Integer, Numeric, Date, Time
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import HTTPException
+from models import User, Caregiver, Member, Address, Job, JobApplication, Appointment
+from pagination import paginate
+from cache import CACHED_MODELS, get_entity
+from availability import ensure_available, ScheduleConflict, BLOCKING_STATUSES
+from export import json_value
+from bulk import (BulkResult, BULK_MAX_ROWS, create_appointments, update_appointments,
+                  create_applications, update_applications)
+
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+
+def get_db():
+    """The current request's session, opened and closed by app.py"""
+    return current_app.extensions['get_db']()
+
+
+class Resource:
+    """How a model is exposed: URL key, list order and writable fields"""
+
+    def __init__(self, name, model, url_key, list_key, create_fields, update_fields):
+        self.name = name
+        self.model = model
+        self.url_key = url_key              # columns in the record URL
+        self.list_key = list_key            # unique columns the list is paginated by
+        self.create_fields = create_fields
+        self.update_fields = update_fields
+
+    @property
+    def rule(self):
+        return f'/{self.name}' + ''.join(f'/<int:{column.key}>' for column in self.url_key)
+
+
+RESOURCES = {resource.name: resource for resource in (
+    Resource('users', User, [User.user_id], [User.user_id],
+             ['email', 'given_name', 'surname', 'city', 'phone_number', 'profile_description', 'password'],
+             ['email', 'given_name', 'surname', 'city', 'phone_number', 'profile_description', 'password']),
+    Resource('caregivers', Caregiver, [Caregiver.caregiver_user_id], [Caregiver.caregiver_user_id],
+             ['caregiver_user_id', 'photo', 'gender', 'caregiving_type', 'hourly_rate'],
+             ['photo', 'gender', 'caregiving_type', 'hourly_rate']),
+    Resource('members', Member, [Member.member_user_id], [Member.member_user_id],
+             ['member_user_id', 'house_rules', 'dependent_description'],
+             ['house_rules', 'dependent_description']),
+    # Like the HTML views, an address is addressed by its member
+    Resource('addresses', Address, [Address.member_user_id],
+             [Address.member_user_id, Address.house_number, Address.street, Address.town],
+             ['member_user_id', 'house_number', 'street', 'town'],
+             ['house_number', 'street', 'town']),
+    Resource('jobs', Job, [Job.job_id], [Job.job_id],
+             ['member_user_id', 'required_caregiving_type', 'other_requirements', 'date_posted'],
+             ['required_caregiving_type', 'other_requirements', 'date_posted']),
+    Resource('applications', JobApplication,
+             [JobApplication.caregiver_user_id, JobApplication.job_id],
+             [JobApplication.caregiver_user_id, JobApplication.job_id],
+             ['caregiver_user_id', 'job_id', 'date_applied'],
+             ['date_applied']),
+    Resource('appointments', Appointment, [Appointment.appointment_id], [Appointment.appointment_id],
+             ['caregiver_user_id', 'member_user_id', 'appointment_date', 'appointment_time', 'work_hours', 'status'],
+             ['appointment_date', 'appointment_time', 'work_hours', 'status']),
+)}
+
+
+# ==================== SERIALIZATION ====================
+
+def to_json(obj):
+    """Column values of a model instance, JSON-ready (dates ISO formatted, decimals as strings)"""
+    record = {}
+    for column in obj.__table__.columns:
+        if column.key == 'password':
+            continue
+        value = getattr(obj, column.key)
+        record[column.key] = json_value(value) if isinstance(value, (date, time, Decimal)) else value
+    return record
+
+
+def parse_value(column, value):
+    """Convert a JSON value for `column`; raises ValueError when it does not fit"""
+    if value is None:
+        if not column.nullable:
+            raise ValueError(f'{column.key} is required')
+        return None
+    if isinstance(column.type, Integer):
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(f'{column.key} must be an integer')
+        return int(value)
+    if isinstance(column.type, Numeric):
+        try:
+            number = Decimal(str(value))
+        except InvalidOperation:
+            raise ValueError(f'{column.key} must be a number')
+        if not number.is_finite():
+            raise ValueError(f'{column.key} must be a finite number')
+        return number
+    if isinstance(column.type, Date):
+        return date.fromisoformat(str(value))
+    if isinstance(column.type, Time):
+        return time.fromisoformat(str(value))
+    if not isinstance(value, str):
+        raise ValueError(f'{column.key} must be a string')
+    return value
+
+
+def parse_fields(resource, data, allowed, required):
+    """Parsed fields of one JSON object; raises ValueError for unknown, missing or malformed fields"""
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    unknown = set(data) - set(allowed)
+    if unknown:
+        raise ValueError(f'Unknown or read-only fields: {", ".join(sorted(unknown))}')
+    columns = resource.model.__table__.columns
+    missing = [name for name in allowed if name in required and name not in data]
+    if missing:
+        raise ValueError(f'Missing fields: {", ".join(missing)}')
+    if 'password' in data and not (isinstance(data['password'], str) and data['password']):
+        raise ValueError('password must be a non-empty string')
+    return {name: value if name == 'password' else parse_value(columns[name], value)
+            for name, value in data.items()}
+
+
+def read_fields(resource, allowed, required):
+    """Parsed fields of the JSON request body (400 for unknown, missing or malformed fields)"""
+    try:
+        return parse_fields(resource, request.get_json(silent=True), allowed, required)
+    except ValueError as e:
+        abort(400, str(e))
+
+
+def read_rows():
+    """Objects of a JSON array body, or of a text/csv body with a header line (empty cells are left out)"""
+    if request.mimetype == 'text/csv':
+        reader = csv.DictReader(io.StringIO(request.get_data(as_text=True)), restkey='(unnamed columns)')
+        rows = [{name: value for name, value in row.items() if value not in (None, '')}
+                for row in islice(reader, BULK_MAX_ROWS + 1)]
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            abort(400, 'Expected a JSON array or a text/csv body')
+    if len(rows) > BULK_MAX_ROWS:
+        abort(413, f'At most {BULK_MAX_ROWS} rows per request')
+    return rows
+
+
+def required_fields(resource):
+    """Create fields the database has no value for (NOT NULL, no default)"""
+    columns = resource.model.__table__.columns
+    return {name for name in resource.create_fields
+            if name == 'password' or (not columns[name].nullable and columns[name].default is None)}
+
+
+# ==================== HELPERS ====================
+
+def lookup(db, resource, keys):
+    """The record at `keys`, or abort(404)"""
+    if resource.model in CACHED_MODELS:
+        obj = get_entity(db, resource.model, keys[resource.url_key[0].key])
+    else:
+        obj = db.query(resource.model).filter_by(**keys).first()
+    if obj is None:
+        abort(404, 'Record not found')
+    return obj
+
+
+def apply_fields(obj, fields):
+    for name, value in fields.items():
+        if name == 'password':
+            obj.set_password(value)
+        else:
+            setattr(obj, name, value)
+
+
+def check_schedule(db, appointment):
+    """409 if a blocking appointment overlaps another booking of its caregiver"""
+    if appointment.status not in BLOCKING_STATUSES:
+        return
+    try:
+        ensure_available(db, appointment.caregiver_user_id, appointment.appointment_date,
+                         appointment.appointment_time, appointment.work_hours,
+                         exclude_appointment_id=appointment.appointment_id)
+    except ValueError as e:
+        db.rollback()
+        abort(409 if isinstance(e, ScheduleConflict) else 400, str(e))
+
+
+def commit(db, write=None):
+    """Run write(db), if given, then commit, turning constraint violations
+    (duplicates, missing references) from either into 409
+    """
+    try:
+        result = write(db) if write else None
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        abort(409, str(e.orig))
+    return result
+
+
+def record_url(resource, obj):
+    return url_for(f'api_v1.{resource.name}_get',
+                   **{column.key: getattr(obj, column.key) for column in resource.url_key})
+
+
+# ==================== VIEWS ====================
+
+def list_records(resource):
+    db = get_db()
+    try:
+        page = paginate(db.query(resource.model), resource.list_key,
+                        cursor=request.args.get('cursor'),
+                        limit=request.args.get('limit', type=int))
+    except ValueError as e:
+        abort(400, str(e))
+    return jsonify({
+        'items': [to_json(obj) for obj in page.items],
+        'limit': page.limit,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    })
+
+
+def create_record(resource):
+    db = get_db()
+    fields = read_fields(resource, resource.create_fields, required_fields(resource))
+    obj = resource.model()
+    apply_fields(obj, fields)
+    if resource.model is Appointment:
+        check_schedule(db, obj)
+    db.add(obj)
+    commit(db)
+    response = jsonify(to_json(obj))
+    response.status_code = 201
+    response.headers['Location'] = record_url(resource, obj)
+    return response
+
+
+def get_record(resource, **keys):
+    return jsonify(to_json(lookup(get_db(), resource, keys)))
+
+
+def update_record(resource, **keys):
+    db = get_db()
+    obj = lookup(db, resource, keys)
+    fields = read_fields(resource, resource.update_fields, ())
+    apply_fields(obj, fields)
+    if resource.model is Appointment:
+        check_schedule(db, obj)
+    commit(db)
+    return jsonify(to_json(obj))
+
+
+def delete_record(resource, **keys):
+    db = get_db()
+    db.delete(lookup(db, resource, keys))
+    commit(db)
+    return '', 204
+
+
+def bulk_write(resource, write, allowed, required, written):
+    """Validate and write a batch of rows, reporting the rejected ones by row number (from 1)"""
+    db = get_db()
+    rows, errors = [], []
+    for number, data in enumerate(read_rows(), 1):
+        try:
+            rows.append((number, parse_fields(resource, data, allowed, required)))
+        except ValueError as e:
+            errors.append((number, str(e)))
+    # The INSERT/UPDATE runs in write(): a row taken since validation fails there, not at commit
+    result = commit(db, lambda db: write(db, rows)) if rows else BulkResult([], [])
+    names = [column.key for column in resource.url_key]
+    return jsonify({
+        written: [dict(zip(names, key if isinstance(key, tuple) else (key,))) for key in result.written],
+        'errors': [{'row': number, 'error': message}
+                   for number, message in sorted(errors + result.errors)],
+    })
+
+
+def bulk_create(resource, write):
+    return bulk_write(resource, write, resource.create_fields, required_fields(resource), 'created')
+
+
+def bulk_update(resource, write):
+    keys = [column.key for column in resource.url_key]
+    return bulk_write(resource, write, keys + resource.update_fields, keys, 'updated')
+
+
+for _resource in RESOURCES.values():
+    _defaults = {'resource': _resource}
+    api.add_url_rule(f'/{_resource.name}', f'{_resource.name}_list', list_records,
+                     defaults=_defaults, methods=['GET'])
+    api.add_url_rule(f'/{_resource.name}', f'{_resource.name}_create', create_record,
+                     defaults=_defaults, methods=['POST'])
+    api.add_url_rule(_resource.rule, f'{_resource.name}_get', get_record,
+                     defaults=_defaults, methods=['GET'])
+    api.add_url_rule(_resource.rule, f'{_resource.name}_update', update_record,
+                     defaults=_defaults, methods=['PATCH'])
+    api.add_url_rule(_resource.rule, f'{_resource.name}_delete', delete_record,
+                     defaults=_defaults, methods=['DELETE'])
+
+# Batches of rows, validated together and written in one transaction (bulk.py)
+for _name, _create, _update in (('appointments', create_appointments, update_appointments),
+                                ('applications', create_applications, update_applications)):
+    api.add_url_rule(f'/{_name}/bulk', f'{_name}_bulk_create', bulk_create,
+                     defaults={'resource': RESOURCES[_name], 'write': _create}, methods=['POST'])
+    api.add_url_rule(f'/{_name}/bulk', f'{_name}_bulk_update', bulk_update,
+                     defaults={'resource': RESOURCES[_name], 'write': _update}, methods=['PATCH'])
+
+
+@api.errorhandler(HTTPException)
+def json_error(e):
+    """Errors under /api/v1 as {"error": message} instead of HTML pages"""
+    response = jsonify({'error': e.description})
+    response.status_code = e.code
+    return response
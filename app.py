@@ -1,16 +1,58 @@
+import hmac
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, request, redirect, url_for, flash, abort, jsonify, g, Response, stream_with_context
 from datetime import datetime, date, time
-from database import SessionLocal
+from decimal import Decimal, InvalidOperation
+from database import SessionLocal, pool_stats
+from pagination import paginate, clamp_limit
 from models import User, Caregiver, Member, Address, Job, JobApplication, Appointment
 from sqlalchemy import desc
+from queries import appointment_details_query, application_details_query, top_earners
+import earnings  # registers the flush listeners that maintain caregiver_earnings
+from stats import dashboard_stats
+from cache import entity_cache, get_entity
+from matching import match_caregivers, MATCH_WEIGHTS, DEFAULT_MATCH_LIMIT, MAX_MATCH_LIMIT
+from search import search, SEARCH_KINDS, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from export import export_chunks, EXPORTS, EXPORT_FORMATS
+from api import api
+import instrumentation
+import nplusone
+from instrumentation import metrics_text, slow_query_log
+from availability import (ensure_available, conflicts, free_caregivers,
+                          BLOCKING_STATUSES, DEFAULT_FREE_LIMIT, MAX_FREE_LIMIT)
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 
 # Database session helper
 def get_db():
-    return SessionLocal()
+    """Return the session for the current request, creating it on first use"""
+    if 'db' not in g:
+        g.db = SessionLocal()
+    return g.db
+
+@app.teardown_appcontext
+def close_db(exception=None):
+    """Roll back on error and release the request's session, if one was opened"""
+    db = g.pop('db', None)
+    if db is not None:
+        if exception is not None:
+            db.rollback()
+        db.close()
+
+app.extensions['get_db'] = get_db      # the /api/v1 blueprint shares the request session
+app.register_blueprint(api)
+instrumentation.init_app(app)
+nplusone.init_app(app)
+
+def paginate_request(query, key_columns):
+    """Keyset-paginate a list query using the cursor/limit request arguments"""
+    try:
+        return paginate(query, key_columns,
+                        cursor=request.args.get('cursor'),
+                        limit=request.args.get('limit', type=int))
+    except ValueError:
+        abort(400)
 
 # ==================== HOME & DASHBOARD ====================
 
@@ -18,16 +60,219 @@ def get_db():
 def index():
     """Home page with statistics"""
     db = get_db()
+    stats, estimated = dashboard_stats.get(db)
+    return render_template('index.html', stats=stats, estimated=estimated)
+
+@app.route('/search')
+def search_page():
+    """Full-text search over job requirements, profiles and house rules"""
+    db = get_db()
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('kind') or None
+    if kind is not None and kind not in SEARCH_KINDS:
+        abort(400)
+    limit = min(max(request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), 1), MAX_SEARCH_LIMIT)
+    results = search(db, query, kinds=(kind,) if kind else SEARCH_KINDS, limit=limit) if query else []
+    return render_template('search.html', query=query, kind=kind, kinds=SEARCH_KINDS, results=results)
+
+# ==================== ADMIN ====================
+
+def require_admin_token():
+    """Reject the request (403) unless its X-Admin-Token header matches ADMIN_TOKEN
+
+    Fails closed: with no ADMIN_TOKEN configured every request is rejected,
+    except when the app runs in debug mode.
+    """
+    token = os.getenv('ADMIN_TOKEN')
+    if not token:
+        if app.debug:
+            return
+        abort(403)
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), token.encode()):
+        abort(403)
+
+@app.route('/admin/pool')
+def admin_pool():
+    """Connection pool statistics as JSON"""
+    require_admin_token()
+    return jsonify(pool_stats())
+
+@app.route('/admin/cache')
+def admin_cache():
+    """Entity cache hit/miss counters as JSON"""
+    require_admin_token()
+    return jsonify(entity_cache.stats())
+
+@app.route('/admin/slow-queries')
+def admin_slow_queries():
+    """Statements slower than SLOW_QUERY_MS, grouped by normalized SQL, as JSON"""
+    require_admin_token()
+    return jsonify(slow_query_log.snapshot())
+
+@app.route('/metrics')
+def metrics():
+    """Per-endpoint request, SQL and render timings in the Prometheus text format"""
+    require_admin_token()
+    return Response(metrics_text(), mimetype='text/plain; version=0.0.4')
+
+# ==================== API ====================
+
+def date_arg(name):
+    """Optional YYYY-MM-DD query argument (400 when malformed)"""
+    value = request.args.get(name)
+    if not value:
+        return None
     try:
-        stats = {
-            'caregivers': db.query(Caregiver).count(),
-            'members': db.query(Member).count(),
-            'jobs': db.query(Job).count(),
-            'appointments': db.query(Appointment).count(),
-        }
-        return render_template('index.html', stats=stats)
-    finally:
-        db.close()
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400)
+
+@app.route('/api/top-earners')
+def api_top_earners():
+    """Caregivers earning above the average per appointment, as JSON
+
+    Query arguments: status (default accepted, 'all' for any), from/to
+    (appointment date range), type (caregiving type) and limit.
+    """
+    db = get_db()
+    status = request.args.get('status', 'accepted')
+    filters = {
+        'status': None if status == 'all' else status,
+        'date_from': date_arg('from'),
+        'date_to': date_arg('to'),
+        'caregiving_type': request.args.get('type') or None,
+    }
+    limit = clamp_limit(request.args.get('limit', type=int))
+    threshold, earners = top_earners(db, limit=limit, **filters)
+    return jsonify({
+        'filters': {key: value.isoformat() if isinstance(value, date) else value
+                    for key, value in filters.items()},
+        'threshold': threshold,
+        'caregivers': [earner._asdict() for earner in earners],
+    })
+
+def decimal_arg(name):
+    """Optional decimal query argument (400 when malformed or not finite)"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        abort(400)
+    # NaN cannot be compared (InvalidOperation) and no rate or length is infinite
+    if not number.is_finite():
+        abort(400)
+    return number
+
+@app.route('/api/jobs/<int:job_id>/matches')
+def api_job_matches(job_id):
+    """Caregivers ranked for a job, as JSON
+
+    Query arguments: min_rate / max_rate (hourly rate range) and limit.
+    """
+    db = get_db()
+    min_rate = decimal_arg('min_rate')
+    max_rate = decimal_arg('max_rate')
+    limit = min(request.args.get('limit', DEFAULT_MATCH_LIMIT, type=int), MAX_MATCH_LIMIT)
+    if limit < 1:
+        abort(400)
+    matches = match_caregivers(db, job_id, min_rate, max_rate, limit)
+    if matches is None:
+        abort(404)
+    return jsonify({
+        'job_id': job_id,
+        'weights': MATCH_WEIGHTS,
+        'caregivers': [match._asdict() for match in matches],
+    })
+
+def time_arg(name):
+    """Required HH:MM query argument (400 when missing or malformed)"""
+    try:
+        return datetime.strptime(request.args.get(name, ''), '%H:%M').time()
+    except ValueError:
+        abort(400)
+
+def booking_args():
+    """(date, time, hours) of the window in the date/time/hours query arguments"""
+    appointment_date = date_arg('date')
+    hours = decimal_arg('hours')
+    if appointment_date is None or hours is None:
+        abort(400)
+    return appointment_date, time_arg('time'), hours
+
+@app.route('/api/caregivers/<int:caregiver_id>/availability')
+def api_caregiver_availability(caregiver_id):
+    """Whether a caregiver is free for a booking, with any conflicting appointments
+
+    Query arguments: date (YYYY-MM-DD), time (HH:MM) and hours.
+    """
+    db = get_db()
+    if get_entity(db, Caregiver, caregiver_id) is None:
+        abort(404)
+    appointment_date, appointment_time, hours = booking_args()
+    try:
+        found = conflicts(db, caregiver_id, appointment_date, appointment_time, hours)
+    except ValueError:
+        abort(400)
+    return jsonify({
+        'caregiver_user_id': caregiver_id,
+        'available': not found,
+        'conflicts': [{
+            'appointment_id': row.appointment_id,
+            'appointment_date': row.appointment_date.isoformat(),
+            'appointment_time': row.appointment_time.strftime('%H:%M'),
+            'work_hours': row.work_hours,
+        } for row in found],
+    })
+
+@app.route('/api/availability')
+def api_free_caregivers():
+    """Caregivers free for a whole booking window, as JSON
+
+    Query arguments: date (YYYY-MM-DD), time (HH:MM), hours, type
+    (caregiving type) and limit.
+    """
+    db = get_db()
+    appointment_date, appointment_time, hours = booking_args()
+    limit = min(request.args.get('limit', DEFAULT_FREE_LIMIT, type=int), MAX_FREE_LIMIT)
+    if limit < 1:
+        abort(400)
+    try:
+        free = free_caregivers(db, appointment_date, appointment_time, hours,
+                               caregiving_type=request.args.get('type') or None, limit=limit)
+    except ValueError:
+        abort(400)
+    return jsonify({'caregivers': [caregiver._asdict() for caregiver in free]})
+
+# ==================== EXPORT ====================
+
+@app.route('/export/<entity>')
+def export(entity):
+    """Stream a whole table as CSV or JSON
+
+    Query arguments: format (csv or json), status (appointments), type
+    (caregiving type) and from/to (date range of appointments, jobs or
+    applications). Unsupported filters are rejected with 400.
+    """
+    require_admin_token()
+    if entity not in EXPORTS:
+        abort(404)
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    db = get_db()
+    try:
+        chunks = export_chunks(db, entity, fmt,
+                               status=request.args.get('status') or None,
+                               caregiving_type=request.args.get('type') or None,
+                               date_from=date_arg('from'),
+                               date_to=date_arg('to'))
+    except ValueError:
+        abort(400)
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/json'
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={entity}.{fmt}'})
 
 # ==================== USERS CRUD ====================
 
@@ -35,11 +280,8 @@ def index():
 def users_list():
     """List all users"""
     db = get_db()
-    try:
-        users = db.query(User).all()
-        return render_template('users/list.html', users=users)
-    finally:
-        db.close()
+    page = paginate_request(db.query(User), [User.user_id])
+    return render_template('users/list.html', users=page.items, page=page)
 
 @app.route('/users/create', methods=['GET', 'POST'])
 def users_create():
@@ -62,8 +304,6 @@ def users_create():
             return redirect(url_for('users_list'))
         except Exception as e:
             flash(f'Error creating user: {str(e)}', 'danger')
-        finally:
-            db.close()
     
     return render_template('users/create.html')
 
@@ -71,35 +311,32 @@ def users_create():
 def users_edit(user_id):
     """Edit a user"""
     db = get_db()
-    try:
-        user = db.query(User).filter(User.user_id == user_id).first()
-        if not user:
-            flash('User not found!', 'danger')
-            return redirect(url_for('users_list'))
-        
-        if request.method == 'POST':
-            user.email = request.form['email']
-            user.given_name = request.form['given_name']
-            user.surname = request.form['surname']
-            user.city = request.form['city']
-            user.phone_number = request.form['phone_number']
-            user.profile_description = request.form['profile_description']
-            if request.form['password']:
-                user.set_password(request.form['password'])
-            db.commit()
-            flash('User updated successfully!', 'success')
-            return redirect(url_for('users_list'))
-        
-        return render_template('users/edit.html', user=user)
-    finally:
-        db.close()
+    user = get_entity(db, User, user_id)
+    if not user:
+        flash('User not found!', 'danger')
+        return redirect(url_for('users_list'))
+    
+    if request.method == 'POST':
+        user.email = request.form['email']
+        user.given_name = request.form['given_name']
+        user.surname = request.form['surname']
+        user.city = request.form['city']
+        user.phone_number = request.form['phone_number']
+        user.profile_description = request.form['profile_description']
+        if request.form['password']:
+            user.set_password(request.form['password'])
+        db.commit()
+        flash('User updated successfully!', 'success')
+        return redirect(url_for('users_list'))
+    
+    return render_template('users/edit.html', user=user)
 
 @app.route('/users/<int:user_id>/delete', methods=['POST'])
 def users_delete(user_id):
     """Delete a user"""
     db = get_db()
     try:
-        user = db.query(User).filter(User.user_id == user_id).first()
+        user = get_entity(db, User, user_id)
         if user:
             db.delete(user)
             db.commit()
@@ -108,8 +345,6 @@ def users_delete(user_id):
             flash('User not found!', 'danger')
     except Exception as e:
         flash(f'Error deleting user: {str(e)}', 'danger')
-    finally:
-        db.close()
     return redirect(url_for('users_list'))
 
 # ==================== CAREGIVERS CRUD ====================
@@ -118,11 +353,8 @@ def users_delete(user_id):
 def caregivers_list():
     """List all caregivers"""
     db = get_db()
-    try:
-        caregivers = db.query(Caregiver, User).join(User).all()
-        return render_template('caregivers/list.html', caregivers=caregivers)
-    finally:
-        db.close()
+    page = paginate_request(db.query(Caregiver, User).join(User), [Caregiver.caregiver_user_id])
+    return render_template('caregivers/list.html', caregivers=page.items, page=page)
 
 @app.route('/caregivers/create', methods=['GET', 'POST'])
 def caregivers_create():
@@ -150,39 +382,34 @@ def caregivers_create():
     except Exception as e:
         flash(f'Error creating caregiver: {str(e)}', 'danger')
         return redirect(url_for('caregivers_list'))
-    finally:
-        db.close()
 
 @app.route('/caregivers/<int:caregiver_id>/edit', methods=['GET', 'POST'])
 def caregivers_edit(caregiver_id):
     """Edit a caregiver"""
     db = get_db()
-    try:
-        caregiver = db.query(Caregiver).filter(Caregiver.caregiver_user_id == caregiver_id).first()
-        if not caregiver:
-            flash('Caregiver not found!', 'danger')
-            return redirect(url_for('caregivers_list'))
-        
-        if request.method == 'POST':
-            caregiver.photo = request.form['photo']
-            caregiver.gender = request.form['gender']
-            caregiver.caregiving_type = request.form['caregiving_type']
-            caregiver.hourly_rate = request.form['hourly_rate']
-            db.commit()
-            flash('Caregiver updated successfully!', 'success')
-            return redirect(url_for('caregivers_list'))
-        
-        user = db.query(User).filter(User.user_id == caregiver.caregiver_user_id).first()
-        return render_template('caregivers/edit.html', caregiver=caregiver, user=user)
-    finally:
-        db.close()
+    caregiver = get_entity(db, Caregiver, caregiver_id)
+    if not caregiver:
+        flash('Caregiver not found!', 'danger')
+        return redirect(url_for('caregivers_list'))
+    
+    if request.method == 'POST':
+        caregiver.photo = request.form['photo']
+        caregiver.gender = request.form['gender']
+        caregiver.caregiving_type = request.form['caregiving_type']
+        caregiver.hourly_rate = request.form['hourly_rate']
+        db.commit()
+        flash('Caregiver updated successfully!', 'success')
+        return redirect(url_for('caregivers_list'))
+    
+    user = get_entity(db, User, caregiver.caregiver_user_id)
+    return render_template('caregivers/edit.html', caregiver=caregiver, user=user)
 
 @app.route('/caregivers/<int:caregiver_id>/delete', methods=['POST'])
 def caregivers_delete(caregiver_id):
     """Delete a caregiver"""
     db = get_db()
     try:
-        caregiver = db.query(Caregiver).filter(Caregiver.caregiver_user_id == caregiver_id).first()
+        caregiver = get_entity(db, Caregiver, caregiver_id)
         if caregiver:
             db.delete(caregiver)
             db.commit()
@@ -191,8 +418,6 @@ def caregivers_delete(caregiver_id):
             flash('Caregiver not found!', 'danger')
     except Exception as e:
         flash(f'Error deleting caregiver: {str(e)}', 'danger')
-    finally:
-        db.close()
     return redirect(url_for('caregivers_list'))
 
 # ==================== MEMBERS CRUD ====================
@@ -201,11 +426,8 @@ def caregivers_delete(caregiver_id):
 def members_list():
     """List all members"""
     db = get_db()
-    try:
-        members = db.query(Member, User).join(User).all()
-        return render_template('members/list.html', members=members)
-    finally:
-        db.close()
+    page = paginate_request(db.query(Member, User).join(User), [Member.member_user_id])
+    return render_template('members/list.html', members=page.items, page=page)
 
 @app.route('/members/create', methods=['GET', 'POST'])
 def members_create():
@@ -231,37 +453,32 @@ def members_create():
     except Exception as e:
         flash(f'Error creating member: {str(e)}', 'danger')
         return redirect(url_for('members_list'))
-    finally:
-        db.close()
 
 @app.route('/members/<int:member_id>/edit', methods=['GET', 'POST'])
 def members_edit(member_id):
     """Edit a member"""
     db = get_db()
-    try:
-        member = db.query(Member).filter(Member.member_user_id == member_id).first()
-        if not member:
-            flash('Member not found!', 'danger')
-            return redirect(url_for('members_list'))
-        
-        if request.method == 'POST':
-            member.house_rules = request.form['house_rules']
-            member.dependent_description = request.form['dependent_description']
-            db.commit()
-            flash('Member updated successfully!', 'success')
-            return redirect(url_for('members_list'))
-        
-        user = db.query(User).filter(User.user_id == member.member_user_id).first()
-        return render_template('members/edit.html', member=member, user=user)
-    finally:
-        db.close()
+    member = get_entity(db, Member, member_id)
+    if not member:
+        flash('Member not found!', 'danger')
+        return redirect(url_for('members_list'))
+    
+    if request.method == 'POST':
+        member.house_rules = request.form['house_rules']
+        member.dependent_description = request.form['dependent_description']
+        db.commit()
+        flash('Member updated successfully!', 'success')
+        return redirect(url_for('members_list'))
+    
+    user = get_entity(db, User, member.member_user_id)
+    return render_template('members/edit.html', member=member, user=user)
 
 @app.route('/members/<int:member_id>/delete', methods=['POST'])
 def members_delete(member_id):
     """Delete a member"""
     db = get_db()
     try:
-        member = db.query(Member).filter(Member.member_user_id == member_id).first()
+        member = get_entity(db, Member, member_id)
         if member:
             db.delete(member)
             db.commit()
@@ -270,8 +487,6 @@ def members_delete(member_id):
             flash('Member not found!', 'danger')
     except Exception as e:
         flash(f'Error deleting member: {str(e)}', 'danger')
-    finally:
-        db.close()
     return redirect(url_for('members_list'))
 
 # ==================== ADDRESSES CRUD ====================
@@ -280,13 +495,13 @@ def members_delete(member_id):
 def addresses_list():
     """List all addresses"""
     db = get_db()
-    try:
-        addresses = db.query(Address, User).join(
-            Member, Member.member_user_id == Address.member_user_id
-        ).join(User, User.user_id == Member.member_user_id).all()
-        return render_template('addresses/list.html', addresses=addresses)
-    finally:
-        db.close()
+    query = db.query(Address, User).join(
+        Member, Member.member_user_id == Address.member_user_id
+    ).join(User, User.user_id == Member.member_user_id)
+    page = paginate_request(query, [
+        Address.member_user_id, Address.house_number, Address.street, Address.town
+    ])
+    return render_template('addresses/list.html', addresses=page.items, page=page)
 
 @app.route('/addresses/create', methods=['GET', 'POST'])
 def addresses_create():
@@ -310,33 +525,28 @@ def addresses_create():
     except Exception as e:
         flash(f'Error creating address: {str(e)}', 'danger')
         return redirect(url_for('addresses_list'))
-    finally:
-        db.close()
 
 @app.route('/addresses/<int:member_id>/edit', methods=['GET', 'POST'])
 def addresses_edit(member_id):
     """Edit an address"""
     db = get_db()
-    try:
-        address = db.query(Address).filter(Address.member_user_id == member_id).first()
-        if not address:
-            flash('Address not found!', 'danger')
-            return redirect(url_for('addresses_list'))
-        
-        if request.method == 'POST':
-            address.house_number = request.form['house_number']
-            address.street = request.form['street']
-            address.town = request.form['town']
-            db.commit()
-            flash('Address updated successfully!', 'success')
-            return redirect(url_for('addresses_list'))
-        
-        member = db.query(Member, User).join(User).filter(
-            Member.member_user_id == address.member_user_id
-        ).first()
-        return render_template('addresses/edit.html', address=address, member=member)
-    finally:
-        db.close()
+    address = db.query(Address).filter(Address.member_user_id == member_id).first()
+    if not address:
+        flash('Address not found!', 'danger')
+        return redirect(url_for('addresses_list'))
+    
+    if request.method == 'POST':
+        address.house_number = request.form['house_number']
+        address.street = request.form['street']
+        address.town = request.form['town']
+        db.commit()
+        flash('Address updated successfully!', 'success')
+        return redirect(url_for('addresses_list'))
+    
+    member = db.query(Member, User).join(User).filter(
+        Member.member_user_id == address.member_user_id
+    ).first()
+    return render_template('addresses/edit.html', address=address, member=member)
 
 @app.route('/addresses/<int:member_id>/delete', methods=['POST'])
 def addresses_delete(member_id):
@@ -352,8 +562,6 @@ def addresses_delete(member_id):
             flash('Address not found!', 'danger')
     except Exception as e:
         flash(f'Error deleting address: {str(e)}', 'danger')
-    finally:
-        db.close()
     return redirect(url_for('addresses_list'))
 
 # ==================== JOBS CRUD ====================
@@ -362,13 +570,11 @@ def addresses_delete(member_id):
 def jobs_list():
     """List all jobs"""
     db = get_db()
-    try:
-        jobs = db.query(Job, User).join(
-            Member, Member.member_user_id == Job.member_user_id
-        ).join(User, User.user_id == Member.member_user_id).all()
-        return render_template('jobs/list.html', jobs=jobs)
-    finally:
-        db.close()
+    query = db.query(Job, User).join(
+        Member, Member.member_user_id == Job.member_user_id
+    ).join(User, User.user_id == Member.member_user_id)
+    page = paginate_request(query, [Job.job_id])
+    return render_template('jobs/list.html', jobs=page.items, page=page)
 
 @app.route('/jobs/create', methods=['GET', 'POST'])
 def jobs_create():
@@ -392,40 +598,35 @@ def jobs_create():
     except Exception as e:
         flash(f'Error creating job: {str(e)}', 'danger')
         return redirect(url_for('jobs_list'))
-    finally:
-        db.close()
 
 @app.route('/jobs/<int:job_id>/edit', methods=['GET', 'POST'])
 def jobs_edit(job_id):
     """Edit a job"""
     db = get_db()
-    try:
-        job = db.query(Job).filter(Job.job_id == job_id).first()
-        if not job:
-            flash('Job not found!', 'danger')
-            return redirect(url_for('jobs_list'))
-        
-        if request.method == 'POST':
-            job.required_caregiving_type = request.form['required_caregiving_type']
-            job.other_requirements = request.form['other_requirements']
-            job.date_posted = datetime.strptime(request.form['date_posted'], '%Y-%m-%d').date()
-            db.commit()
-            flash('Job updated successfully!', 'success')
-            return redirect(url_for('jobs_list'))
-        
-        member = db.query(Member, User).join(User).filter(
-            Member.member_user_id == job.member_user_id
-        ).first()
-        return render_template('jobs/edit.html', job=job, member=member)
-    finally:
-        db.close()
+    job = get_entity(db, Job, job_id)
+    if not job:
+        flash('Job not found!', 'danger')
+        return redirect(url_for('jobs_list'))
+    
+    if request.method == 'POST':
+        job.required_caregiving_type = request.form['required_caregiving_type']
+        job.other_requirements = request.form['other_requirements']
+        job.date_posted = datetime.strptime(request.form['date_posted'], '%Y-%m-%d').date()
+        db.commit()
+        flash('Job updated successfully!', 'success')
+        return redirect(url_for('jobs_list'))
+    
+    member = db.query(Member, User).join(User).filter(
+        Member.member_user_id == job.member_user_id
+    ).first()
+    return render_template('jobs/edit.html', job=job, member=member)
 
 @app.route('/jobs/<int:job_id>/delete', methods=['POST'])
 def jobs_delete(job_id):
     """Delete a job"""
     db = get_db()
     try:
-        job = db.query(Job).filter(Job.job_id == job_id).first()
+        job = get_entity(db, Job, job_id)
         if job:
             db.delete(job)
             db.commit()
@@ -434,8 +635,6 @@ def jobs_delete(job_id):
             flash('Job not found!', 'danger')
     except Exception as e:
         flash(f'Error deleting job: {str(e)}', 'danger')
-    finally:
-        db.close()
     return redirect(url_for('jobs_list'))
 
 # ==================== JOB APPLICATIONS CRUD ====================
@@ -444,19 +643,11 @@ def jobs_delete(job_id):
 def applications_list():
     """List all job applications"""
     db = get_db()
-    try:
-        applications = db.query(JobApplication).all()
-        app_details = []
-        for app in applications:
-            caregiver_user = db.query(User).filter(
-                User.user_id == app.caregiver_user_id
-            ).first()
-            job = db.query(Job).filter(Job.job_id == app.job_id).first()
-            app_details.append((app, caregiver_user, job))
-        
-        return render_template('applications/list.html', applications=app_details)
-    finally:
-        db.close()
+    # Same single-statement query as report 8
+    query = application_details_query(db)
+    page = paginate_request(query, [JobApplication.caregiver_user_id, JobApplication.job_id])
+    
+    return render_template('applications/list.html', applications=page.items, page=page)
 
 @app.route('/applications/create', methods=['GET', 'POST'])
 def applications_create():
@@ -480,39 +671,32 @@ def applications_create():
     except Exception as e:
         flash(f'Error creating application: {str(e)}', 'danger')
         return redirect(url_for('applications_list'))
-    finally:
-        db.close()
 
 @app.route('/applications/<int:caregiver_id>/<int:job_id>/edit', methods=['GET', 'POST'])
 def applications_edit(caregiver_id, job_id):
     """Edit a job application"""
     db = get_db()
-    try:
-        application = db.query(JobApplication).filter(
-            JobApplication.caregiver_user_id == caregiver_id,
-            JobApplication.job_id == job_id
-        ).first()
-        if not application:
-            flash('Job application not found!', 'danger')
-            return redirect(url_for('applications_list'))
-        
-        if request.method == 'POST':
-            application.date_applied = datetime.strptime(request.form['date_applied'], '%Y-%m-%d').date()
-            db.commit()
-            flash('Job application updated successfully!', 'success')
-            return redirect(url_for('applications_list'))
-        
-        caregiver_user = db.query(User).filter(
-            User.user_id == application.caregiver_user_id
-        ).first()
-        job = db.query(Job).filter(Job.job_id == application.job_id).first()
-        
-        return render_template('applications/edit.html', 
-                             application=application,
-                             caregiver_user=caregiver_user,
-                             job=job)
-    finally:
-        db.close()
+    application = db.query(JobApplication).filter(
+        JobApplication.caregiver_user_id == caregiver_id,
+        JobApplication.job_id == job_id
+    ).first()
+    if not application:
+        flash('Job application not found!', 'danger')
+        return redirect(url_for('applications_list'))
+    
+    if request.method == 'POST':
+        application.date_applied = datetime.strptime(request.form['date_applied'], '%Y-%m-%d').date()
+        db.commit()
+        flash('Job application updated successfully!', 'success')
+        return redirect(url_for('applications_list'))
+    
+    caregiver_user = get_entity(db, User, application.caregiver_user_id)
+    job = get_entity(db, Job, application.job_id)
+    
+    return render_template('applications/edit.html', 
+                         application=application,
+                         caregiver_user=caregiver_user,
+                         job=job)
 
 @app.route('/applications/<int:caregiver_id>/<int:job_id>/delete', methods=['POST'])
 def applications_delete(caregiver_id, job_id):
@@ -531,8 +715,6 @@ def applications_delete(caregiver_id, job_id):
             flash('Job application not found!', 'danger')
     except Exception as e:
         flash(f'Error deleting application: {str(e)}', 'danger')
-    finally:
-        db.close()
     return redirect(url_for('applications_list'))
 
 # ==================== APPOINTMENTS CRUD ====================
@@ -541,21 +723,11 @@ def applications_delete(caregiver_id, job_id):
 def appointments_list():
     """List all appointments"""
     db = get_db()
-    try:
-        appointments = db.query(Appointment).all()
-        appt_details = []
-        for appt in appointments:
-            caregiver_user = db.query(User).filter(
-                User.user_id == appt.caregiver_user_id
-            ).first()
-            member_user = db.query(User).filter(
-                User.user_id == appt.member_user_id
-            ).first()
-            appt_details.append((appt, caregiver_user, member_user))
-        
-        return render_template('appointments/list.html', appointments=appt_details)
-    finally:
-        db.close()
+    # Same single-statement query as report 5.1
+    query = appointment_details_query(db)
+    page = paginate_request(query, [Appointment.appointment_id])
+    
+    return render_template('appointments/list.html', appointments=page.items, page=page)
 
 @app.route('/appointments/create', methods=['GET', 'POST'])
 def appointments_create():
@@ -564,13 +736,16 @@ def appointments_create():
     try:
         if request.method == 'POST':
             appointment = Appointment(
-                caregiver_user_id=request.form['caregiver_user_id'],
+                caregiver_user_id=int(request.form['caregiver_user_id']),
                 member_user_id=request.form['member_user_id'],
                 appointment_date=datetime.strptime(request.form['appointment_date'], '%Y-%m-%d').date(),
                 appointment_time=datetime.strptime(request.form['appointment_time'], '%H:%M').time(),
                 work_hours=request.form['work_hours'],
                 status=request.form['status']
             )
+            if appointment.status in BLOCKING_STATUSES:
+                ensure_available(db, appointment.caregiver_user_id, appointment.appointment_date,
+                                 appointment.appointment_time, appointment.work_hours)
             db.add(appointment)
             db.commit()
             flash('Appointment created successfully!', 'success')
@@ -582,43 +757,46 @@ def appointments_create():
     except Exception as e:
         flash(f'Error creating appointment: {str(e)}', 'danger')
         return redirect(url_for('appointments_list'))
-    finally:
-        db.close()
 
 @app.route('/appointments/<int:appointment_id>/edit', methods=['GET', 'POST'])
 def appointments_edit(appointment_id):
     """Edit an appointment"""
     db = get_db()
-    try:
-        appointment = db.query(Appointment).filter(
-            Appointment.appointment_id == appointment_id
-        ).first()
-        if not appointment:
-            flash('Appointment not found!', 'danger')
-            return redirect(url_for('appointments_list'))
-        
-        if request.method == 'POST':
-            appointment.appointment_date = datetime.strptime(request.form['appointment_date'], '%Y-%m-%d').date()
-            appointment.appointment_time = datetime.strptime(request.form['appointment_time'], '%H:%M').time()
-            appointment.work_hours = request.form['work_hours']
-            appointment.status = request.form['status']
-            db.commit()
-            flash('Appointment updated successfully!', 'success')
-            return redirect(url_for('appointments_list'))
-        
-        caregiver_user = db.query(User).filter(
-            User.user_id == appointment.caregiver_user_id
-        ).first()
-        member_user = db.query(User).filter(
-            User.user_id == appointment.member_user_id
-        ).first()
-        
-        return render_template('appointments/edit.html', 
-                             appointment=appointment, 
-                             caregiver=caregiver_user, 
-                             member=member_user)
-    finally:
-        db.close()
+    appointment = db.query(Appointment).filter(
+        Appointment.appointment_id == appointment_id
+    ).first()
+    if not appointment:
+        flash('Appointment not found!', 'danger')
+        return redirect(url_for('appointments_list'))
+    
+    if request.method == 'POST':
+        appointment_date = datetime.strptime(request.form['appointment_date'], '%Y-%m-%d').date()
+        appointment_time = datetime.strptime(request.form['appointment_time'], '%H:%M').time()
+        work_hours = request.form['work_hours']
+        status = request.form['status']
+        if status in BLOCKING_STATUSES:
+            try:
+                ensure_available(db, appointment.caregiver_user_id, appointment_date, appointment_time,
+                                 work_hours, exclude_appointment_id=appointment.appointment_id)
+            except ValueError as e:
+                db.rollback()
+                flash(f'Error updating appointment: {str(e)}', 'danger')
+                return redirect(url_for('appointments_edit', appointment_id=appointment_id))
+        appointment.appointment_date = appointment_date
+        appointment.appointment_time = appointment_time
+        appointment.work_hours = work_hours
+        appointment.status = status
+        db.commit()
+        flash('Appointment updated successfully!', 'success')
+        return redirect(url_for('appointments_list'))
+    
+    caregiver_user = get_entity(db, User, appointment.caregiver_user_id)
+    member_user = get_entity(db, User, appointment.member_user_id)
+    
+    return render_template('appointments/edit.html', 
+                         appointment=appointment, 
+                         caregiver=caregiver_user, 
+                         member=member_user)
 
 @app.route('/appointments/<int:appointment_id>/delete', methods=['POST'])
 def appointments_delete(appointment_id):
@@ -636,8 +814,6 @@ def appointments_delete(appointment_id):
             flash('Appointment not found!', 'danger')
     except Exception as e:
         flash(f'Error deleting appointment: {str(e)}', 'danger')
-    finally:
-        db.close()
     return redirect(url_for('appointments_list'))
 
 if __name__ == '__main__':
@@ -0,0 +1,152 @@
+"""
+Caregiver availability and appointment conflict checks.
+
+An appointment occupies [appointment_date + appointment_time, + work_hours).
+Pending and accepted appointments block the caregiver; declined ones do not.
+No appointment may last longer than MAX_APPOINTMENT_HOURS, so any booking
+that overlaps a window starts at most that long before the window does.
+
+Both questions therefore only read the blocking appointments that start in
+[window start - MAX_APPOINTMENT_HOURS, window end). For one caregiver that
+is a range seek on ix_appointments_caregiver_user_id_status_date. For every
+caregiver it is a range seek on ix_appointments_status_appointment_date. The
+exact intervals are then compared in Python. The cost depends on the
+bookings around the window, not on the length of a caregiver's history.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple
+from sqlalchemy import select
+from models import User, Caregiver, Appointment
+
+BLOCKING_STATUSES = ('pending', 'accepted')
+MAX_APPOINTMENT_HOURS = 24
+DEFAULT_FREE_LIMIT = 20
+MAX_FREE_LIMIT = 200
+
+
+class ScheduleConflict(ValueError):
+    """The caregiver already has a blocking appointment overlapping the requested window"""
+
+    def __init__(self, caregiver_user_id, conflicts):
+        self.caregiver_user_id = caregiver_user_id
+        self.conflicts = conflicts
+        ids = ', '.join(f'#{row.appointment_id}' for row in conflicts)
+        super().__init__(f'Caregiver {caregiver_user_id} is already booked at that time (appointment {ids})')
+
+
+class FreeCaregiver(NamedTuple):
+    caregiver_user_id: int
+    given_name: str
+    surname: str
+    city: str
+    caregiving_type: str
+    hourly_rate: Decimal
+
+
+def appointment_window(appointment_date, appointment_time, work_hours):
+    """(start, end) datetimes of a booking; raises ValueError for invalid work hours"""
+    try:
+        hours = Decimal(str(work_hours))
+    except InvalidOperation:
+        raise ValueError(f'Invalid work hours: {work_hours!r}')
+    # NaN cannot be compared (InvalidOperation), and infinity is never a valid length
+    if not hours.is_finite():
+        raise ValueError(f'Invalid work hours: {work_hours!r}')
+    if not 0 < hours <= MAX_APPOINTMENT_HOURS:
+        raise ValueError(f'Work hours must be more than 0 and at most {MAX_APPOINTMENT_HOURS}')
+    start = datetime.combine(appointment_date, appointment_time)
+    return start, start + timedelta(hours=float(hours))
+
+
+def _overlapping(db, start, end, caregiver_user_id=None, exclude_appointment_id=None):
+    """Blocking appointments overlapping [start, end), from the appointments starting near it"""
+    query = select(
+        Appointment.appointment_id,
+        Appointment.caregiver_user_id,
+        Appointment.appointment_date,
+        Appointment.appointment_time,
+        Appointment.work_hours
+    ).where(
+        Appointment.status.in_(BLOCKING_STATUSES),
+        Appointment.appointment_date.between(
+            (start - timedelta(hours=MAX_APPOINTMENT_HOURS)).date(), end.date()
+        )
+    )
+    if caregiver_user_id is not None:
+        query = query.where(Appointment.caregiver_user_id == caregiver_user_id)
+    if exclude_appointment_id is not None:
+        query = query.where(Appointment.appointment_id != exclude_appointment_id)
+
+    overlapping = []
+    for row in db.execute(query):
+        booked_start = datetime.combine(row.appointment_date, row.appointment_time)
+        booked_end = booked_start + timedelta(hours=float(row.work_hours))
+        if booked_start < end and start < booked_end:
+            overlapping.append(row)
+    return overlapping
+
+
+def conflicts(db, caregiver_user_id, appointment_date, appointment_time, work_hours,
+              exclude_appointment_id=None):
+    """Blocking appointments of the caregiver that overlap the requested booking"""
+    start, end = appointment_window(appointment_date, appointment_time, work_hours)
+    return _overlapping(db, start, end, caregiver_user_id, exclude_appointment_id)
+
+
+def is_available(db, caregiver_user_id, appointment_date, appointment_time, work_hours,
+                 exclude_appointment_id=None):
+    """True if the caregiver has no blocking appointment overlapping the booking"""
+    return not conflicts(db, caregiver_user_id, appointment_date, appointment_time, work_hours,
+                         exclude_appointment_id)
+
+
+def ensure_available(db, caregiver_user_id, appointment_date, appointment_time, work_hours,
+                     exclude_appointment_id=None):
+    """Raise ScheduleConflict if the booking overlaps one of the caregiver's appointments
+
+    The caregiver row is locked first (SELECT ... FOR UPDATE on PostgreSQL), so
+    two transactions booking the same caregiver are checked one after the
+    other. Call it in the transaction that saves the appointment.
+    """
+    db.execute(
+        select(Caregiver.caregiver_user_id)
+        .where(Caregiver.caregiver_user_id == caregiver_user_id)
+        .with_for_update()
+    )
+    found = conflicts(db, caregiver_user_id, appointment_date, appointment_time, work_hours,
+                      exclude_appointment_id)
+    if found:
+        raise ScheduleConflict(caregiver_user_id, found)
+
+
+def free_caregivers(db, appointment_date, appointment_time, work_hours, caregiving_type=None,
+                    limit=DEFAULT_FREE_LIMIT):
+    """Up to `limit` caregivers with no blocking appointment in the window
+
+    With a caregiving type the cheapest come first (read in order from
+    ix_caregivers_caregiving_type_hourly_rate); otherwise they are in id order.
+    """
+    start, end = appointment_window(appointment_date, appointment_time, work_hours)
+    busy = {row.caregiver_user_id for row in _overlapping(db, start, end)}
+
+    query = select(
+        Caregiver.caregiver_user_id,
+        User.given_name,
+        User.surname,
+        User.city,
+        Caregiver.caregiving_type,
+        Caregiver.hourly_rate
+    ).join(
+        User, User.user_id == Caregiver.caregiver_user_id
+    ).limit(limit + len(busy))
+    if caregiving_type is not None:
+        query = query.where(
+            Caregiver.caregiving_type == caregiving_type
+        ).order_by(Caregiver.hourly_rate, Caregiver.caregiver_user_id)
+    else:
+        query = query.order_by(Caregiver.caregiver_user_id)
+
+    free = [FreeCaregiver(*row) for row in db.execute(query) if row.caregiver_user_id not in busy]
+    return free[:limit]
@@ -0,0 +1,13 @@
+"""
+Performance benchmarks. Run each module from the project root, e.g.
+python -m benchmarks.indexes --users 100000
+
+Shared helpers (scratch dataset, statement counting, percentiles, query
+plans) are in benchmarks/common.py.
+"""
+
+import os
+
+# models.py imports the application engine; give it a scratch database when
+# nothing is configured so no benchmark ever needs a live DATABASE_URL.
+os.environ.setdefault('DATABASE_URL', 'sqlite:///benchmark.db')
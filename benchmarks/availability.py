@@ -0,0 +1,137 @@
+"""
+Availability benchmark: times conflicts() and free_caregivers() for random
+booking windows on a generated dataset. Each answer is checked against a
+brute-force version that reads every blocking appointment of the caregiver
+(or of everyone) and compares intervals in Python.
+
+Usage:
+    python -m benchmarks.availability --users 200000 --windows 50
+    python -m benchmarks.availability --users 1000000 --type Babysitter --explain
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from database import build_engine
+from init_db import SYNTHETIC_START_DATE, SYNTHETIC_DAYS
+from models import Caregiver, Appointment
+from availability import BLOCKING_STATUSES, MAX_APPOINTMENT_HOURS, appointment_window, conflicts, free_caregivers
+from benchmarks.common import StatementCounter, add_dataset_arguments, analyze, build_dataset, explain, percentile
+
+
+def _overlaps(row, start, end):
+    booked_start = datetime.combine(row.appointment_date, row.appointment_time)
+    return booked_start < end and start < booked_start + timedelta(hours=float(row.work_hours))
+
+
+def _blocking(caregiver_user_id=None):
+    query = select(
+        Appointment.appointment_id, Appointment.caregiver_user_id, Appointment.appointment_date,
+        Appointment.appointment_time, Appointment.work_hours
+    ).where(Appointment.status.in_(BLOCKING_STATUSES))
+    if caregiver_user_id is not None:
+        query = query.where(Appointment.caregiver_user_id == caregiver_user_id)
+    return query
+
+
+def brute_force_conflicts(db, caregiver_user_id, start, end):
+    """Ids of the caregiver's overlapping appointments, from their whole history"""
+    return sorted(row.appointment_id for row in db.execute(_blocking(caregiver_user_id))
+                  if _overlaps(row, start, end))
+
+
+def brute_force_free(db, start, end, caregiving_type, limit):
+    """Ids of the first `limit` free caregivers, checking every blocking appointment"""
+    busy = {row.caregiver_user_id for row in db.execute(_blocking()) if _overlaps(row, start, end)}
+    query = select(Caregiver.caregiver_user_id)
+    if caregiving_type is not None:
+        query = query.where(Caregiver.caregiving_type == caregiving_type).order_by(
+            Caregiver.hourly_rate, Caregiver.caregiver_user_id)
+    else:
+        query = query.order_by(Caregiver.caregiver_user_id)
+    return [cid for cid in db.scalars(query) if cid not in busy][:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_dataset_arguments(parser, users=200000)
+    parser.add_argument('--windows', type=int, default=25, help='random booking windows to check')
+    parser.add_argument('--type', help='caregiving type for the free-caregiver search')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--explain', action='store_true', help='print the plans of the window scans')
+    args = parser.parse_args()
+
+    engine = build_engine(args.url)
+    build_dataset(engine, args.users, args.seed)
+    with engine.begin() as conn:
+        analyze(conn)
+
+    counter = StatementCounter(engine)
+    rng = random.Random(args.seed)
+    timings = {name: [] for name in ('conflicts', 'conflicts (full history)',
+                                     'free_caregivers', 'free (full scan)')}
+    statements = {'conflicts': [], 'free_caregivers': []}
+    with Session(bind=engine) as db:
+        appointments = db.scalar(select(func.count()).select_from(Appointment))
+        # Windows are placed on existing appointments so that some of them conflict
+        max_id = db.scalar(select(func.max(Appointment.appointment_id)))
+        for _ in range(args.windows):
+            booked = db.get(Appointment, rng.randint(1, max_id))
+            if booked is None:
+                continue
+            window_date = booked.appointment_date + timedelta(days=rng.choice((-1, 0, 0, 1)))
+            window_time = (datetime.combine(window_date, booked.appointment_time)
+                           + timedelta(minutes=rng.choice((-120, -30, 0, 60, 180)))).time()
+            hours = Decimal(rng.choice(('1.5', '3', '6', '12')))
+            window = appointment_window(window_date, window_time, hours)
+
+            counter.count = 0
+            t = time.perf_counter()
+            found = conflicts(db, booked.caregiver_user_id, window_date, window_time, hours)
+            timings['conflicts'].append((time.perf_counter() - t) * 1000)
+            statements['conflicts'].append(counter.count)
+            t = time.perf_counter()
+            expected = brute_force_conflicts(db, booked.caregiver_user_id, *window)
+            timings['conflicts (full history)'].append((time.perf_counter() - t) * 1000)
+            if sorted(row.appointment_id for row in found) != expected:
+                raise SystemExit(f'Conflict mismatch for caregiver {booked.caregiver_user_id} at {window}')
+
+            counter.count = 0
+            t = time.perf_counter()
+            free = free_caregivers(db, window_date, window_time, hours, args.type, args.limit)
+            timings['free_caregivers'].append((time.perf_counter() - t) * 1000)
+            statements['free_caregivers'].append(counter.count)
+            t = time.perf_counter()
+            expected = brute_force_free(db, *window, args.type, args.limit)
+            timings['free (full scan)'].append((time.perf_counter() - t) * 1000)
+            if [c.caregiver_user_id for c in free] != expected:
+                raise SystemExit(f'Free caregiver mismatch at {window}')
+
+        print(f'{appointments} appointments, {len(timings["conflicts"])} windows '
+              f'({SYNTHETIC_DAYS} days from {SYNTHETIC_START_DATE}); every answer matched the brute force\n')
+        print(f'{"check":<26} {"median ms":>10} {"p95 ms":>10} {"statements":>11}')
+        print('-' * 60)
+        for name, values in timings.items():
+            count = statistics.median(statements[name]) if name in statements else ''
+            print(f'{name:<26} {statistics.median(values):>10.2f} {percentile(values, 0.95):>10.2f} {count:>11}')
+
+        if args.explain:
+            lo = SYNTHETIC_START_DATE
+            hi = lo + timedelta(hours=MAX_APPOINTMENT_HOURS)
+            for label, stmt in (('One caregiver', _blocking(1)), ('All caregivers', _blocking())):
+                stmt = stmt.where(Appointment.appointment_date.between(lo, hi))
+                print(f'\n{label} window scan:')
+                for line in explain(db.connection(), stmt):
+                    print(f'  {line}')
+
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Bulk booking benchmark: creates a batch of appointments with
+bulk.create_appointments() and, for comparison, one row at a time the way the
+appointments_create form does (look up the caregiver and member, check the
+schedule, add, flush). Some rows are made invalid on purpose (unknown
+caregiver, overlapping bookings), and both paths must reject the same rows.
+Each run happens in its own transaction, which is rolled back afterwards.
+
+Usage:
+    python -m benchmarks.bulk --users 200000 --rows 5000
+    python -m benchmarks.bulk --url postgresql://localhost/bench --rows 20000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from database import build_engine
+from init_db import SYNTHETIC_START_DATE, SYNTHETIC_DAYS
+from models import Caregiver, Member, Appointment
+from availability import BLOCKING_STATUSES, ensure_available
+from bulk import create_appointments
+from benchmarks.common import StatementCounter, add_dataset_arguments, analyze, build_dataset
+
+
+def make_rows(db, count, rng):
+    """[(row number, fields)] of random bookings, about 1 in 20 with an unknown caregiver"""
+    caregivers = list(db.scalars(select(Caregiver.caregiver_user_id)))
+    members = list(db.scalars(select(Member.member_user_id)))
+    missing = max(caregivers) + 1
+    rows = []
+    for number in range(1, count + 1):
+        start = datetime.combine(SYNTHETIC_START_DATE, datetime.min.time()) + timedelta(
+            days=rng.randrange(SYNTHETIC_DAYS), hours=rng.randrange(7, 20))
+        rows.append((number, {
+            'caregiver_user_id': missing if rng.random() < 0.05 else rng.choice(caregivers),
+            'member_user_id': rng.choice(members),
+            'appointment_date': start.date(),
+            'appointment_time': start.time(),
+            'work_hours': Decimal(rng.choice(('1.5', '2', '3', '4', '8'))),
+            'status': rng.choice(('pending', 'accepted', 'accepted', 'declined')),
+        }))
+    return rows
+
+
+def one_by_one(db, rows):
+    """Row numbers rejected when every row is checked and inserted on its own"""
+    rejected = []
+    for number, fields in rows:
+        if db.get(Caregiver, fields['caregiver_user_id']) is None or db.get(Member, fields['member_user_id']) is None:
+            rejected.append(number)
+            continue
+        appointment = Appointment(**fields)
+        if appointment.status in BLOCKING_STATUSES:
+            try:
+                ensure_available(db, appointment.caregiver_user_id, appointment.appointment_date,
+                                 appointment.appointment_time, appointment.work_hours)
+            except ValueError:
+                rejected.append(number)
+                continue
+        db.add(appointment)
+        db.flush()
+    return rejected
+
+
+def in_bulk(db, rows):
+    return [number for number, message in create_appointments(db, rows).errors]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_dataset_arguments(parser, users=200000)
+    parser.add_argument('--rows', type=int, default=5000, help='appointments per batch')
+    args = parser.parse_args()
+
+    engine = build_engine(args.url)
+    build_dataset(engine, args.users, args.seed)
+    with engine.begin() as conn:
+        analyze(conn)
+
+    counter = StatementCounter(engine)
+    with Session(bind=engine) as db:
+        rows = make_rows(db, args.rows, random.Random(args.seed))
+        appointments = db.scalar(select(func.count()).select_from(Appointment))
+
+    results = {}
+    for name, fn in (('one by one', one_by_one), ('bulk', in_bulk)):
+        with Session(bind=engine, autoflush=False) as db:
+            counter.count = 0
+            start = time.perf_counter()
+            rejected = fn(db, rows)
+            elapsed = time.perf_counter() - start
+            results[name] = rejected
+            print(f'{name:<12} {elapsed * 1000:>10.1f} ms {args.rows / elapsed:>10.0f} rows/s '
+                  f'{counter.count:>8} statements {len(rejected):>6} rejected')
+            db.rollback()
+
+    if results['one by one'] != results['bulk']:
+        raise SystemExit('The two paths rejected different rows')
+    print(f'\n{args.rows} rows against {appointments} appointments; both paths rejected the same rows')
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
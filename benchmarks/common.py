@@ -0,0 +1,75 @@
+"""
+Helpers shared by the benchmarks: the scratch database and its synthetic
+dataset, statement counting, percentiles and query plans.
+"""
+
+import time
+from sqlalchemy import event, text
+from init_db import generate_synthetic_data
+from models import Base
+
+SCRATCH_URL = 'sqlite:///benchmark.db'
+
+
+def add_dataset_arguments(parser, users=100000):
+    """--url, --users and --seed of the benchmarks that build their own dataset
+
+    users=None leaves out --users, for a benchmark that takes several sizes.
+    """
+    parser.add_argument('--url', default=SCRATCH_URL, help='scratch database (tables are dropped!)')
+    if users is not None:
+        parser.add_argument('--users', type=int, default=users, help='about half become caregivers')
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def secondary_indexes():
+    return [index for table in Base.metadata.sorted_tables for index in table.indexes]
+
+
+def build_dataset(engine, users, seed, indexes=True):
+    """Recreate every table at `engine` and load a synthetic dataset; returns rows loaded per table
+
+    With indexes=False the secondary indexes are dropped before loading.
+    """
+    print(f'Building dataset with {users} users at {engine.url!r}...')
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    if not indexes:
+        for index in secondary_indexes():
+            index.drop(bind=engine)
+    start = time.perf_counter()
+    loaded = generate_synthetic_data(users=users, seed=seed, bind=engine)
+    print(f'Loaded in {time.perf_counter() - start:.1f}s\n')
+    return loaded
+
+
+def analyze(conn):
+    """Refresh planner statistics (PostgreSQL and SQLite)"""
+    if conn.dialect.name in ('postgresql', 'sqlite'):
+        conn.execute(text('ANALYZE'))
+
+
+def explain(conn, stmt):
+    """Return the query plan for stmt as a list of lines"""
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    if conn.dialect.name == 'sqlite':
+        return [row[-1] for row in conn.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+    if conn.dialect.name == 'postgresql':
+        return [row[0] for row in conn.execute(text(f'EXPLAIN (ANALYZE, BUFFERS) {sql}'))]
+    return [str(row) for row in conn.execute(text(f'EXPLAIN {sql}'))]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class StatementCounter:
+    """Counts statements sent to the database through an engine"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
@@ -0,0 +1,116 @@
+"""
+HTML vs JSON load test: compares the throughput of the /api/v1 JSON routes
+with the HTML list and edit pages that clients used to scrape. Both are
+synchronous views on the same engine and request session: the API has no
+async engine, so this measures rendering and payload size, not async against
+sync.
+
+Each scenario is a pair of equivalent requests, e.g. the first page of
+/users against /api/v1/users. For every request in the pair, --concurrency
+threads send it in a loop for --duration seconds. The test reports requests
+per second, latency percentiles and response size.
+
+By default the app is served in-process (threaded werkzeug server) against
+DATABASE_URL; pass --base-url to load a running deployment instead (e.g.
+gunicorn).
+
+Usage:
+    DATABASE_URL=sqlite:///benchmark.db python -m benchmarks.html_vs_api --users 100000
+    python -m benchmarks.html_vs_api --base-url http://localhost:8000 --concurrency 32 --duration 20
+"""
+
+import argparse
+import logging
+import statistics
+import threading
+import time
+from urllib.request import urlopen
+
+from benchmarks.common import percentile
+
+SCENARIOS = [
+    ('users page', '/users?limit={limit}', '/api/v1/users?limit={limit}'),
+    ('jobs page', '/jobs?limit={limit}', '/api/v1/jobs?limit={limit}'),
+    ('appointments page', '/appointments?limit={limit}', '/api/v1/appointments?limit={limit}'),
+    ('one user', '/users/{id}/edit', '/api/v1/users/{id}'),
+    ('one job', '/jobs/{id}/edit', '/api/v1/jobs/{id}'),
+]
+
+
+def hammer(url, concurrency, duration):
+    """(latencies in ms, total bytes, errors) from `concurrency` threads requesting `url`"""
+    latencies, sizes, errors = [], [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                with urlopen(url, timeout=30) as response:
+                    body = response.read()
+            except OSError as e:
+                with lock:
+                    errors.append(e)
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+                sizes.append(len(body))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(sizes), len(errors)
+
+
+def serve_in_process():
+    """Start app.py on a free local port in a background thread; returns (base_url, server)"""
+    from werkzeug.serving import make_server
+    from app import app
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no per-request access log
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', help='load a running server instead of serving app.py in-process')
+    parser.add_argument('--users', type=int, help='first rebuild DATABASE_URL with this many synthetic users (drops it!)')
+    parser.add_argument('--concurrency', type=int, default=16, help='client threads per request')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per request')
+    parser.add_argument('--limit', type=int, default=50, help='page size of the list requests')
+    parser.add_argument('--id', type=int, default=1, help='record id for the single-record requests')
+    args = parser.parse_args()
+
+    if args.users:
+        from init_db import init_synthetic_database
+        init_synthetic_database(users=args.users)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        base_url, server = serve_in_process()
+    print(f'Loading {base_url} with {args.concurrency} threads for {args.duration:g}s per request\n')
+
+    print(f'{"scenario":<18} {"route":<6} {"req/s":>9} {"median ms":>10} {"p95 ms":>9} {"KB/resp":>8} {"errors":>7}')
+    print('-' * 73)
+    for name, html, json_route in SCENARIOS:
+        for label, route in (('html', html), ('api', json_route)):
+            url = base_url + route.format(limit=args.limit, id=args.id)
+            latencies, total_bytes, errors = hammer(url, args.concurrency, args.duration)
+            if not latencies:
+                print(f'{name:<18} {label:<6} {"all requests failed":>36} {errors:>7}')
+                continue
+            print(f'{name:<18} {label:<6} {len(latencies) / args.duration:>9.1f} '
+                  f'{statistics.median(latencies):>10.2f} {percentile(latencies, 0.95):>9.2f} '
+                  f'{total_bytes / len(latencies) / 1024:>8.1f} {errors:>7}')
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Index benchmark: runs the queries.py filter/join workload against a large
+synthetic dataset, first without and then with the secondary indexes declared
+in models.py, and reports timings and EXPLAIN plans for both.
+
+Usage:
+    python -m benchmarks.indexes --url sqlite:///benchmark.db --users 200000
+"""
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy import exists, select, func
+from database import build_engine
+from models import User, Caregiver, Address, Job, JobApplication, Appointment
+from benchmarks.common import add_dataset_arguments, analyze, build_dataset, explain, secondary_indexes
+
+
+def workload(users):
+    """The filters and joins issued by queries.py and the app's list/edit views"""
+    first_member_id = users // 2 + 1
+    caregiver_user = User.__table__.alias('caregiver_user')
+    return {
+        '3.1 user by name': select(User).where(User.given_name == 'Arman', User.surname == 'Armanov'),
+        '4.2 addresses on street': select(Address.member_user_id).where(Address.street == 'Kabanbay Batyr'),
+        '5.1 accepted appointments': select(Appointment.appointment_id, caregiver_user.c.given_name)
+            .join(caregiver_user, caregiver_user.c.user_id == Appointment.caregiver_user_id)
+            .where(Appointment.status == 'accepted'),
+        '5.3 babysitter hours': select(Appointment.appointment_id, Appointment.work_hours)
+            .join(Caregiver, Caregiver.caregiver_user_id == Appointment.caregiver_user_id)
+            .where(Caregiver.caregiving_type == 'Babysitter'),
+        '5.4 Astana elderly-care members': select(User.user_id)
+            .where(User.city == 'Astana', exists().where(
+                Job.member_user_id == User.user_id, Job.required_caregiving_type == 'Elderly Care')),
+        '6.2 hours for one caregiver': select(func.sum(Appointment.work_hours))
+            .where(Appointment.caregiver_user_id == 1, Appointment.status == 'accepted'),
+        'appointments of one member': select(Appointment.appointment_id)
+            .where(Appointment.member_user_id == first_member_id),
+        'applications for one job': select(JobApplication.caregiver_user_id)
+            .where(JobApplication.job_id == 1),
+    }
+
+
+def run_workload(engine, users, repeat):
+    """Time every workload query; returns {name: (median_ms, rows, plan)}"""
+    results = {}
+    with engine.connect() as conn:
+        analyze(conn)
+        for name, stmt in workload(users).items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                rows = len(conn.execute(stmt).all())
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = (statistics.median(timings), rows, explain(conn, stmt))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_dataset_arguments(parser, users=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--explain', action='store_true', help='print query plans')
+    args = parser.parse_args()
+
+    engine = build_engine(args.url)
+    build_dataset(engine, args.users, args.seed, indexes=False)
+
+    without = run_workload(engine, args.users, args.repeat)
+    start = time.perf_counter()
+    for index in secondary_indexes():
+        index.create(bind=engine)
+    print(f'Created {len(secondary_indexes())} indexes in {time.perf_counter() - start:.1f}s\n')
+    with_idx = run_workload(engine, args.users, args.repeat)
+
+    print(f'{"query":<34} {"rows":>8} {"no index ms":>12} {"indexed ms":>12} {"speedup":>8}')
+    print('-' * 78)
+    for name, (before_ms, rows, before_plan) in without.items():
+        after_ms, _, after_plan = with_idx[name]
+        speedup = before_ms / after_ms if after_ms else float('inf')
+        print(f'{name:<34} {rows:>8} {before_ms:>12.2f} {after_ms:>12.2f} {speedup:>7.1f}x')
+        if args.explain:
+            print('    without indexes:')
+            for line in before_plan:
+                print(f'      {line}')
+            print('    with indexes:')
+            for line in after_plan:
+                print(f'      {line}')
+
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Matching benchmark: times match_caregivers() for random jobs on a generated
+dataset and checks every answer against a brute-force ranking that scores all
+caregivers in one full-scan query.
+
+Usage:
+    python -m benchmarks.matching --users 2000000 --jobs 50
+    python -m benchmarks.matching --users 200000 --min-rate 10 --max-rate 15 --explain
+"""
+
+import argparse
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+from database import build_engine
+from models import User, Caregiver, Job, Appointment
+from matching import MATCH_WEIGHTS, match_caregivers, _candidates
+from benchmarks.common import StatementCounter, add_dataset_arguments, analyze, build_dataset, explain, percentile
+
+
+def brute_force_ids(db, job_id, min_rate, max_rate, limit):
+    """Caregiver ids in match order, computed by scoring every caregiver"""
+    member_id, job_type, city = db.execute(
+        select(Job.member_user_id, Job.required_caregiving_type, User.city)
+        .join(User, User.user_id == Job.member_user_id).where(Job.job_id == job_id)
+    ).one()
+    history = select(
+        Appointment.caregiver_user_id, func.count().label('past')
+    ).where(
+        Appointment.member_user_id == member_id, Appointment.status == 'accepted'
+    ).group_by(Appointment.caregiver_user_id).subquery()
+    in_range = Caregiver.hourly_rate == Caregiver.hourly_rate
+    if min_rate is not None:
+        in_range = in_range & (Caregiver.hourly_rate >= min_rate)
+    if max_rate is not None:
+        in_range = in_range & (Caregiver.hourly_rate <= max_rate)
+    past = func.coalesce(history.c.past, 0)
+    score = (case((Caregiver.caregiving_type == job_type, MATCH_WEIGHTS['caregiving_type']), else_=0)
+             + case((User.city == city, MATCH_WEIGHTS['city']), else_=0)
+             + case((in_range, MATCH_WEIGHTS['rate']), else_=0)
+             + case((past > 0, MATCH_WEIGHTS['history']), else_=0))
+    query = select(Caregiver.caregiver_user_id).join(
+        User, User.user_id == Caregiver.caregiver_user_id
+    ).outerjoin(
+        history, history.c.caregiver_user_id == Caregiver.caregiver_user_id
+    ).where(
+        Caregiver.caregiver_user_id != member_id
+    ).order_by(
+        score.desc(), past.desc(), Caregiver.hourly_rate, Caregiver.caregiver_user_id
+    ).limit(limit)
+    return list(db.scalars(query))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_dataset_arguments(parser, users=200000)
+    parser.add_argument('--jobs', type=int, default=25, help='random jobs to match')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--min-rate', type=Decimal)
+    parser.add_argument('--max-rate', type=Decimal)
+    parser.add_argument('--explain', action='store_true', help='print the plan of the best-tier query')
+    args = parser.parse_args()
+
+    engine = build_engine(args.url)
+    build_dataset(engine, args.users, args.seed)
+    with engine.begin() as conn:
+        analyze(conn)
+
+    counter = StatementCounter(engine)
+    rng = random.Random(args.seed)
+    with Session(bind=engine) as db:
+        caregivers = db.scalar(select(func.count()).select_from(Caregiver))
+        max_job = db.scalar(select(func.max(Job.job_id)))
+        job_ids = [rng.randint(1, max_job) for _ in range(args.jobs)]
+
+        match_ms, brute_ms, statements = [], [], []
+        for job_id in job_ids:
+            counter.count = 0
+            start = time.perf_counter()
+            matches = match_caregivers(db, job_id, args.min_rate, args.max_rate, args.limit)
+            match_ms.append((time.perf_counter() - start) * 1000)
+            statements.append(counter.count)
+
+            start = time.perf_counter()
+            expected = brute_force_ids(db, job_id, args.min_rate, args.max_rate, args.limit)
+            brute_ms.append((time.perf_counter() - start) * 1000)
+            if [m.caregiver_user_id for m in matches] != expected:
+                raise SystemExit(f'Ranking mismatch for job {job_id}')
+
+        print(f'{caregivers} caregivers, {len(job_ids)} jobs, top {args.limit}; '
+              f'every ranking matched the brute-force result\n')
+        print(f'{"implementation":<22} {"median ms":>10} {"p95 ms":>10} {"statements":>11}')
+        print('-' * 56)
+        print(f'{"match_caregivers":<22} {statistics.median(match_ms):>10.2f} '
+              f'{percentile(match_ms, 0.95):>10.2f} {statistics.median(statements):>11}')
+        print(f'{"full-scan ranking":<22} {statistics.median(brute_ms):>10.2f} '
+              f'{percentile(brute_ms, 0.95):>10.2f} {2:>11}')
+
+        if args.explain:
+            job_type, city = db.execute(
+                select(Job.required_caregiving_type, User.city)
+                .join(User, User.user_id == Job.member_user_id).where(Job.job_id == job_ids[0])
+            ).one()
+            stmt = _candidates().where(
+                Caregiver.caregiving_type == job_type, User.city == city
+            ).order_by(Caregiver.hourly_rate, Caregiver.caregiver_user_id).limit(args.limit)
+            print('\nBest-tier query plan:')
+            for line in explain(db.connection(), stmt):
+                print(f'  {line}')
+
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
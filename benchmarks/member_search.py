@@ -0,0 +1,95 @@
+"""
+Member search benchmark: times search_members() (one statement, EXISTS
+semi-join) against the original report 5.4 loop, which ran one Job lookup per
+candidate member, on a generated dataset. Both must return the same members.
+
+Usage:
+    python -m benchmarks.member_search --users 200000
+    python -m benchmarks.member_search --type Babysitter --city Almaty --rule "No smoking." --explain
+"""
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy.orm import Session
+from database import build_engine
+from models import User, Member, Job
+from queries import search_members, search_members_query
+from benchmarks.common import StatementCounter, add_dataset_arguments, analyze, build_dataset, explain
+
+
+def search_members_per_row(db, caregiving_type, city, house_rule):
+    """The pre-EXISTS implementation: filter members, then one Job query each"""
+    candidates = db.query(User, Member).join(
+        Member, Member.member_user_id == User.user_id
+    ).filter(
+        User.city == city,
+        Member.house_rules.contains(house_rule, autoescape=True)
+    ).all()
+    rows = []
+    for user, member in candidates:
+        job = db.query(Job).filter(
+            Job.member_user_id == member.member_user_id,
+            Job.required_caregiving_type == caregiving_type
+        ).first()
+        if job:
+            rows.append((user, member))
+    return rows
+
+
+def time_search(engine, counter, fn, criteria, repeat):
+    """Median wall time (ms), statements per run and the matching member ids"""
+    timings = []
+    for _ in range(repeat):
+        with Session(bind=engine) as db:
+            counter.count = 0
+            start = time.perf_counter()
+            rows = fn(db, *criteria)
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), counter.count, sorted(member.member_user_id for _, member in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_dataset_arguments(parser, users=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--type', default='Elderly Care', help='required caregiving type')
+    parser.add_argument('--city', default='Astana')
+    parser.add_argument('--rule', default='No pets.', help='text the house rules must contain')
+    parser.add_argument('--explain', action='store_true', help='print the plan of the EXISTS query')
+    args = parser.parse_args()
+
+    engine = build_engine(args.url)
+    build_dataset(engine, args.users, args.seed)
+    with engine.begin() as conn:
+        analyze(conn)
+
+    criteria = (args.type, args.city, args.rule)
+    counter = StatementCounter(engine)
+    per_row_ms, per_row_statements, per_row_ids = time_search(
+        engine, counter, search_members_per_row, criteria, args.repeat)
+    exists_ms, exists_statements, exists_ids = time_search(
+        engine, counter, search_members, criteria, args.repeat)
+    if per_row_ids != exists_ids:
+        raise SystemExit(f'Result mismatch: {len(per_row_ids)} members per row, {len(exists_ids)} with EXISTS')
+
+    print(f'Members needing {args.type!r} in {args.city!r} with rule {args.rule!r}: {len(exists_ids)}\n')
+    print(f'{"implementation":<20} {"statements":>10} {"median ms":>12}')
+    print('-' * 44)
+    print(f'{"per-member lookup":<20} {per_row_statements:>10} {per_row_ms:>12.2f}')
+    print(f'{"EXISTS semi-join":<20} {exists_statements:>10} {exists_ms:>12.2f}')
+    print(f'\nSpeedup: {per_row_ms / exists_ms if exists_ms else float("inf"):.1f}x')
+
+    if args.explain:
+        with Session(bind=engine) as db:
+            stmt = search_members_query(db, *criteria).statement
+            print('\nEXISTS query plan:')
+            for line in explain(db.connection(), stmt):
+                print(f'  {line}')
+
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+N+1 check for CI: requests every GET route of app.py (HTML pages, JSON API,
+exports) and runs every queries.py report inside
+nplusone.assert_no_n_plus_one(), against a generated dataset. Prints the
+statement count of each and exits non-zero if any of them repeats a
+statement NPLUSONE_THRESHOLD times or more, listing the statement and the
+lines that issued it.
+
+Route arguments are filled with ids of existing rows, so edit pages and
+single-record routes render real records. Reports run in a transaction that
+is rolled back, so the updates and deletes leave the dataset as it was.
+
+Usage:
+    DATABASE_URL=sqlite:///benchmark.db python -m benchmarks.nplusone --users 2000
+    python -m benchmarks.nplusone --threshold 3
+"""
+
+import argparse
+import os
+import secrets
+import sys
+from contextlib import redirect_stdout
+
+from sqlalchemy import select
+from app import app
+from database import SessionLocal
+from export import EXPORTS
+from models import Member, Address, JobApplication, Appointment
+from nplusone import NPLUSONE_THRESHOLD, NPlusOneError, assert_no_n_plus_one
+from queries import REPORTS
+
+# Query strings for routes that need more than their path arguments
+ROUTE_QUERIES = {
+    'search_page': 'q=patient',
+    'api_top_earners': 'limit=20',
+    'api_caregiver_availability': 'date=2024-03-01&time=10:00&hours=3',
+    'api_free_caregivers': 'date=2024-03-01&time=10:00&hours=3&type=Babysitter',
+}
+
+
+def sample_arguments(db):
+    """Values for every path argument name, taken from existing rows"""
+    application = db.execute(select(JobApplication).limit(1)).scalar_one()
+    appointment = db.execute(select(Appointment).limit(1)).scalar_one()
+    member_id = db.scalar(select(Member.member_user_id).join(
+        Address, Address.member_user_id == Member.member_user_id).limit(1))
+    return {
+        'user_id': application.caregiver_user_id,
+        'caregiver_id': application.caregiver_user_id,
+        'caregiver_user_id': application.caregiver_user_id,
+        'job_id': application.job_id,
+        'member_id': member_id,
+        'member_user_id': member_id,
+        'appointment_id': appointment.appointment_id,
+    }
+
+
+def route_urls(arguments):
+    """(endpoint, url) of every GET route, with its path arguments filled in"""
+    urls = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if 'GET' not in rule.methods or rule.endpoint == 'static':
+            continue
+        names = rule.arguments - set(rule.defaults or ())
+        if names == {'entity'}:
+            for entity in EXPORTS:
+                urls.append((rule.endpoint, f'/export/{entity}?format=json'))
+            continue
+        path = rule.rule
+        for name in names:
+            path = path.replace(f'<int:{name}>', str(arguments[name])).replace(f'<{name}>', str(arguments[name]))
+        query = ROUTE_QUERIES.get(rule.endpoint)
+        urls.append((rule.endpoint, f'{path}?{query}' if query else path))
+    return urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, help='first rebuild DATABASE_URL with this many synthetic users (drops it!)')
+    parser.add_argument('--threshold', type=int, default=NPLUSONE_THRESHOLD,
+                        help='repeats of one statement that fail the check')
+    args = parser.parse_args()
+
+    if args.users:
+        from init_db import init_synthetic_database
+        with redirect_stdout(sys.stderr):
+            init_synthetic_database(users=args.users)
+
+    failures = []
+    # The admin routes and exports refuse every request while no token is configured
+    headers = {'X-Admin-Token': os.environ.setdefault('ADMIN_TOKEN', secrets.token_hex(16))}
+    client = app.test_client()
+    with SessionLocal() as db:
+        arguments = sample_arguments(db)
+
+    print(f'{"check":<58} {"status":>6} {"statements":>11}')
+    print('-' * 77)
+    for endpoint, url in route_urls(arguments):
+        try:
+            with assert_no_n_plus_one(url, args.threshold) as log:
+                response = client.get(url, headers=headers)
+                response.get_data()     # streamed bodies run their queries here
+            outcome = response.status_code
+        except NPlusOneError as e:
+            failures.append(e)
+            outcome = 'N+1'
+        print(f'{url[:58]:<58} {outcome:>6} {log.total:>11}')
+
+    for name, fn in REPORTS:
+        with SessionLocal() as db:
+            try:
+                with assert_no_n_plus_one(f'report {name}', args.threshold) as log:
+                    fn(db)
+                outcome = 'ok'
+            except NPlusOneError as e:
+                failures.append(e)
+                outcome = 'N+1'
+            finally:
+                db.rollback()
+        print(f'{"report " + name:<58} {outcome:>6} {log.total:>11}')
+
+    if failures:
+        print()
+        for failure in failures:
+            print(failure)
+        raise SystemExit(f'\n{len(failures)} checks repeat a statement {args.threshold} times or more')
+    print(f'\nNo statement repeated {args.threshold} times in any route or report')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Report benchmark: times the data step of every queries.py report against
+generated datasets and emits JSON so results can be compared between
+releases. For each report it records wall time, SQL statements issued, rows
+returned (or affected, for updates and deletes) and peak Python memory.
+Every report runs in its own transaction, which is rolled back afterwards.
+
+Usage:
+    python -m benchmarks.reports --sizes 10000 100000 1000000 --output bench.json
+    python -m benchmarks.reports --sizes 10000 --reports simple_5_1 view_8
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+import sqlalchemy
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from database import build_engine
+from queries import REPORTS
+from benchmarks.common import StatementCounter, add_dataset_arguments, build_dataset
+
+
+def count_rows(result):
+    """Rows returned by a data step, or rows affected for mutations"""
+    if result is None:
+        return 0
+    if isinstance(result, dict):
+        return sum(value for value in result.values() if isinstance(value, int))
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], list):
+        return len(result[1])  # (aggregate, rows), e.g. complex_6_4
+    return len(result)
+
+
+def run_report(engine, counter, fn):
+    """Run one data step in a rolled-back transaction and measure it"""
+    db = Session(bind=engine)
+    try:
+        counter.count = 0
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = fn(db)
+        wall_ms = (time.perf_counter() - start) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'wall_ms': round(wall_ms, 3),
+            'statements': counter.count,
+            'rows': count_rows(result),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+    finally:
+        db.rollback()
+        db.close()
+
+
+def run_dataset(url, users, seed, reports):
+    """Build a dataset of the given size and benchmark every selected report"""
+    engine = build_engine(url)
+    start = time.perf_counter()
+    with redirect_stdout(sys.stderr):
+        loaded = build_dataset(engine, users, seed)
+    load_seconds = time.perf_counter() - start
+
+    counter = StatementCounter(engine)
+    results = []
+    for name, fn in reports:
+        print(f'  {name}...', file=sys.stderr, flush=True)
+        results.append({'report': name, **run_report(engine, counter, fn)})
+    engine.dispose()
+    return {
+        'users': users,
+        'rows_loaded': loaded,
+        'load_seconds': round(load_seconds, 2),
+        'reports': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_dataset_arguments(parser, users=None)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='dataset sizes, in users')
+    parser.add_argument('--reports', nargs='+', help='only run these reports (default: all)')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    reports = REPORTS
+    if args.reports:
+        unknown = set(args.reports) - {name for name, _ in REPORTS}
+        if unknown:
+            parser.error(f'unknown reports: {", ".join(sorted(unknown))}')
+        reports = [(name, fn) for name, fn in REPORTS if name in args.reports]
+
+    datasets = []
+    for users in args.sizes:
+        print(f'Dataset with {users} users:', file=sys.stderr, flush=True)
+        datasets.append(run_dataset(args.url, users, args.seed, reports))
+
+    output = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'dialect': make_url(args.url).get_backend_name(),
+        'python': platform.python_version(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'seed': args.seed,
+        'datasets': datasets,
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+"""
+Bulk creation and update of appointments and job applications.
+
+A batch is validated as a whole in a few set-based queries instead of one
+SELECT per row. The caregiver, member and job ids it references are looked up
+with IN queries, BULK_CHUNK_SIZE ids at a time; so are the keys it creates or
+updates. The blocking appointments of the caregivers it books are read once,
+for the dates the batch covers, and every new window is compared with them
+and with the earlier rows of the batch in Python (see availability.py).
+
+Rows that fail are reported by row number and skipped; the others are written
+with ORM bulk INSERT / UPDATE statements, BULK_BATCH_SIZE rows per
+executemany, in the caller's transaction. Those statements bypass the ORM
+events, so the caregiver_earnings rows of the affected caregivers are rebuilt
+(like purge.py) and the dashboard counts are flagged stale for the commit.
+"""
+
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import NamedTuple
+from sqlalchemy import insert, select, tuple_, update
+from database import env_int
+from models import Caregiver, Member, Job, JobApplication, Appointment
+from availability import BLOCKING_STATUSES, MAX_APPOINTMENT_HOURS, appointment_window
+from earnings import refresh_caregiver_earnings
+
+BULK_BATCH_SIZE = env_int('BULK_BATCH_SIZE', 1000)    # rows per INSERT / UPDATE executemany
+BULK_CHUNK_SIZE = env_int('BULK_CHUNK_SIZE', 500)     # ids per IN (...) lookup
+BULK_MAX_ROWS = env_int('BULK_MAX_ROWS', 10000)       # rows accepted per request
+
+
+class BulkResult(NamedTuple):
+    written: list   # keys of the rows written, in row order
+    errors: list    # (row number, message) of the rows skipped
+
+
+def _chunks(values, size):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _found(db, column, ids, lock=False):
+    """The subset of `ids` present in `column` (rows locked FOR UPDATE with lock=True)"""
+    found = set()
+    for chunk in _chunks(ids, BULK_CHUNK_SIZE):
+        query = select(column).where(column.in_(chunk))
+        if lock:
+            query = query.with_for_update()
+        found.update(db.scalars(query))
+    return found
+
+
+def _write(db, statement, params, returning=None):
+    """Run `statement` for every parameter dict, BULK_BATCH_SIZE rows per executemany
+
+    With returning=<column> the INSERT RETURNs that generated id; the ids are
+    collected in parameter order.
+    """
+    sqlite = db.get_bind().dialect.name == 'sqlite'
+    if returning is not None:
+        # PostgreSQL guarantees neither the order of RETURNING rows nor that
+        # ids follow VALUES order, so SQLAlchemy sorts them by parameter.
+        # On SQLite that costs one INSERT per row, and is not needed there:
+        # rowids of one INSERT are assigned in VALUES order, so sorting the
+        # ids is enough.
+        statement = statement.returning(returning, sort_by_parameter_order=not sqlite)
+    returned = []
+    for batch in _chunks(params, BULK_BATCH_SIZE):
+        result = db.execute(statement, batch)
+        if returning is not None:
+            returned.extend(sorted(result.scalars()) if sqlite else result.scalars())
+    return returned
+
+
+def _refresh_earnings(db, caregiver_ids):
+    for chunk in _chunks(sorted(caregiver_ids), BULK_CHUNK_SIZE):
+        refresh_caregiver_earnings(db, chunk)
+
+
+def _booking(appointment_date, appointment_time, work_hours):
+    start = datetime.combine(appointment_date, appointment_time)
+    return start, start + timedelta(hours=float(work_hours))
+
+
+class Schedule:
+    """Blocking bookings per caregiver, sorted by start, for checking a batch"""
+
+    def __init__(self):
+        self._bookings = defaultdict(list)    # caregiver id -> [(start, end, label)]
+
+    def add(self, caregiver_id, start, end, label):
+        insort(self._bookings[caregiver_id], (start, end, label))
+
+    def discard(self, caregiver_id, start, end, label):
+        bookings = self._bookings[caregiver_id]
+        i = bisect_left(bookings, (start, end, label))
+        if i < len(bookings) and bookings[i] == (start, end, label):
+            del bookings[i]
+
+    def overlapping(self, caregiver_id, start, end):
+        """Labels of the bookings overlapping [start, end)"""
+        bookings = self._bookings[caregiver_id]
+        # Nothing lasts longer than MAX_APPOINTMENT_HOURS, so earlier starts cannot overlap
+        i = bisect_left(bookings, (start - timedelta(hours=MAX_APPOINTMENT_HOURS),))
+        labels = []
+        for booked_start, booked_end, label in bookings[i:]:
+            if booked_start >= end:
+                break
+            if start < booked_end:
+                labels.append(label)
+        return labels
+
+    def book(self, caregiver_id, start, end, label):
+        """Add the booking, or raise ValueError naming the bookings it overlaps"""
+        found = self.overlapping(caregiver_id, start, end)
+        if found:
+            raise ValueError(f'Caregiver {caregiver_id} is already booked at that time ({", ".join(found)})')
+        self.add(caregiver_id, start, end, label)
+
+
+def load_schedule(db, caregiver_ids, windows):
+    """Schedule of the caregivers' blocking appointments that could overlap `windows`"""
+    schedule = Schedule()
+    if not caregiver_ids or not windows:
+        return schedule
+    first = (min(start for start, end in windows) - timedelta(hours=MAX_APPOINTMENT_HOURS)).date()
+    last = max(end for start, end in windows).date()
+    for chunk in _chunks(caregiver_ids, BULK_CHUNK_SIZE):
+        rows = db.execute(select(
+            Appointment.appointment_id,
+            Appointment.caregiver_user_id,
+            Appointment.appointment_date,
+            Appointment.appointment_time,
+            Appointment.work_hours
+        ).where(
+            Appointment.caregiver_user_id.in_(chunk),
+            Appointment.status.in_(BLOCKING_STATUSES),
+            Appointment.appointment_date.between(first, last)
+        ))
+        for row in rows:
+            start, end = _booking(row.appointment_date, row.appointment_time, row.work_hours)
+            schedule.add(row.caregiver_user_id, start, end, f'appointment #{row.appointment_id}')
+    return schedule
+
+
+def _window(fields):
+    """Booking window of a blocking appointment, or None; ValueError for invalid work hours
+
+    Every row is validated, blocking or not, so that NaN or out-of-range
+    hours are a row error and never reach the INSERT / UPDATE.
+    """
+    window = appointment_window(fields['appointment_date'], fields['appointment_time'], fields['work_hours'])
+    return window if fields['status'] in BLOCKING_STATUSES else None
+
+
+def _windows(rows):
+    windows = []
+    for number, fields in rows:
+        try:
+            window = _window(fields)
+        except ValueError:
+            continue
+        if window:
+            windows.append(window)
+    return windows
+
+
+# ==================== APPOINTMENTS ====================
+
+def create_appointments(db, rows):
+    """Insert the valid rows of [(row number, fields)]; the caller commits
+
+    Each row needs every Appointment column except appointment_id. Returns a
+    BulkResult with the new appointment ids.
+    """
+    caregiver_ids = {fields['caregiver_user_id'] for number, fields in rows}
+    caregivers = _found(db, Caregiver.caregiver_user_id, caregiver_ids, lock=True)
+    members = _found(db, Member.member_user_id, {fields['member_user_id'] for number, fields in rows})
+    schedule = load_schedule(db, caregivers, _windows(rows))
+
+    valid, errors = [], []
+    for number, fields in rows:
+        try:
+            if fields['caregiver_user_id'] not in caregivers:
+                raise ValueError(f'Caregiver {fields["caregiver_user_id"]} does not exist')
+            if fields['member_user_id'] not in members:
+                raise ValueError(f'Member {fields["member_user_id"]} does not exist')
+            window = _window(fields)
+            if window:
+                schedule.book(fields['caregiver_user_id'], *window, f'row {number}')
+        except ValueError as e:
+            errors.append((number, str(e)))
+            continue
+        valid.append(fields)
+
+    ids = _write(db, insert(Appointment), valid, returning=Appointment.appointment_id)
+    if valid:
+        _refresh_earnings(db, {fields['caregiver_user_id'] for fields in valid})
+        db.info['stats_changed'] = True
+    return BulkResult(ids, errors)
+
+
+def update_appointments(db, rows):
+    """Apply the valid rows of [(row number, fields)] by appointment_id; the caller commits
+
+    Each row holds appointment_id and the columns to change (appointment_date,
+    appointment_time, work_hours, status). Returns a BulkResult with the ids
+    of the updated appointments.
+    """
+    columns = (Appointment.appointment_id, Appointment.caregiver_user_id, Appointment.appointment_date,
+               Appointment.appointment_time, Appointment.work_hours, Appointment.status)
+    current = {}
+    for chunk in _chunks({fields['appointment_id'] for number, fields in rows}, BULK_CHUNK_SIZE):
+        for row in db.execute(select(*columns).where(Appointment.appointment_id.in_(chunk))):
+            current[row.appointment_id] = row._asdict()
+    caregivers = _found(db, Caregiver.caregiver_user_id,
+                        {row['caregiver_user_id'] for row in current.values()}, lock=True)
+    merged = [(number, {**current[fields['appointment_id']], **fields})
+              for number, fields in rows if fields['appointment_id'] in current]
+    schedule = load_schedule(db, caregivers, _windows(merged))
+
+    valid, errors, seen = [], [], set()
+    for number, fields in rows:
+        appointment_id = fields['appointment_id']
+        try:
+            if appointment_id not in current:
+                raise ValueError(f'Appointment {appointment_id} does not exist')
+            if appointment_id in seen:
+                raise ValueError(f'Appointment {appointment_id} appears more than once in this batch')
+            seen.add(appointment_id)
+            before = current[appointment_id]
+            after = {**before, **fields}
+            caregiver_id = before['caregiver_user_id']
+            label = f'appointment #{appointment_id}'
+            # Move the booking: free its old window, keep it if the new one is rejected
+            old = None
+            if before['status'] in BLOCKING_STATUSES:
+                old = _booking(before['appointment_date'], before['appointment_time'], before['work_hours'])
+                schedule.discard(caregiver_id, *old, label)
+            try:
+                window = _window(after)
+                if window:
+                    schedule.book(caregiver_id, *window, label)
+            except ValueError:
+                if old:
+                    schedule.add(caregiver_id, *old, label)
+                raise
+        except ValueError as e:
+            errors.append((number, str(e)))
+            continue
+        valid.append(fields)
+
+    _write(db, update(Appointment), valid)
+    if valid:
+        _refresh_earnings(db, {current[fields['appointment_id']]['caregiver_user_id'] for fields in valid})
+    return BulkResult([fields['appointment_id'] for fields in valid], errors)
+
+
+# ==================== JOB APPLICATIONS ====================
+
+def _application_keys(db, keys):
+    """The subset of (caregiver_user_id, job_id) pairs that already have an application"""
+    key = tuple_(JobApplication.caregiver_user_id, JobApplication.job_id)
+    found = set()
+    for chunk in _chunks(keys, BULK_CHUNK_SIZE):
+        found.update(tuple(row) for row in db.execute(select(
+            JobApplication.caregiver_user_id, JobApplication.job_id
+        ).where(key.in_(chunk))))
+    return found
+
+
+def _key(fields):
+    return fields['caregiver_user_id'], fields['job_id']
+
+
+def create_applications(db, rows):
+    """Insert the valid rows of [(row number, fields)]; the caller commits
+
+    Returns a BulkResult with the (caregiver_user_id, job_id) keys created.
+    """
+    caregivers = _found(db, Caregiver.caregiver_user_id, {fields['caregiver_user_id'] for number, fields in rows})
+    jobs = _found(db, Job.job_id, {fields['job_id'] for number, fields in rows})
+    taken = _application_keys(db, {_key(fields) for number, fields in rows})
+
+    valid, errors = [], []
+    for number, fields in rows:
+        caregiver_id, job_id = _key(fields)
+        if caregiver_id not in caregivers:
+            errors.append((number, f'Caregiver {caregiver_id} does not exist'))
+        elif job_id not in jobs:
+            errors.append((number, f'Job {job_id} does not exist'))
+        elif (caregiver_id, job_id) in taken:
+            errors.append((number, f'Caregiver {caregiver_id} has already applied to job {job_id}'))
+        else:
+            taken.add((caregiver_id, job_id))
+            valid.append(fields)
+
+    _write(db, insert(JobApplication), valid)
+    return BulkResult([_key(fields) for fields in valid], errors)
+
+
+def update_applications(db, rows):
+    """Apply the valid rows of [(row number, fields)] by (caregiver_user_id, job_id); the caller commits"""
+    existing = _application_keys(db, {_key(fields) for number, fields in rows})
+
+    valid, errors, seen = [], [], set()
+    for number, fields in rows:
+        key = _key(fields)
+        if key not in existing:
+            errors.append((number, f'No application of caregiver {key[0]} to job {key[1]}'))
+        elif key in seen:
+            errors.append((number, f'Application of caregiver {key[0]} to job {key[1]} appears more than once in this batch'))
+        else:
+            seen.add(key)
+            valid.append(fields)
+
+    _write(db, update(JobApplication), valid)
+    return BulkResult([_key(fields) for fields in valid], errors)
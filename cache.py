@@ -0,0 +1,322 @@
+"""
+Read-through cache for entity lookups by primary key (User, Caregiver,
+Member, Job).
+
+The column values of an entity are cached under "<table>:<pk>", except
+secrets (users.password), which load from the database if a cached user's
+attribute is read. A hit builds
+a detached instance from them and attaches it to the session with
+merge(load=False), so it behaves like a loaded object (it can be edited or
+deleted, and relationships still lazy-load) without running a SELECT.
+Updating or deleting a cached entity through the ORM (the edit/delete routes
+and their cascades) drops its key when the session commits. Bulk statements
+bypass those events, so their callers report what they changed with
+mark_stale() / mark_all_stale() (purge.py, pricing.py). A miss only stores
+the row it read if no invalidation happened meanwhile, so a lookup that
+races with a commit cannot put the old values back.
+
+Backends implement get/set/delete/clear. LocalBackend is an in-process LRU:
+an invalidation only reaches the process that made the change, so with
+several web workers (WEB_CONCURRENCY > 1) its entries live for 5 seconds
+unless ENTITY_CACHE_TTL says otherwise. SharedBackend pickles values into any client with a Redis-style
+get/set(ex=)/delete API, so several processes can share one cache.
+FakeSharedClient is a dict-based stand-in for such a client.
+"""
+
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+from database import env_int
+from models import User, Caregiver, Member, Job
+
+WEB_CONCURRENCY = env_int('WEB_CONCURRENCY', 1)                     # web worker processes (read by gunicorn too)
+ENTITY_CACHE_BACKEND = os.getenv('ENTITY_CACHE_BACKEND', 'local')  # local, fake or off
+ENTITY_CACHE_SIZE = env_int('ENTITY_CACHE_SIZE', 1024)               # entries (local backend)
+# Seconds, 0 keeps entries until evicted. Other workers never see a local
+# invalidation, so they may serve a changed entity until it expires.
+ENTITY_CACHE_TTL = env_int('ENTITY_CACHE_TTL',
+                           5 if ENTITY_CACHE_BACKEND == 'local' and WEB_CONCURRENCY > 1 else 300)
+
+CACHED_MODELS = (User, Caregiver, Member, Job)
+UNCACHED_COLUMNS = {User: {'password'}}
+# Seconds a SharedBackend invalidation keeps other processes from re-storing a key
+INVALIDATION_WINDOW = 5
+
+
+class CacheBackend:
+    """Interface for entity cache storage; values are dicts of column values"""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class NullBackend(CacheBackend):
+    """Caches nothing (ENTITY_CACHE_BACKEND=off)"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LocalBackend(CacheBackend):
+    """Thread-safe in-process LRU with an optional TTL"""
+
+    def __init__(self, maxsize=ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at and time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedBackend(CacheBackend):
+    """Stores pickled values in a shared key-value client (Redis-style API)
+
+    `client` needs get(key) -> bytes or None, set(key, bytes, ex=seconds or
+    None, nx=bool), delete(key) and, for clear(), scan_iter(match=pattern).
+
+    delete() leaves an empty tombstone for INVALIDATION_WINDOW seconds and
+    set() only writes absent keys (nx), so a process that read a row before
+    another one invalidated it cannot store the old values afterwards.
+    """
+
+    def __init__(self, client, ttl=ENTITY_CACHE_TTL, prefix='entity:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return pickle.loads(data) if data else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl or None, nx=True)
+
+    def delete(self, key):
+        self.client.set(self.prefix + key, b'', ex=INVALIDATION_WINDOW)
+
+    def clear(self):
+        for key in list(self.client.scan_iter(match=self.prefix + '*')):
+            self.client.set(key, b'', ex=INVALIDATION_WINDOW)
+
+
+class FakeSharedClient:
+    """In-memory stand-in for a Redis client, for SharedBackend without a server"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at and time.monotonic() >= expires_at:
+                del self._data[key]
+                return None
+            return data
+
+    def set(self, key, data, ex=None, nx=False):
+        if not isinstance(data, bytes):
+            raise TypeError('FakeSharedClient stores bytes only')
+        with self._lock:
+            if nx:
+                entry = self._data.get(key)
+                if entry is not None and not (entry[1] and time.monotonic() >= entry[1]):
+                    return None
+            self._data[key] = (data, time.monotonic() + ex if ex else 0)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def scan_iter(self, match='*'):
+        prefix = match.rstrip('*')
+        with self._lock:
+            return [key for key in self._data if key.startswith(prefix)]
+
+
+def cache_key(model, pk):
+    return f'{model.__tablename__}:{pk}'
+
+
+class EntityCache:
+    """Read-through primary-key cache with hit/miss counters"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._generation = 0            # bumped by every invalidation
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, db, model, pk):
+        """The `model` instance with primary key `pk` attached to `db`, or None"""
+        # Already in this session: use it (it may hold unflushed changes)
+        identity = db.identity_map.get(inspect(model).identity_key_from_primary_key((pk,)))
+        if identity is not None:
+            return identity
+
+        key = cache_key(model, pk)
+        values = self.backend.get(key)
+        if values is not None:
+            self._count(True)
+            obj = model(**values)
+            make_transient_to_detached(obj)
+            return db.merge(obj, load=False)
+
+        self._count(False)
+        generation = self._generation
+        obj = db.get(model, pk)
+        if obj is not None:
+            skipped = UNCACHED_COLUMNS.get(model, ())
+            values = {attr.key: getattr(obj, attr.key) for attr in inspect(model).column_attrs
+                      if attr.key not in skipped}
+            with self._lock:
+                # Don't store a row that an invalidation overtook while it was read
+                if generation == self._generation:
+                    self.backend.set(key, values)
+        return obj
+
+    def invalidate(self, model, pk):
+        with self._lock:
+            self._generation += 1
+            self.backend.delete(cache_key(model, pk))
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'backend': type(self.backend).__name__,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+        if isinstance(self.backend, LocalBackend):
+            stats.update(entries=len(self.backend), maxsize=self.backend.maxsize,
+                         evictions=self.backend.evictions)
+        return stats
+
+
+def build_backend(name=ENTITY_CACHE_BACKEND):
+    """Backend for ENTITY_CACHE_BACKEND (local, fake or off)"""
+    if name == 'local':
+        return LocalBackend()
+    if name == 'fake':
+        return SharedBackend(FakeSharedClient())
+    if name == 'off':
+        return NullBackend()
+    raise ValueError(f'Unknown ENTITY_CACHE_BACKEND: {name!r}')
+
+
+entity_cache = EntityCache(build_backend())
+
+
+def get_entity(db, model, pk):
+    """Look up `model` by primary key through the entity cache"""
+    return entity_cache.get(db, model, pk)
+
+
+def _mark_stale(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('stale_entities', set()).add(
+            (mapper.class_, inspect(target).identity[0])
+        )
+
+
+for _model in CACHED_MODELS:
+    event.listen(_model, 'after_update', _mark_stale)
+    event.listen(_model, 'after_delete', _mark_stale)
+
+
+def mark_stale(db, model, pks):
+    """Drop the keys of `model` rows changed by a bulk statement when `db` commits"""
+    db.info.setdefault('stale_entities', set()).update((model, pk) for pk in pks)
+
+
+def mark_all_stale(db):
+    """Clear the whole cache when `db` commits, for statements that change a whole table"""
+    db.info['stale_cache'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    if session.info.pop('stale_cache', False):
+        entity_cache.clear()
+    for model, pk in session.info.pop('stale_entities', ()):
+        entity_cache.invalidate(model, pk)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('stale_entities', None)
+    session.info.pop('stale_cache', None)
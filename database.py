@@ -1,6 +1,10 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,13 +15,144 @@ DATABASE_URL = os.getenv('DATABASE_URL')
 if DATABASE_URL and DATABASE_URL.startswith('postgres://'):
     DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
 
-engine = create_engine(DATABASE_URL, echo=True)
+def env_bool(name, default=False):
+    """Read a boolean flag from the environment"""
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def env_int(name, default):
+    """Read an integer setting from the environment"""
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    return int(value)
+
+# Engine settings (all overridable from the environment)
+DB_ECHO = env_bool('DB_ECHO')
+DB_POOL_SIZE = env_int('DB_POOL_SIZE', 5)
+DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 10)
+DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 30)            # seconds
+DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', 1800)          # seconds, -1 disables
+DB_POOL_PRE_PING = env_bool('DB_POOL_PRE_PING', True)
+DB_STATEMENT_TIMEOUT = env_int('DB_STATEMENT_TIMEOUT', 0)   # milliseconds, 0 disables
+
+# Upper bounds (ms) of the checkout latency histogram buckets
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolMetrics:
+    """Thread-safe counters for connection checkouts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.waits = 0
+            self.timeouts = 0
+            self.total_checkout_ms = 0.0
+            self.max_checkout_ms = 0.0
+            self.buckets = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+
+    def record(self, elapsed_ms, waited, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.waits += int(waited)
+            self.total_checkout_ms += elapsed_ms
+            self.max_checkout_ms = max(self.max_checkout_ms, elapsed_ms)
+            for i, bound in enumerate(CHECKOUT_BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    self.buckets[i] += 1
+                    break
+            else:
+                self.buckets[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f'le_{bound}ms' for bound in CHECKOUT_BUCKETS_MS] + ['gt_max']
+            return {
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'avg_checkout_ms': round(self.total_checkout_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_checkout_ms': round(self.max_checkout_ms, 3),
+                'checkout_latency_histogram': dict(zip(labels, self.buckets)),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout and counts those that had to wait"""
+
+    def _do_get(self):
+        # A checkout waits when nothing is idle and no overflow slot is left
+        waited = self.checkedin() == 0 and self.overflow() >= self._max_overflow
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            pool_metrics.record(0.0, waited, timed_out=True)
+            raise
+        pool_metrics.record((time.perf_counter() - start) * 1000, waited)
+        return conn
+
+
+def build_engine(url):
+    """Create the engine using the pool/echo/timeout settings above"""
+    url = make_url(url)
+    options = {'echo': DB_ECHO, 'pool_pre_ping': DB_POOL_PRE_PING}
+
+    # In-memory SQLite must keep its single shared connection
+    if not (url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+
+    new_engine = create_engine(url, **options)
+
+    if DB_STATEMENT_TIMEOUT and url.get_backend_name() == 'postgresql':
+        @event.listens_for(new_engine, 'connect')
+        def set_statement_timeout(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f'SET statement_timeout = {int(DB_STATEMENT_TIMEOUT)}')
+            cursor.close()
+            dbapi_connection.commit()
+
+    return new_engine
+
+
+def pool_stats():
+    """Live connection pool statistics for sizing the pool under load"""
+    pool = engine.pool
+    stats = {
+        'pool_class': type(pool).__name__,
+        'status': pool.status(),
+    }
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+        )
+    stats.update(pool_metrics.snapshot())
+    return stats
+
+
+engine = build_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
@@ -0,0 +1,145 @@
+"""
+Caregiver earnings summary: one caregiver_earnings row per caregiver with the
+count, total hours and total earnings of its accepted appointments, so the
+earnings reports read O(caregivers) rows instead of aggregating appointments.
+
+Rows are adjusted incrementally inside the flush by ORM events on Appointment
+(insert/update/delete) and Caregiver (insert, hourly_rate changes, delete).
+Core statements bypass those events, so the bulk paths (purge.py,
+pricing.py, the loaders in init_db.py) call refresh_caregiver_earnings() or
+refresh_earnings_rates() themselves.
+"""
+
+from decimal import Decimal
+from sqlalchemy import and_, delete, event, func, insert, inspect, select, update
+from models import Caregiver, Appointment, CaregiverEarnings
+
+ACCEPTED = 'accepted'
+
+earnings_table = CaregiverEarnings.__table__
+
+
+def _current_rate(caregiver_id):
+    return select(Caregiver.hourly_rate).where(
+        Caregiver.caregiver_user_id == caregiver_id
+    ).scalar_subquery()
+
+
+def refresh_caregiver_earnings(db, caregiver_ids=None):
+    """Rebuild summary rows from appointments, for every caregiver or only the given ids
+
+    `db` may be a Session or a Connection; the caller commits.
+    """
+    accepted = and_(
+        Appointment.caregiver_user_id == Caregiver.caregiver_user_id,
+        Appointment.status == ACCEPTED
+    )
+    total_hours = func.coalesce(func.sum(Appointment.work_hours), 0)
+    rows = select(
+        Caregiver.caregiver_user_id,
+        func.count(Appointment.appointment_id),
+        total_hours,
+        total_hours * Caregiver.hourly_rate
+    ).outerjoin(Appointment, accepted).group_by(
+        Caregiver.caregiver_user_id, Caregiver.hourly_rate
+    )
+    clear = delete(earnings_table)
+    if caregiver_ids is not None:
+        caregiver_ids = list(caregiver_ids)
+        if not caregiver_ids:
+            return
+        rows = rows.where(Caregiver.caregiver_user_id.in_(caregiver_ids))
+        clear = clear.where(earnings_table.c.caregiver_user_id.in_(caregiver_ids))
+    db.execute(clear)
+    db.execute(insert(earnings_table).from_select(
+        ['caregiver_user_id', 'accepted_appointments', 'total_hours', 'total_earnings'], rows
+    ))
+
+
+def refresh_earnings_rates(db):
+    """Recompute total_earnings at current hourly rates after a bulk rate change"""
+    db.execute(update(earnings_table).values(
+        total_earnings=earnings_table.c.total_hours * _current_rate(earnings_table.c.caregiver_user_id)
+    ))
+
+
+def _adjust(connection, caregiver_id, appointments, hours):
+    """Add (or with negative values, remove) accepted appointments to a caregiver's row"""
+    new_hours = earnings_table.c.total_hours + hours
+    result = connection.execute(
+        update(earnings_table)
+        .where(earnings_table.c.caregiver_user_id == caregiver_id)
+        .values(
+            accepted_appointments=earnings_table.c.accepted_appointments + appointments,
+            total_hours=new_hours,
+            total_earnings=new_hours * _current_rate(caregiver_id)
+        )
+    )
+    if result.rowcount == 0:
+        # No row yet (caregiver created before the summary existed): build it
+        refresh_caregiver_earnings(connection, [caregiver_id])
+
+
+def _contribution(caregiver_id, work_hours, status):
+    """(caregiver id, hours) an appointment adds to the summary, or None"""
+    # Values set from forms are still strings until the object is refreshed
+    if status != ACCEPTED:
+        return None
+    return int(caregiver_id), Decimal(str(work_hours))
+
+
+def _previous(state, key):
+    history = state.attrs[key].history
+    return history.deleted[0] if history.deleted else getattr(state.object, key)
+
+
+@event.listens_for(Appointment, 'after_insert')
+def appointment_inserted(mapper, connection, target):
+    new = _contribution(target.caregiver_user_id, target.work_hours, target.status)
+    if new:
+        _adjust(connection, new[0], 1, new[1])
+
+
+@event.listens_for(Appointment, 'after_delete')
+def appointment_deleted(mapper, connection, target):
+    old = _contribution(target.caregiver_user_id, target.work_hours, target.status)
+    if old:
+        _adjust(connection, old[0], -1, -old[1])
+
+
+@event.listens_for(Appointment, 'after_update')
+def appointment_updated(mapper, connection, target):
+    state = inspect(target)
+    old = _contribution(*(_previous(state, key) for key in ('caregiver_user_id', 'work_hours', 'status')))
+    new = _contribution(target.caregiver_user_id, target.work_hours, target.status)
+    if old == new:
+        return
+    if old:
+        _adjust(connection, old[0], -1, -old[1])
+    if new:
+        _adjust(connection, new[0], 1, new[1])
+
+
+@event.listens_for(Caregiver, 'after_insert')
+def caregiver_inserted(mapper, connection, target):
+    connection.execute(insert(earnings_table).values(
+        caregiver_user_id=target.caregiver_user_id,
+        accepted_appointments=0, total_hours=0, total_earnings=0
+    ))
+
+
+@event.listens_for(Caregiver, 'after_update')
+def caregiver_updated(mapper, connection, target):
+    if inspect(target).attrs.hourly_rate.history.has_changes():
+        connection.execute(
+            update(earnings_table)
+            .where(earnings_table.c.caregiver_user_id == target.caregiver_user_id)
+            .values(total_earnings=earnings_table.c.total_hours * _current_rate(target.caregiver_user_id))
+        )
+
+
+@event.listens_for(Caregiver, 'before_delete')
+def caregiver_deleted(mapper, connection, target):
+    connection.execute(delete(earnings_table).where(
+        earnings_table.c.caregiver_user_id == target.caregiver_user_id
+    ))
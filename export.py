@@ -0,0 +1,170 @@
+"""
+Streaming CSV / JSON exports of whole tables.
+
+export_query() builds one SELECT per entity (joined with the names the list
+pages show) with the report filters applied: appointment status, caregiving
+type and a date range. export_rows() runs it with yield_per, which makes
+SQLAlchemy use a server-side cursor (stream_results) and fetch
+EXPORT_BATCH_SIZE rows at a time. csv_chunks() / json_chunks() turn those
+rows into text one batch at a time, so memory use does not grow with the
+table.
+"""
+
+import csv
+import io
+import json
+from datetime import date, time
+from decimal import Decimal
+from sqlalchemy import exists, select
+from sqlalchemy.orm import aliased
+from database import env_int
+from models import User, Caregiver, Job, JobApplication, Appointment
+
+EXPORT_BATCH_SIZE = env_int('EXPORT_BATCH_SIZE', 1000)  # rows fetched and written per chunk
+EXPORT_FORMATS = ('csv', 'json')
+
+
+def _users():
+    # Every column except the password hash
+    return select(User.user_id, User.email, User.given_name, User.surname, User.city,
+                  User.phone_number, User.profile_description).order_by(User.user_id)
+
+
+def _caregivers():
+    return select(
+        Caregiver.caregiver_user_id, User.given_name, User.surname, User.city,
+        Caregiver.gender, Caregiver.caregiving_type, Caregiver.hourly_rate
+    ).join(User, User.user_id == Caregiver.caregiver_user_id).order_by(Caregiver.caregiver_user_id)
+
+
+def _jobs():
+    return select(
+        Job.job_id, Job.member_user_id, User.given_name.label('member_given_name'),
+        User.surname.label('member_surname'), Job.required_caregiving_type,
+        Job.other_requirements, Job.date_posted
+    ).join(User, User.user_id == Job.member_user_id).order_by(Job.job_id)
+
+
+def _applications():
+    caregiver_user = aliased(User, name='caregiver_user')
+    member_user = aliased(User, name='member_user')
+    return select(
+        JobApplication.caregiver_user_id,
+        caregiver_user.given_name.label('caregiver_given_name'),
+        caregiver_user.surname.label('caregiver_surname'),
+        JobApplication.job_id, Job.required_caregiving_type, Job.member_user_id,
+        member_user.given_name.label('member_given_name'),
+        member_user.surname.label('member_surname'),
+        JobApplication.date_applied
+    ).join(
+        Job, Job.job_id == JobApplication.job_id
+    ).join(
+        member_user, member_user.user_id == Job.member_user_id
+    ).join(
+        caregiver_user, caregiver_user.user_id == JobApplication.caregiver_user_id
+    ).order_by(JobApplication.job_id, JobApplication.caregiver_user_id)
+
+
+def _appointments():
+    caregiver_user = aliased(User, name='caregiver_user')
+    member_user = aliased(User, name='member_user')
+    return select(
+        Appointment.appointment_id, Appointment.appointment_date, Appointment.appointment_time,
+        Appointment.work_hours, Appointment.status, Appointment.caregiver_user_id,
+        caregiver_user.given_name.label('caregiver_given_name'),
+        caregiver_user.surname.label('caregiver_surname'),
+        Appointment.member_user_id,
+        member_user.given_name.label('member_given_name'),
+        member_user.surname.label('member_surname')
+    ).join(
+        caregiver_user, caregiver_user.user_id == Appointment.caregiver_user_id
+    ).join(
+        member_user, member_user.user_id == Appointment.member_user_id
+    ).order_by(Appointment.appointment_id)
+
+
+# entity -> (base query, status column, caregiving type condition, date column)
+EXPORTS = {
+    'users': (_users, None,
+              lambda value: exists().where(Caregiver.caregiver_user_id == User.user_id,
+                                           Caregiver.caregiving_type == value),
+              None),
+    'caregivers': (_caregivers, None, lambda value: Caregiver.caregiving_type == value, None),
+    'jobs': (_jobs, None, lambda value: Job.required_caregiving_type == value, Job.date_posted),
+    'applications': (_applications, None, lambda value: Job.required_caregiving_type == value,
+                     JobApplication.date_applied),
+    'appointments': (_appointments, Appointment.status,
+                     lambda value: exists().where(Caregiver.caregiver_user_id == Appointment.caregiver_user_id,
+                                                  Caregiver.caregiving_type == value),
+                     Appointment.appointment_date),
+}
+
+
+def export_query(entity, status=None, caregiving_type=None, date_from=None, date_to=None):
+    """SELECT for exporting `entity` with the given filters, in primary key order
+
+    Raises KeyError for an unknown entity and ValueError for a filter the
+    entity does not have (e.g. status on jobs, dates on users).
+    """
+    build, status_column, type_condition, date_column = EXPORTS[entity]
+    query = build()
+    if status is not None:
+        if status_column is None:
+            raise ValueError(f'{entity} cannot be filtered by status')
+        query = query.where(status_column == status)
+    if caregiving_type is not None:
+        query = query.where(type_condition(caregiving_type))
+    if date_from is not None or date_to is not None:
+        if date_column is None:
+            raise ValueError(f'{entity} cannot be filtered by date')
+        if date_from is not None:
+            query = query.where(date_column >= date_from)
+        if date_to is not None:
+            query = query.where(date_column <= date_to)
+    return query
+
+
+def export_rows(db, query, batch_size=EXPORT_BATCH_SIZE):
+    """Stream the rows of `query` from a server-side cursor, `batch_size` at a time"""
+    return db.execute(query, execution_options={'yield_per': batch_size})
+
+
+def json_value(value):
+    """json.dumps() default for the date, time and Decimal columns"""
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def csv_chunks(result):
+    """Header line, then one chunk of CSV text per fetched batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(result.keys())
+    for batch in result.partitions():
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def json_chunks(result):
+    """A JSON array of objects, one chunk per fetched batch"""
+    keys = list(result.keys())
+    yield '['
+    first = True
+    for batch in result.partitions():
+        items = [json.dumps(dict(zip(keys, row)), default=json_value) for row in batch]
+        yield ('' if first else ',') + ','.join(items)
+        first = False
+    yield ']'
+
+
+def export_chunks(db, entity, fmt='csv', **filters):
+    """Text chunks of `entity` exported as `fmt` ('csv' or 'json')"""
+    result = export_rows(db, export_query(entity, **filters))
+    return csv_chunks(result) if fmt == 'csv' else json_chunks(result)
@@ -1,6 +1,21 @@
-from datetime import date, time
+import argparse
+import csv
+import io
+import os
+import random
+from datetime import date, time, timedelta
+from decimal import Decimal
+from sqlalchemy import insert, text
+from werkzeug.security import generate_password_hash
 from database import engine, SessionLocal
-from models import Base, User, Caregiver, Member, Address, Job, JobApplication, Appointment
+from earnings import refresh_caregiver_earnings
+from search import ensure_search_index
+from models import Base, User, Caregiver, Member, Address, Job, JobApplication, Appointment, CaregiverEarnings
+
+# Seed passwords are throwaway; in development skip the deliberately slow default hash
+SEED_PASSWORD_METHOD = os.getenv('SEED_PASSWORD_METHOD') or (
+    'pbkdf2:sha256:1000' if os.getenv('FLASK_ENV') == 'development' else 'scrypt'
+)
 
 def drop_all_tables():
     """Drop all tables"""
@@ -14,6 +29,39 @@ def create_all_tables():
     Base.metadata.create_all(bind=engine)
     print("All tables created.")
 
+def create_indexes():
+    """Create any secondary indexes declared in models.py that are missing (existing databases)"""
+    print("Creating missing indexes...")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    print("Indexes up to date.")
+
+def build_earnings_summary():
+    """Create caregiver_earnings if missing and rebuild it from appointments (existing databases)"""
+    print("Rebuilding caregiver_earnings...")
+    CaregiverEarnings.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        refresh_caregiver_earnings(db)
+        db.commit()
+    finally:
+        db.close()
+    print("caregiver_earnings up to date.")
+
+def build_search_index():
+    """Create the SQLite full-text index if missing and refill it (existing databases)"""
+    print("Rebuilding search index...")
+    with engine.begin() as conn:
+        if ensure_search_index(conn):
+            print("search_index up to date.")
+        else:
+            print("Nothing to do: PostgreSQL uses the GIN indexes from create_indexes().")
+
+def hash_seed_password(password):
+    """Hash a seed password with SEED_PASSWORD_METHOD (cheap by default in development)"""
+    return generate_password_hash(password, method=SEED_PASSWORD_METHOD)
+
 def insert_sample_data():
     """Insert sample data into all tables"""
     db = SessionLocal()
@@ -88,227 +136,191 @@ def insert_sample_data():
              "profile_description": "Need reliable babysitter urgently.", "password": "pass123"},
         ]
         
-        users = []
         for user_data in users_data:
-            password = user_data.pop('password')
-            user = User(**user_data)
-            user.set_password(password)
-            db.add(user)
-            users.append(user)
+            user_data['password'] = hash_seed_password(user_data['password'])
         
-        db.commit()
-        print(f"Inserted {len(users)} users.")
-        
-        # Refresh to get IDs
-        for user in users:
-            db.refresh(user)
+        # Generated IDs come back in the same round trip, in parameter order
+        user_ids = db.scalars(
+            insert(User).returning(User.user_id, sort_by_parameter_order=True), users_data
+        ).all()
+        print(f"Inserted {len(user_ids)} users.")
         
         # Insert Caregivers (first 10 users are caregivers)
         caregivers_data = [
-            {"caregiver_user_id": users[0].user_id, "photo": "sarah_photo.jpg", "gender": "Female", 
+            {"caregiver_user_id": user_ids[0], "photo": "sarah_photo.jpg", "gender": "Female", 
              "caregiving_type": "Babysitter", "hourly_rate": 12.50},
-            {"caregiver_user_id": users[1].user_id, "photo": "mike_photo.jpg", "gender": "Male", 
+            {"caregiver_user_id": user_ids[1], "photo": "mike_photo.jpg", "gender": "Male", 
              "caregiving_type": "Elderly Care", "hourly_rate": 15.00},
-            {"caregiver_user_id": users[2].user_id, "photo": "emma_photo.jpg", "gender": "Female", 
+            {"caregiver_user_id": user_ids[2], "photo": "emma_photo.jpg", "gender": "Female", 
              "caregiving_type": "Playmate", "hourly_rate": 10.00},
-            {"caregiver_user_id": users[3].user_id, "photo": "david_photo.jpg", "gender": "Male", 
+            {"caregiver_user_id": user_ids[3], "photo": "david_photo.jpg", "gender": "Male", 
              "caregiving_type": "Babysitter", "hourly_rate": 11.00},
-            {"caregiver_user_id": users[4].user_id, "photo": "lisa_photo.jpg", "gender": "Female", 
+            {"caregiver_user_id": user_ids[4], "photo": "lisa_photo.jpg", "gender": "Female", 
              "caregiving_type": "Elderly Care", "hourly_rate": 16.50},
-            {"caregiver_user_id": users[5].user_id, "photo": "john_photo.jpg", "gender": "Male", 
+            {"caregiver_user_id": user_ids[5], "photo": "john_photo.jpg", "gender": "Male", 
              "caregiving_type": "Playmate", "hourly_rate": 9.50},
-            {"caregiver_user_id": users[6].user_id, "photo": "anna_photo.jpg", "gender": "Female", 
+            {"caregiver_user_id": user_ids[6], "photo": "anna_photo.jpg", "gender": "Female", 
              "caregiving_type": "Babysitter", "hourly_rate": 13.00},
-            {"caregiver_user_id": users[7].user_id, "photo": "robert_photo.jpg", "gender": "Male", 
+            {"caregiver_user_id": user_ids[7], "photo": "robert_photo.jpg", "gender": "Male", 
              "caregiving_type": "Elderly Care", "hourly_rate": 14.00},
-            {"caregiver_user_id": users[8].user_id, "photo": "maria_photo.jpg", "gender": "Female", 
+            {"caregiver_user_id": user_ids[8], "photo": "maria_photo.jpg", "gender": "Female", 
              "caregiving_type": "Playmate", "hourly_rate": 8.50},
-            {"caregiver_user_id": users[9].user_id, "photo": "james_photo.jpg", "gender": "Male", 
+            {"caregiver_user_id": user_ids[9], "photo": "james_photo.jpg", "gender": "Male", 
              "caregiving_type": "Babysitter", "hourly_rate": 12.00},
         ]
         
-        caregivers = []
-        for caregiver_data in caregivers_data:
-            caregiver = Caregiver(**caregiver_data)
-            db.add(caregiver)
-            caregivers.append(caregiver)
-        
-        db.commit()
-        print(f"Inserted {len(caregivers)} caregivers.")
+        db.execute(insert(Caregiver), caregivers_data)
+        caregiver_ids = [c["caregiver_user_id"] for c in caregivers_data]
+        print(f"Inserted {len(caregiver_ids)} caregivers.")
         
         # Insert Members (last 10 users are members)
         members_data = [
-            {"member_user_id": users[10].user_id, "house_rules": "No smoking. No pets.", 
+            {"member_user_id": user_ids[10], "house_rules": "No smoking. No pets.", 
              "dependent_description": "5-year-old son who likes painting and reading."},
-            {"member_user_id": users[11].user_id, "house_rules": "Quiet environment preferred.", 
+            {"member_user_id": user_ids[11], "house_rules": "Quiet environment preferred.", 
              "dependent_description": "82-year-old mother with limited mobility."},
-            {"member_user_id": users[12].user_id, "house_rules": "Must be punctual. No pets.", 
+            {"member_user_id": user_ids[12], "house_rules": "Must be punctual. No pets.", 
              "dependent_description": "6-year-old daughter who loves outdoor activities."},
-            {"member_user_id": users[13].user_id, "house_rules": "Non-smoker only.", 
+            {"member_user_id": user_ids[13], "house_rules": "Non-smoker only.", 
              "dependent_description": "3-year-old twins, very energetic."},
-            {"member_user_id": users[14].user_id, "house_rules": "Experience with dementia required. No pets.", 
+            {"member_user_id": user_ids[14], "house_rules": "Experience with dementia required. No pets.", 
              "dependent_description": "78-year-old grandmother with early-stage dementia."},
-            {"member_user_id": users[15].user_id, "house_rules": "Pets friendly.", 
+            {"member_user_id": user_ids[15], "house_rules": "Pets friendly.", 
              "dependent_description": "Two children aged 4 and 7, love playing games."},
-            {"member_user_id": users[16].user_id, "house_rules": "Must follow strict schedule.", 
+            {"member_user_id": user_ids[16], "house_rules": "Must follow strict schedule.", 
              "dependent_description": "8-month-old baby girl and 3-year-old boy."},
-            {"member_user_id": users[17].user_id, "house_rules": "Medical background preferred.", 
+            {"member_user_id": user_ids[17], "house_rules": "Medical background preferred.", 
              "dependent_description": "85-year-old father with diabetes."},
-            {"member_user_id": users[18].user_id, "house_rules": "Outdoor play encouraged. No pets.", 
+            {"member_user_id": user_ids[18], "house_rules": "Outdoor play encouraged. No pets.", 
              "dependent_description": "5-year-old boy who loves sports."},
-            {"member_user_id": users[19].user_id, "house_rules": "Must be reliable and on time.", 
+            {"member_user_id": user_ids[19], "house_rules": "Must be reliable and on time.", 
              "dependent_description": "2-year-old daughter, very curious and active."},
         ]
         
-        members = []
-        for member_data in members_data:
-            member = Member(**member_data)
-            db.add(member)
-            members.append(member)
-        
-        db.commit()
-        print(f"Inserted {len(members)} members.")
+        db.execute(insert(Member), members_data)
+        member_ids = [m["member_user_id"] for m in members_data]
+        print(f"Inserted {len(member_ids)} members.")
         
         # Insert Addresses (one for each member)
         addresses_data = [
-            {"member_user_id": members[0].member_user_id, "house_number": "15", "street": "Kabanbay Batyr", "town": "Esil District"},
-            {"member_user_id": members[1].member_user_id, "house_number": "42", "street": "Abay Avenue", "town": "Almaly District"},
-            {"member_user_id": members[2].member_user_id, "house_number": "7", "street": "Mangilik El", "town": "Esil District"},
-            {"member_user_id": members[3].member_user_id, "house_number": "88", "street": "Respublika Avenue", "town": "Central District"},
-            {"member_user_id": members[4].member_user_id, "house_number": "23", "street": "Syganak Street", "town": "Baykonur District"},
-            {"member_user_id": members[5].member_user_id, "house_number": "56", "street": "Dostyk Avenue", "town": "Medeu District"},
-            {"member_user_id": members[6].member_user_id, "house_number": "31", "street": "Turan Avenue", "town": "Esil District"},
-            {"member_user_id": members[7].member_user_id, "house_number": "99", "street": "Bukhar Zhyrau", "town": "Oktyabrsky District"},
-            {"member_user_id": members[8].member_user_id, "house_number": "12", "street": "Kabanbay Batyr", "town": "Saryarka District"},
-            {"member_user_id": members[9].member_user_id, "house_number": "67", "street": "Satpaev Street", "town": "Almaly District"},
+            {"member_user_id": member_ids[0], "house_number": "15", "street": "Kabanbay Batyr", "town": "Esil District"},
+            {"member_user_id": member_ids[1], "house_number": "42", "street": "Abay Avenue", "town": "Almaly District"},
+            {"member_user_id": member_ids[2], "house_number": "7", "street": "Mangilik El", "town": "Esil District"},
+            {"member_user_id": member_ids[3], "house_number": "88", "street": "Respublika Avenue", "town": "Central District"},
+            {"member_user_id": member_ids[4], "house_number": "23", "street": "Syganak Street", "town": "Baykonur District"},
+            {"member_user_id": member_ids[5], "house_number": "56", "street": "Dostyk Avenue", "town": "Medeu District"},
+            {"member_user_id": member_ids[6], "house_number": "31", "street": "Turan Avenue", "town": "Esil District"},
+            {"member_user_id": member_ids[7], "house_number": "99", "street": "Bukhar Zhyrau", "town": "Oktyabrsky District"},
+            {"member_user_id": member_ids[8], "house_number": "12", "street": "Kabanbay Batyr", "town": "Saryarka District"},
+            {"member_user_id": member_ids[9], "house_number": "67", "street": "Satpaev Street", "town": "Almaly District"},
         ]
         
-        addresses = []
-        for address_data in addresses_data:
-            address = Address(**address_data)
-            db.add(address)
-            addresses.append(address)
-        
-        db.commit()
-        print(f"Inserted {len(addresses)} addresses.")
+        db.execute(insert(Address), addresses_data)
+        print(f"Inserted {len(addresses_data)} addresses.")
         
         # Insert Jobs (10 jobs from members)
         jobs_data = [
-            {"member_user_id": members[0].member_user_id, "required_caregiving_type": "Babysitter", 
+            {"member_user_id": member_ids[0], "required_caregiving_type": "Babysitter", 
              "other_requirements": "Looking for patient and soft-spoken babysitter. Must have experience with young children.", 
              "date_posted": date(2024, 11, 1)},
-            {"member_user_id": members[1].member_user_id, "required_caregiving_type": "Elderly Care", 
+            {"member_user_id": member_ids[1], "required_caregiving_type": "Elderly Care", 
              "other_requirements": "Need someone with medical background. Soft-spoken preferred.", 
              "date_posted": date(2024, 11, 2)},
-            {"member_user_id": members[2].member_user_id, "required_caregiving_type": "Playmate", 
+            {"member_user_id": member_ids[2], "required_caregiving_type": "Playmate", 
              "other_requirements": "Active person needed for outdoor activities.", 
              "date_posted": date(2024, 11, 3)},
-            {"member_user_id": members[3].member_user_id, "required_caregiving_type": "Babysitter", 
+            {"member_user_id": member_ids[3], "required_caregiving_type": "Babysitter", 
              "other_requirements": "Must be experienced with twins. Energy required!", 
              "date_posted": date(2024, 11, 4)},
-            {"member_user_id": members[4].member_user_id, "required_caregiving_type": "Elderly Care", 
+            {"member_user_id": member_ids[4], "required_caregiving_type": "Elderly Care", 
              "other_requirements": "Dementia care experience essential. Patient and soft-spoken.", 
              "date_posted": date(2024, 11, 5)},
-            {"member_user_id": members[5].member_user_id, "required_caregiving_type": "Playmate", 
+            {"member_user_id": member_ids[5], "required_caregiving_type": "Playmate", 
              "other_requirements": "Must love playing board games and outdoor sports.", 
              "date_posted": date(2024, 11, 6)},
-            {"member_user_id": members[6].member_user_id, "required_caregiving_type": "Babysitter", 
+            {"member_user_id": member_ids[6], "required_caregiving_type": "Babysitter", 
              "other_requirements": "Need someone reliable for evening hours.", 
              "date_posted": date(2024, 11, 7)},
-            {"member_user_id": members[7].member_user_id, "required_caregiving_type": "Elderly Care", 
+            {"member_user_id": member_ids[7], "required_caregiving_type": "Elderly Care", 
              "other_requirements": "Diabetes management knowledge required.", 
              "date_posted": date(2024, 11, 8)},
-            {"member_user_id": members[8].member_user_id, "required_caregiving_type": "Playmate", 
+            {"member_user_id": member_ids[8], "required_caregiving_type": "Playmate", 
              "other_requirements": "Sports enthusiast preferred. Outdoor activities.", 
              "date_posted": date(2024, 11, 9)},
-            {"member_user_id": members[9].member_user_id, "required_caregiving_type": "Babysitter", 
+            {"member_user_id": member_ids[9], "required_caregiving_type": "Babysitter", 
              "other_requirements": "Morning hours, must be punctual and soft-spoken.", 
              "date_posted": date(2024, 11, 10)},
         ]
         
-        jobs = []
-        for job_data in jobs_data:
-            job = Job(**job_data)
-            db.add(job)
-            jobs.append(job)
-        
-        db.commit()
-        print(f"Inserted {len(jobs)} jobs.")
-        
-        # Refresh to get IDs
-        for job in jobs:
-            db.refresh(job)
+        job_ids = db.scalars(
+            insert(Job).returning(Job.job_id, sort_by_parameter_order=True), jobs_data
+        ).all()
+        print(f"Inserted {len(job_ids)} jobs.")
         
         # Insert Job Applications (multiple applications per job)
         job_applications_data = [
             # Job 1 applications
-            {"caregiver_user_id": caregivers[0].caregiver_user_id, "job_id": jobs[0].job_id, "date_applied": date(2024, 11, 2)},
-            {"caregiver_user_id": caregivers[3].caregiver_user_id, "job_id": jobs[0].job_id, "date_applied": date(2024, 11, 3)},
-            {"caregiver_user_id": caregivers[6].caregiver_user_id, "job_id": jobs[0].job_id, "date_applied": date(2024, 11, 4)},
+            {"caregiver_user_id": caregiver_ids[0], "job_id": job_ids[0], "date_applied": date(2024, 11, 2)},
+            {"caregiver_user_id": caregiver_ids[3], "job_id": job_ids[0], "date_applied": date(2024, 11, 3)},
+            {"caregiver_user_id": caregiver_ids[6], "job_id": job_ids[0], "date_applied": date(2024, 11, 4)},
             # Job 2 applications
-            {"caregiver_user_id": caregivers[1].caregiver_user_id, "job_id": jobs[1].job_id, "date_applied": date(2024, 11, 3)},
-            {"caregiver_user_id": caregivers[4].caregiver_user_id, "job_id": jobs[1].job_id, "date_applied": date(2024, 11, 4)},
+            {"caregiver_user_id": caregiver_ids[1], "job_id": job_ids[1], "date_applied": date(2024, 11, 3)},
+            {"caregiver_user_id": caregiver_ids[4], "job_id": job_ids[1], "date_applied": date(2024, 11, 4)},
             # Job 3 applications
-            {"caregiver_user_id": caregivers[2].caregiver_user_id, "job_id": jobs[2].job_id, "date_applied": date(2024, 11, 4)},
-            {"caregiver_user_id": caregivers[5].caregiver_user_id, "job_id": jobs[2].job_id, "date_applied": date(2024, 11, 5)},
+            {"caregiver_user_id": caregiver_ids[2], "job_id": job_ids[2], "date_applied": date(2024, 11, 4)},
+            {"caregiver_user_id": caregiver_ids[5], "job_id": job_ids[2], "date_applied": date(2024, 11, 5)},
             # Job 4 applications
-            {"caregiver_user_id": caregivers[0].caregiver_user_id, "job_id": jobs[3].job_id, "date_applied": date(2024, 11, 5)},
-            {"caregiver_user_id": caregivers[9].caregiver_user_id, "job_id": jobs[3].job_id, "date_applied": date(2024, 11, 6)},
+            {"caregiver_user_id": caregiver_ids[0], "job_id": job_ids[3], "date_applied": date(2024, 11, 5)},
+            {"caregiver_user_id": caregiver_ids[9], "job_id": job_ids[3], "date_applied": date(2024, 11, 6)},
             # Job 5 applications
-            {"caregiver_user_id": caregivers[7].caregiver_user_id, "job_id": jobs[4].job_id, "date_applied": date(2024, 11, 6)},
+            {"caregiver_user_id": caregiver_ids[7], "job_id": job_ids[4], "date_applied": date(2024, 11, 6)},
             # Job 6 applications
-            {"caregiver_user_id": caregivers[8].caregiver_user_id, "job_id": jobs[5].job_id, "date_applied": date(2024, 11, 7)},
-            {"caregiver_user_id": caregivers[2].caregiver_user_id, "job_id": jobs[5].job_id, "date_applied": date(2024, 11, 8)},
+            {"caregiver_user_id": caregiver_ids[8], "job_id": job_ids[5], "date_applied": date(2024, 11, 7)},
+            {"caregiver_user_id": caregiver_ids[2], "job_id": job_ids[5], "date_applied": date(2024, 11, 8)},
             # Job 7 applications
-            {"caregiver_user_id": caregivers[6].caregiver_user_id, "job_id": jobs[6].job_id, "date_applied": date(2024, 11, 8)},
+            {"caregiver_user_id": caregiver_ids[6], "job_id": job_ids[6], "date_applied": date(2024, 11, 8)},
             # Job 8 applications
-            {"caregiver_user_id": caregivers[1].caregiver_user_id, "job_id": jobs[7].job_id, "date_applied": date(2024, 11, 9)},
-            {"caregiver_user_id": caregivers[4].caregiver_user_id, "job_id": jobs[7].job_id, "date_applied": date(2024, 11, 10)},
+            {"caregiver_user_id": caregiver_ids[1], "job_id": job_ids[7], "date_applied": date(2024, 11, 9)},
+            {"caregiver_user_id": caregiver_ids[4], "job_id": job_ids[7], "date_applied": date(2024, 11, 10)},
         ]
         
-        job_applications = []
-        for app_data in job_applications_data:
-            application = JobApplication(**app_data)
-            db.add(application)
-            job_applications.append(application)
-        
-        db.commit()
-        print(f"Inserted {len(job_applications)} job applications.")
+        db.execute(insert(JobApplication), job_applications_data)
+        print(f"Inserted {len(job_applications_data)} job applications.")
         
         # Insert Appointments (mix of pending, accepted, declined)
         appointments_data = [
-            {"caregiver_user_id": caregivers[0].caregiver_user_id, "member_user_id": members[0].member_user_id, 
+            {"caregiver_user_id": caregiver_ids[0], "member_user_id": member_ids[0], 
              "appointment_date": date(2024, 11, 15), "appointment_time": time(9, 0), "work_hours": 4.0, "status": "accepted"},
-            {"caregiver_user_id": caregivers[1].caregiver_user_id, "member_user_id": members[1].member_user_id, 
+            {"caregiver_user_id": caregiver_ids[1], "member_user_id": member_ids[1], 
              "appointment_date": date(2024, 11, 16), "appointment_time": time(10, 0), "work_hours": 6.0, "status": "accepted"},
-            {"caregiver_user_id": caregivers[2].caregiver_user_id, "member_user_id": members[2].member_user_id, 
+            {"caregiver_user_id": caregiver_ids[2], "member_user_id": member_ids[2], 
              "appointment_date": date(2024, 11, 17), "appointment_time": time(14, 0), "work_hours": 3.0, "status": "accepted"},
-            {"caregiver_user_id": caregivers[3].caregiver_user_id, "member_user_id": members[3].member_user_id, 
+            {"caregiver_user_id": caregiver_ids[3], "member_user_id": member_ids[3], 
              "appointment_date": date(2024, 11, 18), "appointment_time": time(8, 0), "work_hours": 5.0, "status": "pending"},
-            {"caregiver_user_id": caregivers[4].caregiver_user_id, "member_user_id": members[4].member_user_id, 
+            {"caregiver_user_id": caregiver_ids[4], "member_user_id": member_ids[4], 
              "appointment_date": date(2024, 11, 19), "appointment_time": time(11, 0), "work_hours": 8.0, "status": "accepted"},
-            {"caregiver_user_id": caregivers[5].caregiver_user_id, "member_user_id": members[5].member_user_id, 
+            {"caregiver_user_id": caregiver_ids[5], "member_user_id": member_ids[5], 
              "appointment_date": date(2024, 11, 20), "appointment_time": time(15, 0), "work_hours": 2.5, "status": "declined"},
-            {"caregiver_user_id": caregivers[6].caregiver_user_id, "member_user_id": members[6].member_user_id, 
+            {"caregiver_user_id": caregiver_ids[6], "member_user_id": member_ids[6], 
              "appointment_date": date(2024, 11, 21), "appointment_time": time(18, 0), "work_hours": 4.0, "status": "accepted"},
-            {"caregiver_user_id": caregivers[7].caregiver_user_id, "member_user_id": members[7].member_user_id, 
+            {"caregiver_user_id": caregiver_ids[7], "member_user_id": member_ids[7], 
              "appointment_date": date(2024, 11, 22), "appointment_time": time(9, 30), "work_hours": 7.0, "status": "accepted"},
-            {"caregiver_user_id": caregivers[8].caregiver_user_id, "member_user_id": members[8].member_user_id, 
+            {"caregiver_user_id": caregiver_ids[8], "member_user_id": member_ids[8], 
              "appointment_date": date(2024, 11, 23), "appointment_time": time(13, 0), "work_hours": 3.5, "status": "pending"},
-            {"caregiver_user_id": caregivers[9].caregiver_user_id, "member_user_id": members[9].member_user_id, 
+            {"caregiver_user_id": caregiver_ids[9], "member_user_id": member_ids[9], 
              "appointment_date": date(2024, 11, 24), "appointment_time": time(7, 0), "work_hours": 5.5, "status": "accepted"},
-            {"caregiver_user_id": caregivers[0].caregiver_user_id, "member_user_id": members[2].member_user_id, 
+            {"caregiver_user_id": caregiver_ids[0], "member_user_id": member_ids[2], 
              "appointment_date": date(2024, 11, 25), "appointment_time": time(10, 0), "work_hours": 4.0, "status": "accepted"},
         ]
         
-        appointments = []
-        for appointment_data in appointments_data:
-            appointment = Appointment(**appointment_data)
-            db.add(appointment)
-            appointments.append(appointment)
+        db.execute(insert(Appointment), appointments_data)
+        print(f"Inserted {len(appointments_data)} appointments.")
+        
+        # Bulk inserts skip the ORM events that maintain the earnings summary
+        refresh_caregiver_earnings(db)
         
+        # All seven tables and the summary are loaded in a single transaction
         db.commit()
-        print(f"Inserted {len(appointments)} appointments.")
         
         print("\n=== Sample data insertion completed successfully! ===")
         
@@ -319,11 +331,233 @@ def insert_sample_data():
     finally:
         db.close()
 
+# =============================================================================
+# SYNTHETIC DATA GENERATOR (scale testing)
+# =============================================================================
+
+SYNTHETIC_CITIES = [("Astana", 30), ("Almaty", 30), ("Shymkent", 12), ("Karaganda", 8),
+                    ("Aktobe", 6), ("Taraz", 5), ("Pavlodar", 5), ("Oskemen", 4)]
+SYNTHETIC_GIVEN_NAMES = ["Aigerim", "Aruzhan", "Amina", "Dana", "Diana", "Zarina", "Aida", "Gulnara",
+                         "Sarah", "Emma", "Lisa", "Anna", "Maria", "Arman", "Nurlan", "Timur",
+                         "Yerlan", "Serik", "Daniyar", "Askar", "Mike", "David", "John", "Robert", "James"]
+SYNTHETIC_SURNAMES = ["Aminova", "Armanov", "Kim", "Bekov", "Saparova", "Omarov", "Sultanova", "Nazarov",
+                      "Tokayeva", "Mustafin", "Johnson", "Peterson", "Wilson", "Brown", "Anderson",
+                      "Martinez", "Taylor", "Thomas", "Garcia", "Lee", "Iskakov", "Zhumabayeva"]
+# caregiving type -> (weight, mean hourly rate, rate std deviation)
+SYNTHETIC_CAREGIVING_TYPES = {"Babysitter": (45, 12.0, 2.5), "Elderly Care": (35, 15.0, 3.0),
+                              "Playmate": (20, 10.0, 2.0)}
+SYNTHETIC_STATUSES = [("accepted", 55), ("pending", 30), ("declined", 15)]
+SYNTHETIC_WORK_HOURS = [(2, 10), (3, 20), (4, 30), (5, 15), (6, 12), (8, 10), (10, 3)]
+SYNTHETIC_HOUSE_RULES = ["No smoking.", "No pets.", "Quiet environment preferred.", "Must be punctual.",
+                         "Non-smoker only.", "Pets friendly.", "Must follow strict schedule.",
+                         "Outdoor play encouraged.", "Medical background preferred."]
+SYNTHETIC_REQUIREMENTS = ["Looking for a patient and soft-spoken caregiver.", "Must have first aid training.",
+                          "Experience with young children required.", "Dementia care experience essential.",
+                          "Evening hours, must be reliable.", "Sports enthusiast preferred.",
+                          "Must be punctual and soft-spoken.", "Diabetes management knowledge required."]
+SYNTHETIC_STREETS = ["Kabanbay Batyr", "Abay Avenue", "Mangilik El", "Respublika Avenue", "Syganak Street",
+                     "Dostyk Avenue", "Turan Avenue", "Bukhar Zhyrau", "Satpaev Street", "Tole Bi"]
+SYNTHETIC_TOWNS = ["Esil District", "Almaly District", "Central District", "Baykonur District",
+                   "Medeu District", "Saryarka District", "Oktyabrsky District"]
+SYNTHETIC_START_DATE = date(2023, 1, 1)
+SYNTHETIC_DAYS = 730
+
+
+def _weighted(rng, choices):
+    """Pick a value from [(value, weight), ...]"""
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _chunked(rows, size):
+    """Group an iterator of rows into lists of at most size rows"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _copy_rows(conn, table, batch):
+    """Load one batch with PostgreSQL COPY FROM STDIN (psycopg2 only)"""
+    columns = list(batch[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow(['\\N' if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _load(conn, model, rows, chunk_size, use_copy):
+    """Stream rows into model's table in chunks; returns the row count"""
+    table = model.__table__
+    count = 0
+    for batch in _chunked(rows, chunk_size):
+        if use_copy:
+            _copy_rows(conn, table, batch)
+        else:
+            conn.execute(insert(table), batch)
+        count += len(batch)
+    return count
+
+
+def generate_synthetic_data(users=10000, caregiver_share=0.5, jobs_per_member=2, apps_per_job=3,
+                            appointments_per_member=2, seed=42, chunk_size=10000, bind=None):
+    """Load a seeded, deterministic synthetic dataset into empty tables
+
+    Users 1..C are caregivers and C+1..users are members, so foreign keys can
+    be sampled from id ranges without holding any rows in memory. Per-member
+    and per-job counts vary uniformly around the requested means. Rows are
+    streamed in chunk_size batches through executemany inserts, or COPY on
+    PostgreSQL with psycopg2, inside a single transaction.
+    Returns the number of rows loaded per table.
+    """
+    bind = bind or engine
+    caregivers = max(1, min(users - 1, int(users * caregiver_share)))
+    first_member = caregivers + 1
+    type_choices = [(name, weight) for name, (weight, _, _) in SYNTHETIC_CAREGIVING_TYPES.items()]
+    # One shared hash: hashing a million passwords would dominate the load time
+    password_hash = hash_seed_password("pass123")
+
+    def rng(table):
+        return random.Random(f"{seed}-{table}")
+
+    def user_rows():
+        r = rng("users")
+        for user_id in range(1, users + 1):
+            given_name, surname = r.choice(SYNTHETIC_GIVEN_NAMES), r.choice(SYNTHETIC_SURNAMES)
+            role = "Caregiver" if user_id < first_member else "Family member"
+            yield {"user_id": user_id,
+                   "email": f"{given_name}.{surname}.{user_id}@example.com".lower(),
+                   "given_name": given_name, "surname": surname,
+                   "city": _weighted(r, SYNTHETIC_CITIES),
+                   "phone_number": f"+7701{user_id:07d}",
+                   "profile_description": f"{role} from the synthetic dataset.",
+                   "password": password_hash}
+
+    def caregiver_rows():
+        r = rng("caregivers")
+        for user_id in range(1, first_member):
+            caregiving_type = _weighted(r, type_choices)
+            _, mean, std = SYNTHETIC_CAREGIVING_TYPES[caregiving_type]
+            rate = max(7.0, r.gauss(mean, std))
+            yield {"caregiver_user_id": user_id, "photo": f"caregiver_{user_id}.jpg",
+                   "gender": r.choice(["Female", "Male"]), "caregiving_type": caregiving_type,
+                   "hourly_rate": Decimal(f"{rate:.2f}")}
+
+    def member_rows():
+        r = rng("members")
+        for user_id in range(first_member, users + 1):
+            rules = r.sample(SYNTHETIC_HOUSE_RULES, r.randint(1, 3))
+            yield {"member_user_id": user_id, "house_rules": " ".join(rules),
+                   "dependent_description": f"Dependent aged {r.randint(1, 95)}."}
+
+    def address_rows():
+        r = rng("addresses")
+        for user_id in range(first_member, users + 1):
+            yield {"member_user_id": user_id, "house_number": str(r.randint(1, 250)),
+                   "street": r.choice(SYNTHETIC_STREETS), "town": r.choice(SYNTHETIC_TOWNS)}
+
+    job_count = [0]
+
+    def job_rows():
+        r = rng("jobs")
+        for user_id in range(first_member, users + 1):
+            for _ in range(r.randint(0, 2 * jobs_per_member)):
+                job_count[0] += 1
+                yield {"job_id": job_count[0], "member_user_id": user_id,
+                       "required_caregiving_type": _weighted(r, type_choices),
+                       "other_requirements": r.choice(SYNTHETIC_REQUIREMENTS),
+                       "date_posted": SYNTHETIC_START_DATE + timedelta(days=r.randrange(SYNTHETIC_DAYS))}
+
+    def application_rows():
+        r = rng("job_applications")
+        for job_id in range(1, job_count[0] + 1):
+            applicants = min(caregivers, r.randint(0, 2 * apps_per_job))
+            for caregiver_id in r.sample(range(1, first_member), applicants):
+                yield {"caregiver_user_id": caregiver_id, "job_id": job_id,
+                       "date_applied": SYNTHETIC_START_DATE + timedelta(days=r.randrange(SYNTHETIC_DAYS))}
+
+    def appointment_rows():
+        r = rng("appointments")
+        appointment_id = 0
+        for member_id in range(first_member, users + 1):
+            for _ in range(r.randint(0, 2 * appointments_per_member)):
+                appointment_id += 1
+                yield {"appointment_id": appointment_id,
+                       "caregiver_user_id": r.randrange(1, first_member),
+                       "member_user_id": member_id,
+                       "appointment_date": SYNTHETIC_START_DATE + timedelta(days=r.randrange(SYNTHETIC_DAYS)),
+                       "appointment_time": time(r.randint(7, 20), r.choice([0, 30])),
+                       "work_hours": Decimal(_weighted(r, SYNTHETIC_WORK_HOURS)),
+                       "status": _weighted(r, SYNTHETIC_STATUSES)}
+
+    plan = [(User, user_rows), (Caregiver, caregiver_rows), (Member, member_rows),
+            (Address, address_rows), (Job, job_rows), (JobApplication, application_rows),
+            (Appointment, appointment_rows)]
+    counts = {}
+    with bind.begin() as conn:
+        use_copy = conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2"
+        for model, rows in plan:
+            counts[model.__tablename__] = _load(conn, model, rows(), chunk_size, use_copy)
+            print(f"Inserted {counts[model.__tablename__]} {model.__tablename__}.")
+        refresh_caregiver_earnings(conn)
+        print("Rebuilt caregiver_earnings.")
+
+        # Explicit ids bypass the serial sequences; move them past the loaded rows
+        if conn.dialect.name == "postgresql":
+            for table, column in (("users", "user_id"), ("jobs", "job_id"),
+                                  ("appointments", "appointment_id")):
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                    f"(SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}), false)"
+                ))
+    return counts
+
 def init_database():
     """Initialize database: drop existing tables, create new ones, and insert sample data"""
     drop_all_tables()
     create_all_tables()
     insert_sample_data()
 
+def init_synthetic_database(**options):
+    """Initialize database with a generated dataset instead of the sample data"""
+    drop_all_tables()
+    create_all_tables()
+    print("Generating synthetic data...")
+    generate_synthetic_data(**options)
+    print("\n=== Synthetic data generation completed successfully! ===")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Initialize the database with sample data, or a synthetic dataset when --users is given"
+    )
+    parser.add_argument("--users", type=int, help="generate this many users instead of the sample data")
+    parser.add_argument("--caregiver-share", type=float, default=0.5, help="fraction of users who are caregivers")
+    parser.add_argument("--jobs-per-member", type=int, default=2)
+    parser.add_argument("--apps-per-job", type=int, default=3)
+    parser.add_argument("--appointments-per-member", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows per insert batch")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    init_database()
+    args = parse_args()
+    if args.users:
+        init_synthetic_database(users=args.users, caregiver_share=args.caregiver_share,
+                                jobs_per_member=args.jobs_per_member, apps_per_job=args.apps_per_job,
+                                appointments_per_member=args.appointments_per_member,
+                                seed=args.seed, chunk_size=args.chunk_size)
+    else:
+        init_database()
@@ -0,0 +1,285 @@
+"""
+Per-request SQL instrumentation, slow-query log and Prometheus metrics.
+
+Cursor events on the application engine time every statement. Inside a
+request the statement count and database time accumulate on flask.g, and so
+does the time spent rendering templates (Flask's template signals). Each
+response carries them in a Server-Timing header, so browser dev tools show
+where a page's time went:
+
+    Server-Timing: db;dur=12.4;desc="7 statements", render;dur=3.1, total;dur=18.9
+
+When the request ends its totals are added to per-endpoint counters, which
+metrics_text() renders in the Prometheus text format for /metrics.
+
+A statement slower than SLOW_QUERY_MS is logged with its SQL normalized
+(literals and bind parameters become ?, IN lists collapse to one ?), so
+repeats of the same query with different values group together. The
+slowest statements are also kept in slow_query_log for /admin/slow-queries.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from flask import g, has_app_context, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from database import engine, env_bool, env_int, pool_stats
+
+SLOW_QUERY_MS = env_int('SLOW_QUERY_MS', 200)             # milliseconds, 0 disables the slow log
+SLOW_QUERY_LOG_SIZE = env_int('SLOW_QUERY_LOG_SIZE', 100)   # distinct statements kept
+SERVER_TIMING = env_bool('SERVER_TIMING', True)
+
+# Upper bounds (seconds) of the request duration histogram buckets
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+slow_query_logger = logging.getLogger('sql.slow')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM = re.compile(r'%\(\w+\)s|%s|:\w+|\$\d+|\?')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize_sql(statement):
+    """SQL with literals and parameters replaced by ?, IN lists collapsed and whitespace squeezed"""
+    sql = _STRING.sub('?', statement)
+    sql = _PARAM.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _LIST.sub('(?)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class SlowQueryLog:
+    """Thread-safe summary of slow statements by normalized SQL, most recent last"""
+
+    def __init__(self, maxsize=SLOW_QUERY_LOG_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.total = 0
+
+    def record(self, sql, elapsed_ms, endpoint):
+        with self._lock:
+            self.total += 1
+            entry = self._entries.pop(sql, None)
+            if entry is None:
+                entry = {'sql': sql, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'endpoints': set()}
+                if len(self._entries) >= self.maxsize:
+                    self._entries.popitem(last=False)
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['endpoints'].add(endpoint)
+            self._entries[sql] = entry
+
+    def snapshot(self):
+        """Entries by total time, slowest first"""
+        with self._lock:
+            entries = [dict(entry, endpoints=sorted(entry['endpoints'])) for entry in self._entries.values()]
+            total = self.total
+        for entry in entries:
+            entry['total_ms'] = round(entry['total_ms'], 3)
+            entry['max_ms'] = round(entry['max_ms'], 3)
+            entry['avg_ms'] = round(entry['total_ms'] / entry['count'], 3)
+        entries.sort(key=lambda entry: entry['total_ms'], reverse=True)
+        return {'threshold_ms': SLOW_QUERY_MS, 'slow_statements': total, 'statements': entries}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total = 0
+
+
+class RequestMetrics:
+    """Thread-safe per-endpoint request, statement and timing totals"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._responses = {}
+
+    def record(self, endpoint, method, status, total, db_time, statements, render_time):
+        with self._lock:
+            totals = self._endpoints.get(endpoint)
+            if totals is None:
+                totals = self._endpoints[endpoint] = {
+                    'requests': 0, 'seconds': 0.0, 'db_seconds': 0.0, 'statements': 0,
+                    'render_seconds': 0.0, 'buckets': [0] * (len(REQUEST_BUCKETS) + 1),
+                }
+            totals['requests'] += 1
+            totals['seconds'] += total
+            totals['db_seconds'] += db_time
+            totals['statements'] += statements
+            totals['render_seconds'] += render_time
+            for i, bound in enumerate(REQUEST_BUCKETS):
+                if total <= bound:
+                    totals['buckets'][i] += 1
+                    break
+            else:
+                totals['buckets'][-1] += 1
+            key = (endpoint, method, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {name: dict(totals, buckets=list(totals['buckets']))
+                         for name, totals in self._endpoints.items()}
+            return endpoints, dict(self._responses)
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._responses.clear()
+
+
+slow_query_log = SlowQueryLog()
+request_metrics = RequestMetrics()
+
+
+def _endpoint():
+    """Label for the current request's view ('none' outside a request)"""
+    if not has_request_context():
+        return 'none'
+    return request.endpoint or 'unmatched'
+
+
+# ==================== STATEMENT TIMING ====================
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_start', []).append(time.perf_counter())
+
+
+@event.listens_for(engine, 'after_cursor_execute')
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['statement_start'].pop()
+    if has_app_context() and 'sql_statements' in g:
+        g.sql_statements += 1
+        g.sql_seconds += elapsed
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        sql = normalize_sql(statement)
+        endpoint = _endpoint()
+        slow_query_log.record(sql, elapsed * 1000, endpoint)
+        slow_query_logger.warning('%.1f ms [%s] %s', elapsed * 1000, endpoint, sql)
+
+
+@event.listens_for(engine, 'handle_error')
+def _failed_statement(context):
+    # after_cursor_execute does not run for a statement that raised
+    starts = context.connection.info.get('statement_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+# ==================== REQUEST HOOKS ====================
+
+def _start_request():
+    g.request_start = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+    g.render_seconds = 0.0
+
+
+def _start_render(sender, template, context, **extra):
+    if 'render_seconds' in g:
+        g.render_start = time.perf_counter()
+
+
+def _end_render(sender, template, context, **extra):
+    if 'render_start' in g:
+        g.render_seconds += time.perf_counter() - g.pop('render_start')
+
+
+def _add_server_timing(response):
+    if 'request_start' not in g:
+        return response
+    g.response_status = response.status_code
+    if SERVER_TIMING:
+        total = time.perf_counter() - g.request_start
+        response.headers.add('Server-Timing', f'db;dur={g.sql_seconds * 1000:.1f};desc="{g.sql_statements} statements"')
+        response.headers.add('Server-Timing', f'render;dur={g.render_seconds * 1000:.1f}')
+        response.headers.add('Server-Timing', f'total;dur={total * 1000:.1f}')
+    return response
+
+
+def _record_request(exception=None):
+    # Runs after a streamed body has been sent, so its statements are counted too
+    if 'request_start' not in g:
+        return
+    status = g.pop('response_status', 500)
+    request_metrics.record(_endpoint(), request.method, status, time.perf_counter() - g.pop('request_start'),
+                           g.sql_seconds, g.sql_statements, g.render_seconds)
+
+
+def init_app(app):
+    """Time every request of `app` and add its Server-Timing header"""
+    app.before_request(_start_request)
+    app.after_request(_add_server_timing)
+    app.teardown_request(_record_request)
+    before_render_template.connect(_start_render, app)
+    template_rendered.connect(_end_render, app)
+
+
+# ==================== PROMETHEUS ====================
+
+def _labels(**labels):
+    return '{' + ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for name, value in labels.items()) + '}'
+
+
+def metrics_text():
+    """Request, statement, slow-query and connection pool metrics in the Prometheus text format"""
+    endpoints, responses = request_metrics.snapshot()
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    family('http_requests_total', 'counter', 'Requests handled, by endpoint, method and status.')
+    for (endpoint, method, status), count in sorted(responses.items()):
+        lines.append(f'http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+    family('http_request_duration_seconds', 'histogram', 'Request wall time, including streamed bodies.')
+    for endpoint, totals in sorted(endpoints.items()):
+        cumulative = 0
+        for bound, count in zip(REQUEST_BUCKETS + ('+Inf',), totals['buckets']):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=bound)} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{_labels(endpoint=endpoint)} {totals["seconds"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{_labels(endpoint=endpoint)} {totals["requests"]}')
+
+    for name, key, help_text in (
+        ('db_statements_total', 'statements', 'SQL statements executed while handling requests.'),
+        ('db_time_seconds_total', 'db_seconds', 'Time spent executing SQL statements.'),
+        ('template_render_seconds_total', 'render_seconds', 'Time spent rendering templates.'),
+    ):
+        family(name, 'counter', help_text + ' By endpoint.')
+        for endpoint, totals in sorted(endpoints.items()):
+            value = totals[key]
+            lines.append(f'{name}{_labels(endpoint=endpoint)} {value:.6f}' if isinstance(value, float)
+                         else f'{name}{_labels(endpoint=endpoint)} {value}')
+
+    family('db_slow_queries_total', 'counter', f'Statements slower than SLOW_QUERY_MS ({SLOW_QUERY_MS} ms).')
+    lines.append(f'db_slow_queries_total {slow_query_log.snapshot()["slow_statements"]}')
+
+    pool = pool_stats()
+    for name, key, help_text in (
+        ('db_pool_checkouts_total', 'checkouts', 'Connections checked out of the pool.'),
+        ('db_pool_waits_total', 'waits', 'Checkouts that had to wait for a connection.'),
+        ('db_pool_timeouts_total', 'timeouts', 'Checkouts that timed out.'),
+    ):
+        family(name, 'counter', help_text)
+        lines.append(f'{name} {pool[key]}')
+    for name, key, help_text in (
+        ('db_pool_checked_out', 'checked_out', 'Connections currently in use.'),
+        ('db_pool_size', 'size', 'Configured pool size.'),
+        ('db_pool_overflow', 'overflow', 'Overflow connections currently open.'),
+    ):
+        if key in pool:
+            family(name, 'gauge', help_text)
+            lines.append(f'{name} {pool[key]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,146 @@
+"""
+Caregiver matching for jobs.
+Candidates are scored on whether their caregiving type is the job's required
+type, whether they live in the member's city, whether their hourly rate is in
+the requested range, and whether they have had accepted appointments with
+the member before (see MATCH_WEIGHTS).
+
+Nothing scans every caregiver. Each combination of the three criteria is a
+score tier. Tiers are fetched best first with ORDER BY hourly_rate LIMIT k,
+which ix_caregivers_caregiving_type_hourly_rate serves as an index range
+scan. Lower tiers are only queried while fewer than k caregivers have been
+found. Previous caregivers of the member come from
+ix_appointments_member_user_id. A typical match costs four small
+statements, whatever the number of caregivers.
+"""
+
+from itertools import product
+from typing import NamedTuple
+from decimal import Decimal
+from sqlalchemy import func, or_, select
+from models import User, Caregiver, Job, Appointment
+
+MATCH_WEIGHTS = {
+    'caregiving_type': 8,
+    'city': 4,
+    'rate': 2,
+    'history': 3,
+}
+DEFAULT_MATCH_LIMIT = 20
+MAX_MATCH_LIMIT = 200
+
+
+class CaregiverMatch(NamedTuple):
+    caregiver_user_id: int
+    given_name: str
+    surname: str
+    city: str
+    caregiving_type: str
+    hourly_rate: Decimal
+    type_match: bool
+    same_city: bool
+    rate_in_range: bool
+    past_appointments: int
+    score: int
+
+
+def _rate_in_range(rate, min_rate, max_rate):
+    return (min_rate is None or rate >= min_rate) and (max_rate is None or rate <= max_rate)
+
+
+def _range_condition(min_rate, max_rate, inside):
+    conditions = []
+    if min_rate is not None:
+        conditions.append(Caregiver.hourly_rate >= min_rate)
+    if max_rate is not None:
+        conditions.append(Caregiver.hourly_rate <= max_rate)
+    if inside:
+        return conditions
+    return [or_(*(~condition for condition in conditions))]
+
+
+def _candidates():
+    return select(
+        Caregiver.caregiver_user_id,
+        User.given_name,
+        User.surname,
+        User.city,
+        Caregiver.caregiving_type,
+        Caregiver.hourly_rate
+    ).join(User, User.user_id == Caregiver.caregiver_user_id)
+
+
+def _score(row, job_type, city, min_rate, max_rate, past_appointments):
+    type_match = row.caregiving_type == job_type
+    same_city = row.city == city
+    in_range = _rate_in_range(row.hourly_rate, min_rate, max_rate)
+    score = (MATCH_WEIGHTS['caregiving_type'] * type_match
+             + MATCH_WEIGHTS['city'] * same_city
+             + MATCH_WEIGHTS['rate'] * in_range
+             + MATCH_WEIGHTS['history'] * (past_appointments > 0))
+    return CaregiverMatch(row.caregiver_user_id, row.given_name, row.surname, row.city,
+                          row.caregiving_type, row.hourly_rate, type_match, same_city,
+                          in_range, past_appointments, score)
+
+
+def _tiers(has_range):
+    """(type_match, same_city, in_range) combinations from best to worst score"""
+    ranges = (True, False) if has_range else (True,)
+    tiers = product((True, False), (True, False), ranges)
+    return sorted(tiers, key=lambda tier: -(MATCH_WEIGHTS['caregiving_type'] * tier[0]
+                                            + MATCH_WEIGHTS['city'] * tier[1]
+                                            + MATCH_WEIGHTS['rate'] * tier[2]))
+
+
+def match_caregivers(db, job_id, min_rate=None, max_rate=None, limit=DEFAULT_MATCH_LIMIT):
+    """Best `limit` caregivers for a job as CaregiverMatch rows, or None if the job does not exist
+
+    Rows are ordered by score, then past appointments with the member, then
+    hourly rate (cheapest first).
+    """
+    job = db.execute(
+        select(Job.member_user_id, Job.required_caregiving_type, User.city)
+        .join(User, User.user_id == Job.member_user_id)
+        .where(Job.job_id == job_id)
+    ).first()
+    if job is None:
+        return None
+    member_id, job_type, city = job
+
+    # Caregivers the member has already booked, with their accepted appointment counts
+    history = dict(db.execute(
+        select(Appointment.caregiver_user_id, func.count())
+        .where(Appointment.member_user_id == member_id, Appointment.status == 'accepted')
+        .group_by(Appointment.caregiver_user_id)
+    ).all())
+    matches = []
+    if history:
+        rows = db.execute(_candidates().where(Caregiver.caregiver_user_id.in_(list(history))))
+        matches = [_score(row, job_type, city, min_rate, max_rate, history[row.caregiver_user_id])
+                   for row in rows]
+
+    # Everyone else, tier by tier until `limit` caregivers without history are found
+    seen = set(history) | {member_id}
+    found = 0
+    has_range = min_rate is not None or max_rate is not None
+    for type_match, same_city, in_range in _tiers(has_range):
+        if found >= limit:
+            break
+        query = _candidates().where(
+            Caregiver.caregiving_type == job_type if type_match else Caregiver.caregiving_type != job_type,
+            User.city == city if same_city else User.city != city,
+            *(_range_condition(min_rate, max_rate, in_range) if has_range else ()),
+        ).order_by(
+            Caregiver.hourly_rate, Caregiver.caregiver_user_id
+        ).limit(limit - found + len(seen))
+        for row in db.execute(query):
+            if row.caregiver_user_id in seen:
+                continue
+            seen.add(row.caregiver_user_id)
+            matches.append(_score(row, job_type, city, min_rate, max_rate, 0))
+            found += 1
+            if found >= limit:
+                break
+
+    matches.sort(key=lambda m: (-m.score, -m.past_appointments, m.hourly_rate, m.caregiver_user_id))
+    return matches[:limit]
@@ -1,10 +1,22 @@
-from sqlalchemy import Column, Integer, String, Numeric, Date, Time, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Numeric, Date, Time, ForeignKey, Text, Index, text
 from sqlalchemy.orm import relationship
 from database import Base
 from werkzeug.security import generate_password_hash, check_password_hash
 
+# Full-text search documents, indexed with GIN on PostgreSQL (search.py queries the same expressions)
+JOB_SEARCH_DOCUMENT = "to_tsvector('english', coalesce(other_requirements, ''))"
+USER_SEARCH_DOCUMENT = "to_tsvector('english', coalesce(profile_description, ''))"
+MEMBER_SEARCH_DOCUMENT = ("to_tsvector('english', coalesce(house_rules, '') || ' ' || "
+                          "coalesce(dependent_description, ''))")
+
 class User(Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        Index('ix_users_city', 'city'),
+        Index('ix_users_given_name_surname', 'given_name', 'surname'),
+        Index('ix_users_profile_description_fts', text(USER_SEARCH_DOCUMENT),
+              postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
     
     user_id = Column(Integer, primary_key=True, autoincrement=True)
     email = Column(String(255), unique=True, nullable=False)
@@ -33,6 +45,10 @@ class User(Base):
 
 class Caregiver(Base):
     __tablename__ = 'caregivers'
+    __table_args__ = (
+        # Also serves caregiving_type filters; rate order lets matching stop after LIMIT rows
+        Index('ix_caregivers_caregiving_type_hourly_rate', 'caregiving_type', 'hourly_rate', 'caregiver_user_id'),
+    )
     
     caregiver_user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
     photo = Column(String(255))
@@ -51,6 +67,10 @@ class Caregiver(Base):
 
 class Member(Base):
     __tablename__ = 'members'
+    __table_args__ = (
+        Index('ix_members_search_fts', text(MEMBER_SEARCH_DOCUMENT),
+              postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
     
     member_user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
     house_rules = Column(Text)
@@ -68,6 +88,9 @@ class Member(Base):
 
 class Address(Base):
     __tablename__ = 'addresses'
+    __table_args__ = (
+        Index('ix_addresses_street', 'street'),
+    )
     
     member_user_id = Column(Integer, ForeignKey('members.member_user_id'), primary_key=True, nullable=False)
     house_number = Column(String(20), primary_key=True, nullable=False)
@@ -83,6 +106,11 @@ class Address(Base):
 
 class Job(Base):
     __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_member_user_id_required_caregiving_type', 'member_user_id', 'required_caregiving_type'),
+        Index('ix_jobs_other_requirements_fts', text(JOB_SEARCH_DOCUMENT),
+              postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
     
     job_id = Column(Integer, primary_key=True, autoincrement=True)
     member_user_id = Column(Integer, ForeignKey('members.member_user_id'), nullable=False)
@@ -100,6 +128,9 @@ class Job(Base):
 
 class JobApplication(Base):
     __tablename__ = 'job_applications'
+    __table_args__ = (
+        Index('ix_job_applications_job_id', 'job_id'),
+    )
     
     caregiver_user_id = Column(Integer, ForeignKey('caregivers.caregiver_user_id'), primary_key=True, nullable=False)
     job_id = Column(Integer, ForeignKey('jobs.job_id'), primary_key=True, nullable=False)
@@ -115,6 +146,12 @@ class JobApplication(Base):
 
 class Appointment(Base):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        # The trailing appointment_date serves the availability window scans (availability.py)
+        Index('ix_appointments_status_appointment_date', 'status', 'appointment_date'),
+        Index('ix_appointments_caregiver_user_id_status_date', 'caregiver_user_id', 'status', 'appointment_date'),
+        Index('ix_appointments_member_user_id', 'member_user_id'),
+    )
     
     appointment_id = Column(Integer, primary_key=True, autoincrement=True)
     caregiver_user_id = Column(Integer, ForeignKey('caregivers.caregiver_user_id'), nullable=False)
@@ -130,3 +167,16 @@ class Appointment(Base):
     
     def __repr__(self):
         return f"<Appointment(id={self.appointment_id}, date={self.appointment_date}, status='{self.status}')>"
+
+
+# Per-caregiver totals over accepted appointments, kept current by earnings.py
+class CaregiverEarnings(Base):
+    __tablename__ = 'caregiver_earnings'
+    
+    caregiver_user_id = Column(Integer, ForeignKey('caregivers.caregiver_user_id'), primary_key=True)
+    accepted_appointments = Column(Integer, nullable=False, default=0)
+    total_hours = Column(Numeric(12, 2), nullable=False, default=0)
+    total_earnings = Column(Numeric(16, 4), nullable=False, default=0)  # total_hours * current hourly_rate
+    
+    def __repr__(self):
+        return f"<CaregiverEarnings(caregiver_id={self.caregiver_user_id}, hours={self.total_hours}, earnings={self.total_earnings})>"
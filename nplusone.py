@@ -0,0 +1,166 @@
+"""
+N+1 query detector for development and CI.
+
+While a request or a report runs, every statement sent through the
+application engine is normalized (instrumentation.normalize_sql) and counted
+together with the project lines that issued it: the innermost frames in
+app.py, queries.py, a template and so on, past SQLAlchemy and Flask. When the same
+normalized statement runs NPLUSONE_THRESHOLD times or more, that is the
+signature of an N+1 (one query per row of a list), and the detector warns on
+the sql.nplusone logger or raises NPlusOneError, naming the statement and
+its call sites.
+
+NPLUSONE_MODE selects off, warn or raise for the Flask requests (warn when
+FLASK_DEBUG is set, otherwise off). In CI, assert_no_n_plus_one() wraps any
+block; python -m benchmarks.nplusone runs every route and report that way
+against a generated dataset.
+"""
+
+import logging
+import os
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, request
+from sqlalchemy import event
+from database import engine, env_bool, env_int
+from instrumentation import normalize_sql
+
+NPLUSONE_MODE = os.getenv('NPLUSONE_MODE') or ('warn' if env_bool('FLASK_DEBUG') else 'off')
+NPLUSONE_THRESHOLD = env_int('NPLUSONE_THRESHOLD', 5)   # repeats of one statement that count as N+1
+NPLUSONE_MODES = ('off', 'warn', 'raise')
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+_SKIPPED_FILES = {os.path.join(PROJECT_ROOT, name) for name in ('nplusone.py', 'instrumentation.py')}
+
+nplusone_logger = logging.getLogger('sql.nplusone')
+
+_current = ContextVar('nplusone_log', default=None)
+
+
+class NPlusOneError(RuntimeError):
+    """A statement was repeated NPLUSONE_THRESHOLD times or more in one request or report"""
+
+    def __init__(self, log):
+        self.log = log
+        super().__init__(log.describe())
+
+
+def call_site():
+    """Where a statement comes from: the innermost project frame, then the innermost one in another file
+
+    'cache.py:207 in get <- app.py:745 in appointments_edit', so a shared
+    helper (get_entity, paginate) is shown with the view or report calling it.
+    """
+    sites, files = [], set()
+    frame = sys._getframe(1)
+    while frame is not None and len(sites) < 2:
+        filename = frame.f_code.co_filename
+        if not filename.startswith('<'):
+            filename = os.path.abspath(filename)
+            if (filename.startswith(PROJECT_ROOT + os.sep) and filename not in _SKIPPED_FILES
+                    and 'site-packages' not in filename and filename not in files):
+                files.add(filename)
+                sites.append(f'{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return ' <- '.join(sites) or 'unknown'
+
+
+class QueryLog:
+    """Statements issued inside one request or report, grouped by normalized SQL"""
+
+    def __init__(self, label, threshold=NPLUSONE_THRESHOLD):
+        self.label = label
+        self.threshold = threshold
+        self.total = 0
+        self.counts = Counter()
+        self.sites = {}                 # normalized SQL -> Counter of call sites
+
+    def record(self, sql, site):
+        self.total += 1
+        self.counts[sql] += 1
+        self.sites.setdefault(sql, Counter())[site] += 1
+
+    def repeated(self):
+        """[(sql, count, call sites)] of the statements at or above the threshold, most repeated first"""
+        return [(sql, count, self.sites[sql]) for sql, count in self.counts.most_common()
+                if count >= self.threshold]
+
+    def describe(self):
+        lines = [f'N+1 queries in {self.label} ({self.total} statements):']
+        for sql, count, sites in self.repeated():
+            lines.append(f'  {count}x {sql}')
+            lines.extend(f'      {site_count}x from {site}' for site, site_count in sites.most_common())
+        return '\n'.join(lines)
+
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    log = _current.get()
+    if log is not None:
+        log.record(normalize_sql(statement), call_site())
+
+
+def check(log, mode=NPLUSONE_MODE):
+    """Warn about or raise for the repeated statements of `log`, according to mode"""
+    if mode == 'off' or not log.repeated():
+        return
+    if mode == 'raise':
+        raise NPlusOneError(log)
+    nplusone_logger.warning(log.describe())
+
+
+@contextmanager
+def detect(label, threshold=NPLUSONE_THRESHOLD, mode=NPLUSONE_MODE):
+    """Count the statements issued inside the block and check them when it ends
+
+    Yields the QueryLog. Nothing is checked when the block raises.
+    """
+    log = QueryLog(label, threshold)
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+    check(log, mode)
+
+
+def assert_no_n_plus_one(label='block', threshold=NPLUSONE_THRESHOLD):
+    """detect() that raises NPlusOneError, for tests and CI checks"""
+    return detect(label, threshold, mode='raise')
+
+
+# ==================== FLASK ====================
+
+def init_app(app, mode=NPLUSONE_MODE, threshold=NPLUSONE_THRESHOLD):
+    """Check every request of `app` (mode 'warn' or 'raise'; 'off' registers nothing)
+
+    A request made inside a detect() block, e.g. through the test client, is
+    left to that block.
+    """
+    if mode not in NPLUSONE_MODES:
+        raise ValueError(f'NPLUSONE_MODE must be one of {", ".join(NPLUSONE_MODES)}, not {mode!r}')
+    if mode == 'off':
+        return
+
+    @app.before_request
+    def _start_log():
+        if _current.get() is None:
+            g.nplusone_log = QueryLog(f'{request.method} {request.path} ({request.endpoint})', threshold)
+            g.nplusone_token = _current.set(g.nplusone_log)
+
+    @app.after_request
+    def _check_log(response):
+        log = g.pop('nplusone_log', None)
+        if log is not None:
+            _current.reset(g.pop('nplusone_token'))
+            check(log, mode)
+        return response
+
+    @app.teardown_request
+    def _drop_log(exception=None):
+        g.pop('nplusone_log', None)
+        token = g.pop('nplusone_token', None)
+        if token is not None:
+            _current.reset(token)
@@ -0,0 +1,135 @@
+"""
+Keyset (seek) pagination for list pages.
+Pages are located by comparing primary key values against an opaque cursor,
+so the database seeks straight to the page through the key index instead of
+scanning and discarding OFFSET rows.
+"""
+
+import base64
+import json
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class Page:
+    """One page of results together with the cursors of its neighbours"""
+
+    def __init__(self, items, limit, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values, direction):
+    """Encode key values and a direction ('next' or 'prev') as a URL-safe token"""
+    payload = json.dumps({'k': list(values), 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor token; raises ValueError if it was tampered with"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = payload['k'], payload['d']
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise ValueError(f'Invalid cursor: {cursor!r}')
+    # Key values are bound as query parameters: only plain scalars are accepted
+    if not all(value is None or (isinstance(value, (int, str)) and not isinstance(value, bool))
+               for value in values):
+        raise ValueError(f'Invalid cursor: {cursor!r}')
+    return values, direction
+
+
+def clamp_limit(limit):
+    """Bound a requested page size to [1, MAX_PAGE_SIZE]"""
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _key_expression(key_columns):
+    if len(key_columns) == 1:
+        return key_columns[0]
+    return tuple_(*key_columns)
+
+
+def _fits(value, column):
+    """Whether a decoded cursor value can be compared with `column`"""
+    try:
+        return value is None or isinstance(value, column.type.python_type)
+    except NotImplementedError:
+        return True
+
+
+def _key_values(item, key_columns):
+    """Read the key column values of a result item (entity, row of entities or column row)"""
+    values = []
+    for column in key_columns:
+        obj = item
+        # Column rows select the key by name; rows of entities hold it on an entity
+        if not isinstance(item, column.class_) and column.key not in getattr(item, '_fields', ()):
+            obj = next(e for e in item if isinstance(e, column.class_))
+        values.append(getattr(obj, column.key))
+    return values
+
+
+def paginate(query, key_columns, cursor=None, limit=None):
+    """Return a Page of `query` ordered by `key_columns`, seeking past `cursor`
+
+    `key_columns` must uniquely identify a row (the primary key columns, in
+    order). The query is issued with LIMIT limit+1 to detect a further page.
+    """
+    limit = clamp_limit(limit)
+    key = _key_expression(key_columns)
+
+    direction = 'next'
+    if cursor:
+        values, direction = decode_cursor(cursor)
+        if len(values) != len(key_columns) or not all(map(_fits, values, key_columns)):
+            raise ValueError(f'Invalid cursor: {cursor!r}')
+        bound = values[0] if len(values) == 1 else tuple_(*values)
+        query = query.filter(key > bound if direction == 'next' else key < bound)
+
+    if direction == 'next':
+        query = query.order_by(*key_columns)
+    else:
+        query = query.order_by(*[column.desc() for column in key_columns])
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'prev':
+        rows.reverse()
+
+    if not rows:
+        return Page(rows, limit)
+
+    first = encode_cursor(_key_values(rows[0], key_columns), 'prev')
+    last = encode_cursor(_key_values(rows[-1], key_columns), 'next')
+    if direction == 'next':
+        return Page(rows, limit,
+                    next_cursor=last if has_more else None,
+                    prev_cursor=first if cursor else None)
+    return Page(rows, limit,
+                next_cursor=last,
+                prev_cursor=first if has_more else None)
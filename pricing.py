@@ -0,0 +1,95 @@
+"""
+Bulk pricing: tiered commission applied to caregiver hourly rates.
+Rates below the threshold get a flat fee, the rest a percentage, and both
+are rounded to cents in SQL. The whole table is repriced by one UPDATE ...
+SET hourly_rate = CASE statement evaluated by the database, so no Caregiver
+objects are loaded. PostgreSQL computes it in exact NUMERIC arithmetic;
+SQLite has no decimal type and computes in binary floating point, where the
+ROUND to cents keeps the stored rates at the nearest representable value. The
+caregiver_earnings summary is repriced by a second set-based UPDATE, and
+the entity cache is cleared when the transaction commits.
+"""
+
+from decimal import Decimal
+from sqlalchemy import case, cast, func, literal, select, update, Numeric
+from models import Caregiver
+from earnings import refresh_earnings_rates
+from cache import mark_all_stale
+
+# 3.2: +$0.30 if the hourly rate is below $10, +10% otherwise
+COMMISSION_THRESHOLD = Decimal('10.00')
+COMMISSION_FLAT_FEE = Decimal('0.30')
+COMMISSION_PERCENTAGE = Decimal('10')
+
+
+def _money(value):
+    return literal(Decimal(value), Numeric(12, 4))
+
+
+def commissioned_rate(threshold=COMMISSION_THRESHOLD, flat_fee=COMMISSION_FLAT_FEE,
+                      percentage=COMMISSION_PERCENTAGE):
+    """SQL expression for a caregiver's hourly rate after commission, rounded to cents"""
+    rate = Caregiver.hourly_rate
+    multiplier = Decimal(1) + Decimal(percentage) / Decimal(100)
+    return cast(func.round(case(
+        (rate < _money(threshold), rate + _money(flat_fee)),
+        else_=rate * _money(multiplier),
+    ), 2), Caregiver.hourly_rate.type)
+
+
+def commission_preview(db, threshold=COMMISSION_THRESHOLD, flat_fee=COMMISSION_FLAT_FEE,
+                       percentage=COMMISSION_PERCENTAGE):
+    """Before/after rate distribution of a commission run, computed in one SELECT"""
+    rate = Caregiver.hourly_rate
+    new_rate = commissioned_rate(threshold, flat_fee, percentage)
+    row = db.execute(select(
+        func.count().label('caregivers'),
+        func.count().filter(rate < _money(threshold)).label('flat_tier'),
+        func.min(rate).label('before_min'),
+        func.max(rate).label('before_max'),
+        func.avg(rate).label('before_avg'),
+        func.sum(rate).label('before_total'),
+        func.min(new_rate).label('after_min'),
+        func.max(new_rate).label('after_max'),
+        func.avg(new_rate).label('after_avg'),
+        func.sum(new_rate).label('after_total'),
+    )).one()
+    return {
+        'caregivers': row.caregivers,
+        'tiers': {'flat': row.flat_tier, 'percentage': row.caregivers - row.flat_tier},
+        'before': {'min': row.before_min, 'max': row.before_max,
+                   'avg': row.before_avg, 'total': row.before_total},
+        'after': {'min': row.after_min, 'max': row.after_max,
+                  'avg': row.after_avg, 'total': row.after_total},
+    }
+
+
+def commission_changes(db, threshold=COMMISSION_THRESHOLD, flat_fee=COMMISSION_FLAT_FEE,
+                       percentage=COMMISSION_PERCENTAGE):
+    """(caregiver_user_id, hourly_rate, new_rate) of every caregiver, in id order, from one SELECT"""
+    return db.execute(select(
+        Caregiver.caregiver_user_id,
+        Caregiver.hourly_rate,
+        commissioned_rate(threshold, flat_fee, percentage).label('new_rate'),
+    ).order_by(Caregiver.caregiver_user_id)).all()
+
+
+def apply_commission(db, threshold=COMMISSION_THRESHOLD, flat_fee=COMMISSION_FLAT_FEE,
+                     percentage=COMMISSION_PERCENTAGE, dry_run=False):
+    """Reprice every caregiver in a single UPDATE statement
+
+    With dry_run=True nothing is written and the commission_preview()
+    distribution is returned instead. Otherwise returns the number of rows
+    updated and brings caregiver_earnings up to the new rates; the caller
+    owns the transaction and must commit.
+    """
+    if dry_run:
+        return commission_preview(db, threshold, flat_fee, percentage)
+    result = db.execute(
+        update(Caregiver)
+        .values(hourly_rate=commissioned_rate(threshold, flat_fee, percentage))
+        .execution_options(synchronize_session=False)
+    )
+    refresh_earnings_rates(db)
+    mark_all_stale(db)
+    return result.rowcount
@@ -0,0 +1,115 @@
+"""
+Bulk purge of members and jobs (e.g. GDPR erasure batches).
+The target ids are selected once by predicate, then every dependent table is
+cleared with DELETE ... WHERE ... IN statements in foreign-key dependency
+order. Nothing is loaded into the session, so the ORM never walks the
+delete-orphan cascades one object at a time. Because these statements bypass
+the ORM events, the caregiver_earnings rows of every caregiver who loses
+accepted appointments are rebuilt afterwards, and the deleted users,
+caregivers, members and jobs are dropped from the entity cache on commit.
+"""
+
+from sqlalchemy import select, delete
+from models import User, Caregiver, Member, Address, Job, JobApplication, Appointment, CaregiverEarnings
+from earnings import ACCEPTED, refresh_caregiver_earnings
+from cache import mark_stale
+
+CHUNK_SIZE = 500
+
+
+def _chunks(ids, size):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def _delete(db, counts, table_name, statement):
+    result = db.execute(statement.execution_options(synchronize_session=False))
+    counts[table_name] = counts.get(table_name, 0) + result.rowcount
+
+
+def select_member_ids(db, *criteria):
+    """Ids of members matching criteria on Member, User or Address columns"""
+    query = select(Member.member_user_id).join(
+        User, User.user_id == Member.member_user_id
+    ).outerjoin(
+        Address, Address.member_user_id == Member.member_user_id
+    ).where(*criteria).distinct()
+    return [row[0] for row in db.execute(query)]
+
+
+def select_job_ids(db, *criteria):
+    """Ids of jobs matching criteria on Job, Member or User columns"""
+    query = select(Job.job_id).join(
+        Member, Member.member_user_id == Job.member_user_id
+    ).join(
+        User, User.user_id == Member.member_user_id
+    ).where(*criteria).distinct()
+    return [row[0] for row in db.execute(query)]
+
+
+def purge_job_ids(db, job_ids, chunk_size=CHUNK_SIZE):
+    """Delete jobs by id together with their applications; returns row counts per table"""
+    counts = {'job_applications': 0, 'jobs': 0}
+    for chunk in _chunks(list(job_ids), chunk_size):
+        _delete(db, counts, 'job_applications',
+                delete(JobApplication).where(JobApplication.job_id.in_(chunk)))
+        _delete(db, counts, 'jobs', delete(Job).where(Job.job_id.in_(chunk)))
+        mark_stale(db, Job, chunk)
+    return counts
+
+
+def purge_jobs(db, *criteria, chunk_size=CHUNK_SIZE):
+    """Delete every job matching criteria; the caller commits"""
+    return purge_job_ids(db, select_job_ids(db, *criteria), chunk_size)
+
+
+def purge_member_ids(db, member_ids, delete_users=False, chunk_size=CHUNK_SIZE):
+    """Delete members by id with their addresses, jobs, applications and appointments
+
+    With delete_users=True the underlying users are erased too, including any
+    caregiver profile they hold and that profile's applications and
+    appointments. Returns row counts per table.
+    """
+    counts = dict.fromkeys(['job_applications', 'appointments', 'jobs', 'addresses', 'members'], 0)
+    if delete_users:
+        counts.update(caregivers=0, users=0)
+
+    affected_caregivers = set()
+    for chunk in _chunks(list(member_ids), chunk_size):
+        affected_caregivers.update(db.scalars(
+            select(Appointment.caregiver_user_id).where(
+                Appointment.member_user_id.in_(chunk), Appointment.status == ACCEPTED
+            ).distinct()
+        ))
+        member_jobs = select(Job.job_id).where(Job.member_user_id.in_(chunk))
+        mark_stale(db, Job, db.scalars(member_jobs))
+        mark_stale(db, Member, chunk)
+        _delete(db, counts, 'job_applications',
+                delete(JobApplication).where(JobApplication.job_id.in_(member_jobs)))
+        _delete(db, counts, 'appointments',
+                delete(Appointment).where(Appointment.member_user_id.in_(chunk)))
+        _delete(db, counts, 'jobs', delete(Job).where(Job.member_user_id.in_(chunk)))
+        _delete(db, counts, 'addresses', delete(Address).where(Address.member_user_id.in_(chunk)))
+        _delete(db, counts, 'members', delete(Member).where(Member.member_user_id.in_(chunk)))
+
+        if delete_users:
+            _delete(db, counts, 'job_applications',
+                    delete(JobApplication).where(JobApplication.caregiver_user_id.in_(chunk)))
+            _delete(db, counts, 'appointments',
+                    delete(Appointment).where(Appointment.caregiver_user_id.in_(chunk)))
+            db.execute(delete(CaregiverEarnings).where(CaregiverEarnings.caregiver_user_id.in_(chunk))
+                       .execution_options(synchronize_session=False))
+            _delete(db, counts, 'caregivers', delete(Caregiver).where(Caregiver.caregiver_user_id.in_(chunk)))
+            _delete(db, counts, 'users', delete(User).where(User.user_id.in_(chunk)))
+            mark_stale(db, Caregiver, chunk)
+            mark_stale(db, User, chunk)
+
+    # Rows of deleted caregivers are simply not rebuilt
+    for chunk in _chunks(sorted(affected_caregivers), chunk_size):
+        refresh_caregiver_earnings(db, chunk)
+    return counts
+
+
+def purge_members(db, *criteria, delete_users=False, chunk_size=CHUNK_SIZE):
+    """Delete every member matching criteria (see purge_member_ids); the caller commits"""
+    return purge_member_ids(db, select_member_ids(db, *criteria), delete_users, chunk_size)
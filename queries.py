@@ -1,11 +1,39 @@
 """
 Part 2: SQL Queries Implementation
 All queries required for the project using SQLAlchemy
+
+Each report is split in two: <report>_data(db) runs the SQL and returns the
+results without printing or committing, and <report>() opens a session,
+calls it, prints the output and commits any changes. REPORTS lists the data
+functions so benchmarks/reports.py can time the queries on their own.
+
+The read-only reports (5.1 to 8) also have a <report>_query(db) builder.
+Their print functions iterate it through a server-side cursor
+(stream_query), REPORT_BATCH_SIZE rows at a time, instead of loading the
+whole result, and write_report() streams it as CSV, JSON or text for batch
+jobs:
+
+    python queries.py --format csv --output reports/
+    python queries.py --format json --report view_8 --output view_8.json
 """
 
-from sqlalchemy import func, text, and_, or_
-from database import SessionLocal
-from models import User, Caregiver, Member, Address, Job, JobApplication, Appointment
+import argparse
+import os
+import sys
+from contextlib import redirect_stdout
+
+from datetime import date, time
+from decimal import Decimal
+from typing import NamedTuple
+from sqlalchemy import cast, exists, func, select, text, or_, Float
+from sqlalchemy.orm import aliased
+from database import SessionLocal, env_int
+from export import export_rows, csv_chunks, json_chunks
+from models import User, Caregiver, Member, Address, Job, JobApplication, Appointment, CaregiverEarnings
+from pricing import apply_commission, commission_changes, COMMISSION_THRESHOLD
+from purge import purge_jobs, purge_members
+
+REPORT_BATCH_SIZE = env_int('REPORT_BATCH_SIZE', 1000)  # rows fetched per round trip when streaming
 
 def print_section(title):
     """Helper function to print section headers"""
@@ -13,50 +41,289 @@ def print_section(title):
     print(f" {title}")
     print("="*80 + "\n")
 
+def stream_query(db, query):
+    """Rows of a report query, read from a server-side cursor REPORT_BATCH_SIZE at a time"""
+    return export_rows(db, query.statement, REPORT_BATCH_SIZE)
+
+# =============================================================================
+# SHARED DETAIL QUERIES (used by the reports and the web app)
+# =============================================================================
+
+class AppointmentDetail(NamedTuple):
+    appointment_id: int
+    appointment_date: date
+    appointment_time: time
+    work_hours: Decimal
+    status: str
+    caregiver_user_id: int
+    caregiver_given_name: str
+    caregiver_surname: str
+    member_user_id: int
+    member_given_name: str
+    member_surname: str
+
+class ApplicationDetail(NamedTuple):
+    caregiver_user_id: int
+    job_id: int
+    date_applied: date
+    required_caregiving_type: str
+    other_requirements: str
+    member_user_id: int
+    member_given_name: str
+    member_surname: str
+    caregiver_given_name: str
+    caregiver_surname: str
+
+def appointment_details_query(db, status=None):
+    """Appointments with caregiver and member names in one statement (User joined twice)"""
+    caregiver_user = aliased(User, name='caregiver_user')
+    member_user = aliased(User, name='member_user')
+    query = db.query(
+        Appointment.appointment_id,
+        Appointment.appointment_date,
+        Appointment.appointment_time,
+        Appointment.work_hours,
+        Appointment.status,
+        Appointment.caregiver_user_id,
+        caregiver_user.given_name.label('caregiver_given_name'),
+        caregiver_user.surname.label('caregiver_surname'),
+        Appointment.member_user_id,
+        member_user.given_name.label('member_given_name'),
+        member_user.surname.label('member_surname')
+    ).join(
+        caregiver_user, caregiver_user.user_id == Appointment.caregiver_user_id
+    ).join(
+        member_user, member_user.user_id == Appointment.member_user_id
+    )
+    if status is not None:
+        query = query.filter(Appointment.status == status)
+    return query
+
+def appointment_details(db, status=None):
+    """List of AppointmentDetail rows, optionally filtered by status"""
+    return [AppointmentDetail(*row) for row in appointment_details_query(db, status)]
+
+def application_details_query(db):
+    """Job applications with job, member and applicant names in one statement"""
+    caregiver_user = aliased(User, name='caregiver_user')
+    member_user = aliased(User, name='member_user')
+    return db.query(
+        JobApplication.caregiver_user_id,
+        JobApplication.job_id,
+        JobApplication.date_applied,
+        Job.required_caregiving_type,
+        Job.other_requirements,
+        Job.member_user_id,
+        member_user.given_name.label('member_given_name'),
+        member_user.surname.label('member_surname'),
+        caregiver_user.given_name.label('caregiver_given_name'),
+        caregiver_user.surname.label('caregiver_surname')
+    ).join(
+        Job, Job.job_id == JobApplication.job_id
+    ).join(
+        member_user, member_user.user_id == Job.member_user_id
+    ).join(
+        caregiver_user, caregiver_user.user_id == JobApplication.caregiver_user_id
+    )
+
+def application_details(db):
+    """List of ApplicationDetail rows"""
+    return [ApplicationDetail(*row) for row in application_details_query(db)]
+
+def search_members_query(db, caregiving_type=None, city=None, house_rule=None):
+    """Members needing `caregiving_type` in `city` whose house rules contain `house_rule`
+
+    Each criterion is optional. The job check is an EXISTS semi-join, so the
+    whole search is one statement and a member with several matching jobs is
+    returned once. Rows are (user, member).
+    """
+    query = db.query(User, Member).join(Member, Member.member_user_id == User.user_id)
+    if city is not None:
+        query = query.filter(User.city == city)
+    if house_rule is not None:
+        query = query.filter(Member.house_rules.contains(house_rule, autoescape=True))
+    if caregiving_type is not None:
+        query = query.filter(exists().where(
+            Job.member_user_id == Member.member_user_id,
+            Job.required_caregiving_type == caregiving_type
+        ))
+    return query
+
+def search_members(db, caregiving_type=None, city=None, house_rule=None):
+    """List of (user, member) rows matching search_members_query()"""
+    return search_members_query(db, caregiving_type, city, house_rule).all()
+
+# Averages are reported to the precision of caregiver_earnings.total_earnings
+EARNINGS_PRECISION = Decimal('0.0001')
+
+class TopEarner(NamedTuple):
+    caregiver_user_id: int
+    given_name: str
+    surname: str
+    caregiving_type: str
+    hourly_rate: Decimal
+    appointment_count: int
+    total_hours: Decimal
+    total_earnings: Decimal
+    avg_earnings: Decimal
+
+def top_earners_query(db, status='accepted', date_from=None, date_to=None, caregiving_type=None, limit=None):
+    """Caregivers whose average earnings per appointment beat the overall average, in one statement
+
+    A per-caregiver CTE totals the appointments matching the filters and a
+    second CTE sums it into the overall totals. The totals are LEFT JOINed
+    to the qualifying caregivers, so the threshold comes back (with NULL
+    caregiver columns) even when nobody qualifies. With the default filters
+    the totals are read from caregiver_earnings instead of appointments.
+    """
+    if status == 'accepted' and date_from is None and date_to is None:
+        per_caregiver = select(
+            CaregiverEarnings.caregiver_user_id,
+            CaregiverEarnings.accepted_appointments.label('appointment_count'),
+            CaregiverEarnings.total_hours,
+            CaregiverEarnings.total_earnings
+        ).join(
+            Caregiver, Caregiver.caregiver_user_id == CaregiverEarnings.caregiver_user_id
+        ).where(
+            CaregiverEarnings.accepted_appointments > 0
+        )
+    else:
+        per_caregiver = select(
+            Appointment.caregiver_user_id,
+            func.count(Appointment.appointment_id).label('appointment_count'),
+            func.sum(Appointment.work_hours).label('total_hours'),
+            func.sum(Caregiver.hourly_rate * Appointment.work_hours).label('total_earnings')
+        ).join(
+            Caregiver, Caregiver.caregiver_user_id == Appointment.caregiver_user_id
+        ).group_by(
+            Appointment.caregiver_user_id
+        )
+        if status is not None:
+            per_caregiver = per_caregiver.where(Appointment.status == status)
+        if date_from is not None:
+            per_caregiver = per_caregiver.where(Appointment.appointment_date >= date_from)
+        if date_to is not None:
+            per_caregiver = per_caregiver.where(Appointment.appointment_date <= date_to)
+    if caregiving_type is not None:
+        per_caregiver = per_caregiver.where(Caregiver.caregiving_type == caregiving_type)
+    per_caregiver = per_caregiver.cte('per_caregiver')
+    
+    totals = select(
+        func.sum(per_caregiver.c.total_earnings).label('overall_earnings'),
+        func.sum(per_caregiver.c.appointment_count).label('overall_appointments')
+    ).cte('totals')
+    
+    # total / count > overall_total / overall_count, cross-multiplied so no
+    # database has to divide (SQLite would truncate integer quotients)
+    above_average = (
+        per_caregiver.c.total_earnings * totals.c.overall_appointments
+        > totals.c.overall_earnings * per_caregiver.c.appointment_count
+    )
+    earners = per_caregiver.join(
+        Caregiver, Caregiver.caregiver_user_id == per_caregiver.c.caregiver_user_id
+    ).join(
+        User, User.user_id == per_caregiver.c.caregiver_user_id
+    )
+    query = db.query(
+        totals.c.overall_earnings,
+        totals.c.overall_appointments,
+        per_caregiver.c.caregiver_user_id,
+        User.given_name,
+        User.surname,
+        Caregiver.caregiving_type,
+        Caregiver.hourly_rate,
+        per_caregiver.c.appointment_count,
+        per_caregiver.c.total_hours,
+        per_caregiver.c.total_earnings
+    ).select_from(totals).outerjoin(
+        earners, above_average
+    ).order_by(
+        per_caregiver.c.total_earnings.desc(), per_caregiver.c.caregiver_user_id
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def earnings_threshold(row):
+    """Overall average earnings per appointment from a top_earners_query() row (None if no appointments)"""
+    if not row.overall_appointments:
+        return None
+    return (Decimal(row.overall_earnings) / row.overall_appointments).quantize(EARNINGS_PRECISION)
+
+def top_earners(db, status='accepted', date_from=None, date_to=None, caregiving_type=None, limit=None):
+    """(threshold, [TopEarner]) where threshold is the overall average per appointment (None if no appointments)"""
+    threshold = None
+    earners = []
+    for row in top_earners_query(db, status, date_from, date_to, caregiving_type, limit):
+        threshold = earnings_threshold(row)
+        if row.caregiver_user_id is not None:
+            earners.append(TopEarner(
+                row.caregiver_user_id, row.given_name, row.surname, row.caregiving_type,
+                row.hourly_rate, row.appointment_count, row.total_hours, row.total_earnings,
+                (Decimal(row.total_earnings) / row.appointment_count).quantize(EARNINGS_PRECISION)
+            ))
+    return threshold, earners
+
 # =============================================================================
 # 3. UPDATE SQL STATEMENTS
 # =============================================================================
 
+def update_3_1_data(db):
+    """Set Arman Armanov's phone number; returns [(user, old_phone)]"""
+    users = db.query(User).filter(
+        User.given_name == 'Arman',
+        User.surname == 'Armanov'
+    ).all()
+    
+    updated = []
+    for user in users:
+        updated.append((user, user.phone_number))
+        user.phone_number = '+77773414141'
+    db.flush()
+    return updated
+
 def update_3_1():
     """3.1 Update the phone number of Arman Armanov to +77773414141"""
     print_section("3.1 Update phone number of Arman Armanov")
     
     db = SessionLocal()
     try:
-        user = db.query(User).filter(
-            User.given_name == 'Arman',
-            User.surname == 'Armanov'
-        ).first()
+        updated = update_3_1_data(db)
+        db.commit()
         
-        if user:
-            old_phone = user.phone_number
-            user.phone_number = '+77773414141'
-            db.commit()
+        for user, old_phone in updated:
             print(f"Updated Arman Armanov's phone number from {old_phone} to {user.phone_number}")
-        else:
+        if not updated:
             print("Arman Armanov not found")
     finally:
         db.close()
 
+def update_3_2_data(db):
+    """Apply the commission; returns {'updated': rows, 'changes': per caregiver, 'preview': distribution}"""
+    changes = commission_changes(db)
+    preview = apply_commission(db, dry_run=True)
+    return {'updated': apply_commission(db), 'changes': changes, 'preview': preview}
+
 def update_3_2():
     """3.2 Add $0.3 commission fee to hourly rate if < $10, or 10% if >= $10"""
     print_section("3.2 Update caregiver hourly rates with commission")
     
     db = SessionLocal()
     try:
-        caregivers = db.query(Caregiver).all()
-        
-        for caregiver in caregivers:
-            old_rate = float(caregiver.hourly_rate)
-            if old_rate < 10:
-                caregiver.hourly_rate = old_rate + 0.3
-            else:
-                caregiver.hourly_rate = old_rate * 1.10
-            
-            print(f"Caregiver ID {caregiver.caregiver_user_id}: ${old_rate:.2f} -> ${float(caregiver.hourly_rate):.2f}")
-        
+        result = update_3_2_data(db)
         db.commit()
-        print(f"\nUpdated {len(caregivers)} caregiver rates")
+        
+        for change in result['changes']:
+            print(f"Caregiver ID {change.caregiver_user_id}: ${change.hourly_rate:.2f} -> ${change.new_rate:.2f}")
+        
+        preview = result['preview']
+        before, after = preview['before'], preview['after']
+        print()
+        print(f"Flat fee tier (< ${COMMISSION_THRESHOLD}): {preview['tiers']['flat']} caregivers")
+        print(f"Percentage tier (>= ${COMMISSION_THRESHOLD}): {preview['tiers']['percentage']} caregivers")
+        print(f"Rates before: min ${before['min']}, max ${before['max']}, total ${before['total']}")
+        print(f"Rates after:  min ${after['min']}, max ${after['max']}, total ${after['total']}")
+        print(f"\nUpdated {result['updated']} caregiver rates")
     finally:
         db.close()
 
@@ -64,51 +331,40 @@ def update_3_2():
 # 4. DELETE SQL STATEMENTS
 # =============================================================================
 
+def delete_4_1_data(db):
+    """Delete Amina Aminova's jobs; returns rows deleted per table"""
+    return purge_jobs(db, User.given_name == 'Amina', User.surname == 'Aminova')
+
 def delete_4_1():
     """4.1 Delete the jobs posted by Amina Aminova"""
     print_section("4.1 Delete jobs posted by Amina Aminova")
     
     db = SessionLocal()
     try:
-        user = db.query(User).filter(
-            User.given_name == 'Amina',
-            User.surname == 'Aminova'
-        ).first()
+        counts = delete_4_1_data(db)
+        db.commit()
         
-        if user and user.member:
-            jobs = db.query(Job).filter(Job.member_user_id == user.member.member_user_id).all()
-            count = len(jobs)
-            
-            for job in jobs:
-                print(f"Deleting Job ID: {job.job_id} - {job.required_caregiving_type}")
-                db.delete(job)
-            
-            db.commit()
-            print(f"\nDeleted {count} jobs posted by Amina Aminova")
-        else:
-            print("Amina Aminova not found or not a member")
+        print(f"Deleted {counts['job_applications']} job applications")
+        print(f"\nDeleted {counts['jobs']} jobs posted by Amina Aminova")
     finally:
         db.close()
 
+def delete_4_2_data(db):
+    """Delete members on Kabanbay Batyr street; returns rows deleted per table"""
+    return purge_members(db, Address.street == 'Kabanbay Batyr', delete_users=True)
+
 def delete_4_2():
     """4.2 Delete all members who live on Kabanbay Batyr street"""
     print_section("4.2 Delete members living on Kabanbay Batyr street")
     
     db = SessionLocal()
     try:
-        addresses = db.query(Address).filter(Address.street == 'Kabanbay Batyr').all()
-        member_ids = [addr.member_user_id for addr in addresses]
-        
-        members = db.query(Member).filter(Member.member_user_id.in_(member_ids)).all()
-        
-        for member in members:
-            user = db.query(User).filter(User.user_id == member.member_user_id).first()
-            print(f"Deleting Member: {user.given_name} {user.surname}")
-            db.delete(member)
-            db.delete(user)
-        
+        counts = delete_4_2_data(db)
         db.commit()
-        print(f"\nDeleted {len(members)} members living on Kabanbay Batyr street")
+        
+        for table, count in counts.items():
+            print(f"Deleted {count} rows from {table}")
+        print(f"\nDeleted {counts['members']} members living on Kabanbay Batyr street")
     finally:
         db.close()
 
@@ -116,128 +372,117 @@ def delete_4_2():
 # 5. SIMPLE QUERIES
 # =============================================================================
 
+def simple_5_1_query(db):
+    return appointment_details_query(db, status='accepted')
+
+def simple_5_1_data(db):
+    """Accepted appointments with caregiver and member names"""
+    return appointment_details(db, status='accepted')
+
 def simple_5_1():
     """5.1 Select caregiver and member names for the accepted appointments"""
     print_section("5.1 Caregiver and member names for accepted appointments")
     
     db = SessionLocal()
     try:
-        results = db.query(
-            User.given_name.label('caregiver_name'),
-            User.surname.label('caregiver_surname'),
-            User.given_name.label('member_name'),
-            User.surname.label('member_surname'),
-            Appointment.appointment_date
-        ).join(
-            Caregiver, Caregiver.caregiver_user_id == Appointment.caregiver_user_id
-        ).join(
-            User, User.user_id == Caregiver.caregiver_user_id
-        ).join(
-            Member, Member.member_user_id == Appointment.member_user_id
-        ).filter(
-            Appointment.status == 'accepted'
-        ).all()
-        
-        # Need to fix this query - let me redo it properly
-        results = db.query(
-            Appointment.appointment_id,
-            Appointment.appointment_date,
-            Appointment.status
-        ).filter(Appointment.status == 'accepted').all()
-        
-        for result in results:
-            appointment = db.query(Appointment).filter(
-                Appointment.appointment_id == result.appointment_id
-            ).first()
-            
-            caregiver_user = db.query(User).filter(
-                User.user_id == appointment.caregiver_user_id
-            ).first()
-            
-            member_user = db.query(User).filter(
-                User.user_id == appointment.member_user_id
-            ).first()
-            
-            print(f"Caregiver: {caregiver_user.given_name} {caregiver_user.surname} | "
-                  f"Member: {member_user.given_name} {member_user.surname} | "
-                  f"Date: {appointment.appointment_date}")
-        
-        print(f"\nTotal accepted appointments: {len(results)}")
+        count = 0
+        for row in stream_query(db, simple_5_1_query(db)):
+            print(f"Caregiver: {row.caregiver_given_name} {row.caregiver_surname} | "
+                  f"Member: {row.member_given_name} {row.member_surname} | "
+                  f"Date: {row.appointment_date}")
+            count += 1
+        
+        print(f"\nTotal accepted appointments: {count}")
     finally:
         db.close()
 
+def simple_5_2_query(db):
+    return db.query(
+        Job.job_id,
+        Job.required_caregiving_type,
+        Job.other_requirements
+    ).filter(
+        Job.other_requirements.like('%soft-spoken%')
+    )
+
+def simple_5_2_data(db):
+    """Jobs whose requirements mention 'soft-spoken'"""
+    return simple_5_2_query(db).all()
+
 def simple_5_2():
     """5.2 List job ids that contain 'soft-spoken' in their other requirements"""
     print_section("5.2 Jobs with 'soft-spoken' in requirements")
     
     db = SessionLocal()
     try:
-        jobs = db.query(Job).filter(
-            Job.other_requirements.like('%soft-spoken%')
-        ).all()
-        
-        for job in jobs:
+        count = 0
+        for job in stream_query(db, simple_5_2_query(db)):
             print(f"Job ID: {job.job_id} - {job.required_caregiving_type}")
             print(f"  Requirements: {job.other_requirements}")
+            count += 1
         
-        print(f"\nTotal jobs with 'soft-spoken': {len(jobs)}")
+        print(f"\nTotal jobs with 'soft-spoken': {count}")
     finally:
         db.close()
 
+def simple_5_3_query(db):
+    return db.query(
+        Appointment.appointment_id,
+        Appointment.work_hours,
+        Appointment.appointment_date
+    ).join(
+        Caregiver, Caregiver.caregiver_user_id == Appointment.caregiver_user_id
+    ).filter(
+        Caregiver.caregiving_type == 'Babysitter'
+    )
+
+def simple_5_3_data(db):
+    """Work hours of appointments with babysitters"""
+    return simple_5_3_query(db).all()
+
 def simple_5_3():
     """5.3 List the work hours of all babysitter positions"""
     print_section("5.3 Work hours for babysitter positions")
     
     db = SessionLocal()
     try:
-        results = db.query(
-            Appointment.appointment_id,
-            Appointment.work_hours,
-            Appointment.appointment_date
-        ).join(
-            Caregiver, Caregiver.caregiver_user_id == Appointment.caregiver_user_id
-        ).filter(
-            Caregiver.caregiving_type == 'Babysitter'
-        ).all()
-        
-        for result in results:
+        count = 0
+        for result in stream_query(db, simple_5_3_query(db)):
             print(f"Appointment ID: {result.appointment_id} - "
                   f"Work Hours: {result.work_hours} - "
                   f"Date: {result.appointment_date}")
+            count += 1
         
-        print(f"\nTotal babysitter appointments: {len(results)}")
+        print(f"\nTotal babysitter appointments: {count}")
     finally:
         db.close()
 
+def simple_5_4_query(db):
+    return search_members_query(
+        db, caregiving_type='Elderly Care', city='Astana', house_rule='No pets.'
+    ).with_entities(
+        User.user_id,
+        User.given_name,
+        User.surname,
+        User.city,
+        Member.house_rules
+    )
+
+def simple_5_4_data(db):
+    """Astana members with a 'No pets.' rule who posted Elderly Care jobs; returns [(user, member)]"""
+    return search_members(db, caregiving_type='Elderly Care', city='Astana', house_rule='No pets.')
+
 def simple_5_4():
     """5.4 List members looking for Elderly Care in Astana with 'No pets.' rule"""
     print_section("5.4 Members seeking Elderly Care in Astana with 'No pets.' rule")
     
     db = SessionLocal()
     try:
-        results = db.query(User, Member).join(
-            Member, Member.member_user_id == User.user_id
-        ).filter(
-            and_(
-                User.city == 'Astana',
-                Member.house_rules.like('%No pets.%')
-            )
-        ).all()
-        
-        for user, member in results:
-            # Check if they posted elderly care jobs
-            has_elderly_job = db.query(Job).filter(
-                and_(
-                    Job.member_user_id == member.member_user_id,
-                    Job.required_caregiving_type == 'Elderly Care'
-                )
-            ).first()
-            
-            if has_elderly_job:
-                print(f"Member: {user.given_name} {user.surname}")
-                print(f"  City: {user.city}")
-                print(f"  House Rules: {member.house_rules}")
-                print()
+        for row in stream_query(db, simple_5_4_query(db)):
+            print(f"Member: {row.given_name} {row.surname}")
+            print(f"  City: {row.city}")
+            print(f"  House Rules: {row.house_rules}")
+            print()
         
     finally:
         db.close()
@@ -246,29 +491,34 @@ def simple_5_4():
 # 6. COMPLEX QUERIES
 # =============================================================================
 
+def complex_6_1_query(db):
+    return db.query(
+        Job.job_id,
+        Job.required_caregiving_type,
+        User.given_name,
+        User.surname,
+        func.count(JobApplication.caregiver_user_id).label('applicant_count')
+    ).join(
+        Member, Member.member_user_id == Job.member_user_id
+    ).join(
+        User, User.user_id == Member.member_user_id
+    ).outerjoin(
+        JobApplication, JobApplication.job_id == Job.job_id
+    ).group_by(
+        Job.job_id, Job.required_caregiving_type, User.given_name, User.surname
+    )
+
+def complex_6_1_data(db):
+    """Applicant count per job with the posting member's name"""
+    return complex_6_1_query(db).all()
+
 def complex_6_1():
     """6.1 Count the number of applicants for each job posted by a member"""
     print_section("6.1 Number of applicants per job")
     
     db = SessionLocal()
     try:
-        results = db.query(
-            Job.job_id,
-            Job.required_caregiving_type,
-            User.given_name,
-            User.surname,
-            func.count(JobApplication.caregiver_user_id).label('applicant_count')
-        ).join(
-            Member, Member.member_user_id == Job.member_user_id
-        ).join(
-            User, User.user_id == Member.member_user_id
-        ).outerjoin(
-            JobApplication, JobApplication.job_id == Job.job_id
-        ).group_by(
-            Job.job_id, Job.required_caregiving_type, User.given_name, User.surname
-        ).all()
-        
-        for result in results:
+        for result in stream_query(db, complex_6_1_query(db)):
             print(f"Job ID: {result.job_id} - {result.required_caregiving_type}")
             print(f"  Posted by: {result.given_name} {result.surname}")
             print(f"  Applicants: {result.applicant_count}")
@@ -277,28 +527,33 @@ def complex_6_1():
     finally:
         db.close()
 
+def complex_6_2_query(db):
+    return db.query(
+        User.given_name,
+        User.surname,
+        Caregiver.caregiving_type,
+        CaregiverEarnings.total_hours
+    ).join(
+        Caregiver, Caregiver.caregiver_user_id == User.user_id
+    ).join(
+        CaregiverEarnings, CaregiverEarnings.caregiver_user_id == Caregiver.caregiver_user_id
+    ).filter(
+        CaregiverEarnings.accepted_appointments > 0
+    ).order_by(
+        User.given_name, User.surname
+    )
+
+def complex_6_2_data(db):
+    """Total accepted work hours per caregiver (from the caregiver_earnings summary)"""
+    return complex_6_2_query(db).all()
+
 def complex_6_2():
     """6.2 Total hours spent by caregivers for all accepted appointments"""
     print_section("6.2 Total work hours per caregiver (accepted appointments)")
     
     db = SessionLocal()
     try:
-        results = db.query(
-            User.given_name,
-            User.surname,
-            Caregiver.caregiving_type,
-            func.sum(Appointment.work_hours).label('total_hours')
-        ).join(
-            Caregiver, Caregiver.caregiver_user_id == User.user_id
-        ).join(
-            Appointment, Appointment.caregiver_user_id == Caregiver.caregiver_user_id
-        ).filter(
-            Appointment.status == 'accepted'
-        ).group_by(
-            User.given_name, User.surname, Caregiver.caregiving_type
-        ).all()
-        
-        for result in results:
+        for result in stream_query(db, complex_6_2_query(db)):
             print(f"Caregiver: {result.given_name} {result.surname}")
             print(f"  Type: {result.caregiving_type}")
             print(f"  Total Hours: {result.total_hours}")
@@ -307,28 +562,33 @@ def complex_6_2():
     finally:
         db.close()
 
+def complex_6_3_query(db):
+    return db.query(
+        User.given_name,
+        User.surname,
+        Caregiver.hourly_rate,
+        (cast(CaregiverEarnings.total_hours, Float) / CaregiverEarnings.accepted_appointments).label('avg_hours')
+    ).join(
+        Caregiver, Caregiver.caregiver_user_id == User.user_id
+    ).join(
+        CaregiverEarnings, CaregiverEarnings.caregiver_user_id == Caregiver.caregiver_user_id
+    ).filter(
+        CaregiverEarnings.accepted_appointments > 0
+    ).order_by(
+        User.given_name, User.surname
+    )
+
+def complex_6_3_data(db):
+    """Hourly rate and average accepted work hours per caregiver (from the summary)"""
+    return complex_6_3_query(db).all()
+
 def complex_6_3():
     """6.3 Average pay of caregivers based on accepted appointments"""
     print_section("6.3 Average earnings per caregiver (accepted appointments)")
     
     db = SessionLocal()
     try:
-        results = db.query(
-            User.given_name,
-            User.surname,
-            Caregiver.hourly_rate,
-            func.avg(Appointment.work_hours).label('avg_hours')
-        ).join(
-            Caregiver, Caregiver.caregiver_user_id == User.user_id
-        ).join(
-            Appointment, Appointment.caregiver_user_id == Caregiver.caregiver_user_id
-        ).filter(
-            Appointment.status == 'accepted'
-        ).group_by(
-            User.given_name, User.surname, Caregiver.hourly_rate
-        ).all()
-        
-        for result in results:
+        for result in stream_query(db, complex_6_3_query(db)):
             avg_pay = float(result.hourly_rate) * float(result.avg_hours or 0)
             print(f"Caregiver: {result.given_name} {result.surname}")
             print(f"  Hourly Rate: ${result.hourly_rate}")
@@ -339,44 +599,28 @@ def complex_6_3():
     finally:
         db.close()
 
+def complex_6_4_query(db):
+    # Every row also carries the overall totals the threshold is computed from
+    return top_earners_query(db)
+
+def complex_6_4_data(db):
+    """Overall average earnings per appointment and the caregivers above it; returns (avg, rows)"""
+    # Threshold and caregivers come from the same statement (see top_earners_query)
+    threshold, results = top_earners(db)
+    return float(threshold or 0), results
+
 def complex_6_4():
     """6.4 Caregivers who earn above average based on accepted appointments"""
     print_section("6.4 Caregivers earning above average")
     
     db = SessionLocal()
     try:
-        # First, calculate overall average earnings
-        avg_earnings_result = db.query(
-            func.avg(Caregiver.hourly_rate * Appointment.work_hours).label('avg_earnings')
-        ).join(
-            Appointment, Appointment.caregiver_user_id == Caregiver.caregiver_user_id
-        ).filter(
-            Appointment.status == 'accepted'
-        ).first()
-        
-        overall_avg = float(avg_earnings_result.avg_earnings or 0)
-        print(f"Overall average earnings per appointment: ${overall_avg:.2f}\n")
-        
-        # Now find caregivers earning above average
-        results = db.query(
-            User.given_name,
-            User.surname,
-            Caregiver.hourly_rate,
-            func.sum(Caregiver.hourly_rate * Appointment.work_hours).label('total_earnings'),
-            func.count(Appointment.appointment_id).label('appointment_count')
-        ).join(
-            Caregiver, Caregiver.caregiver_user_id == User.user_id
-        ).join(
-            Appointment, Appointment.caregiver_user_id == Caregiver.caregiver_user_id
-        ).filter(
-            Appointment.status == 'accepted'
-        ).group_by(
-            User.given_name, User.surname, Caregiver.hourly_rate, Caregiver.caregiver_user_id
-        ).having(
-            func.avg(Caregiver.hourly_rate * Appointment.work_hours) > overall_avg
-        ).all()
-        
-        for result in results:
+        for i, result in enumerate(stream_query(db, complex_6_4_query(db))):
+            if i == 0:
+                overall_avg = float(earnings_threshold(result) or 0)
+                print(f"Overall average earnings per appointment: ${overall_avg:.2f}\n")
+            if result.caregiver_user_id is None:
+                continue
             avg_per_appointment = float(result.total_earnings) / float(result.appointment_count)
             print(f"Caregiver: {result.given_name} {result.surname}")
             print(f"  Hourly Rate: ${result.hourly_rate}")
@@ -392,31 +636,36 @@ def complex_6_4():
 # 7. QUERY WITH DERIVED ATTRIBUTE
 # =============================================================================
 
+def derived_7_query(db):
+    return db.query(
+        User.given_name,
+        User.surname,
+        Caregiver.hourly_rate,
+        Caregiver.caregiving_type,
+        CaregiverEarnings.total_hours,
+        CaregiverEarnings.total_earnings.label('total_cost')
+    ).join(
+        Caregiver, Caregiver.caregiver_user_id == User.user_id
+    ).join(
+        CaregiverEarnings, CaregiverEarnings.caregiver_user_id == Caregiver.caregiver_user_id
+    ).filter(
+        CaregiverEarnings.accepted_appointments > 0
+    ).order_by(
+        User.given_name, User.surname
+    )
+
+def derived_7_data(db):
+    """Total accepted hours and cost per caregiver (from the caregiver_earnings summary)"""
+    return derived_7_query(db).all()
+
 def derived_7():
     """7. Calculate the total cost to pay for a caregiver for all accepted appointments"""
     print_section("7. Total cost for each caregiver (accepted appointments)")
     
     db = SessionLocal()
     try:
-        results = db.query(
-            User.given_name,
-            User.surname,
-            Caregiver.hourly_rate,
-            Caregiver.caregiving_type,
-            func.sum(Appointment.work_hours).label('total_hours'),
-            func.sum(Caregiver.hourly_rate * Appointment.work_hours).label('total_cost')
-        ).join(
-            Caregiver, Caregiver.caregiver_user_id == User.user_id
-        ).join(
-            Appointment, Appointment.caregiver_user_id == Caregiver.caregiver_user_id
-        ).filter(
-            Appointment.status == 'accepted'
-        ).group_by(
-            User.given_name, User.surname, Caregiver.hourly_rate, Caregiver.caregiving_type
-        ).all()
-        
         grand_total = 0
-        for result in results:
+        for result in stream_query(db, derived_7_query(db)):
             print(f"Caregiver: {result.given_name} {result.surname}")
             print(f"  Type: {result.caregiving_type}")
             print(f"  Hourly Rate: ${result.hourly_rate}")
@@ -434,57 +683,123 @@ def derived_7():
 # 8. VIEW OPERATION
 # =============================================================================
 
+def view_8_query(db):
+    return application_details_query(db)
+
+def view_8_data(db):
+    """Every job application with job, member and applicant details"""
+    return application_details(db)
+
 def view_8():
     """8. View all job applications and the applicants"""
     print_section("8. Job Applications View")
     
     db = SessionLocal()
     try:
-        # Create a view-like query
-        results = db.query(
-            JobApplication.caregiver_user_id,
-            JobApplication.job_id,
-            JobApplication.date_applied,
-            Job.required_caregiving_type,
-            Job.other_requirements,
-            User.given_name.label('member_name'),
-            User.surname.label('member_surname')
-        ).join(
-            Job, Job.job_id == JobApplication.job_id
-        ).join(
-            Member, Member.member_user_id == Job.member_user_id
-        ).join(
-            User, User.user_id == Member.member_user_id
-        ).all()
-        
-        for result in results:
-            # Get caregiver info
-            application = db.query(JobApplication).filter(
-                JobApplication.caregiver_user_id == result.caregiver_user_id,
-                JobApplication.job_id == result.job_id
-            ).first()
-            
-            caregiver_user = db.query(User).filter(
-                User.user_id == application.caregiver_user_id
-            ).first()
-            
-            print(f"Application: Caregiver {result.caregiver_user_id} -> Job {result.job_id}")
-            print(f"  Job Type: {result.required_caregiving_type}")
-            print(f"  Posted by: {result.member_name} {result.member_surname}")
-            print(f"  Applicant: {caregiver_user.given_name} {caregiver_user.surname}")
-            print(f"  Date Applied: {result.date_applied}")
-            print(f"  Requirements: {result.other_requirements}")
+        count = 0
+        for row in stream_query(db, view_8_query(db)):
+            print(f"Application: Caregiver {row.caregiver_user_id} -> Job {row.job_id}")
+            print(f"  Job Type: {row.required_caregiving_type}")
+            print(f"  Posted by: {row.member_given_name} {row.member_surname}")
+            print(f"  Applicant: {row.caregiver_given_name} {row.caregiver_surname}")
+            print(f"  Date Applied: {row.date_applied}")
+            print(f"  Requirements: {row.other_requirements}")
             print()
+            count += 1
         
-        print(f"Total applications: {len(results)}")
+        print(f"Total applications: {count}")
         
     finally:
         db.close()
 
+# =============================================================================
+# STREAMING OUTPUT (batch jobs)
+# =============================================================================
+
+# Read-only reports: name -> (query builder, text report)
+STREAMING_REPORTS = {
+    'simple_5_1': (simple_5_1_query, simple_5_1),
+    'simple_5_2': (simple_5_2_query, simple_5_2),
+    'simple_5_3': (simple_5_3_query, simple_5_3),
+    'simple_5_4': (simple_5_4_query, simple_5_4),
+    'complex_6_1': (complex_6_1_query, complex_6_1),
+    'complex_6_2': (complex_6_2_query, complex_6_2),
+    'complex_6_3': (complex_6_3_query, complex_6_3),
+    'complex_6_4': (complex_6_4_query, complex_6_4),
+    'derived_7': (derived_7_query, derived_7),
+    'view_8': (view_8_query, view_8),
+}
+
+REPORT_FORMATS = ('text', 'csv', 'json')
+
+def write_report(name, fmt, out):
+    """Stream one read-only report to the file object `out` as text, CSV or a JSON array"""
+    build, text_report = STREAMING_REPORTS[name]
+    if fmt == 'text':
+        with redirect_stdout(out):
+            text_report()
+        return
+    db = SessionLocal()
+    try:
+        result = stream_query(db, build(db))
+        for chunk in csv_chunks(result) if fmt == 'csv' else json_chunks(result):
+            out.write(chunk)
+    finally:
+        db.close()
+
+def stream_reports(names, fmt='text', output=None):
+    """Write the read-only reports `names` to the file `output` (stdout when None)
+
+    JSON output is one object keyed by report name. CSV gets a file per
+    report, so with several reports `output` must be a directory; each
+    report is written to <output>/<name>.csv.
+    """
+    if fmt == 'csv' and len(names) > 1:
+        if output is None:
+            raise ValueError("CSV output of several reports needs --output DIRECTORY")
+        os.makedirs(output, exist_ok=True)
+        for name in names:
+            with open(os.path.join(output, f"{name}.csv"), 'w', newline='') as out:
+                write_report(name, fmt, out)
+        return
+
+    out = sys.stdout if output is None else open(output, 'w', newline='')
+    try:
+        if fmt == 'json':
+            out.write('{')
+            for i, name in enumerate(names):
+                out.write(f'{", " if i else ""}"{name}": ')
+                write_report(name, fmt, out)
+            out.write('}\n')
+        else:
+            for name in names:
+                write_report(name, fmt, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
 # =============================================================================
 # MAIN EXECUTION
 # =============================================================================
 
+# Data step of every report, in execution order (see benchmarks/reports.py)
+REPORTS = [
+    ('update_3_1', update_3_1_data),
+    ('update_3_2', update_3_2_data),
+    ('delete_4_1', delete_4_1_data),
+    ('delete_4_2', delete_4_2_data),
+    ('simple_5_1', simple_5_1_data),
+    ('simple_5_2', simple_5_2_data),
+    ('simple_5_3', simple_5_3_data),
+    ('simple_5_4', simple_5_4_data),
+    ('complex_6_1', complex_6_1_data),
+    ('complex_6_2', complex_6_2_data),
+    ('complex_6_3', complex_6_3_data),
+    ('complex_6_4', complex_6_4_data),
+    ('derived_7', derived_7_data),
+    ('view_8', view_8_data),
+]
+
 def run_all_queries():
     """Run all queries in sequence"""
     print("\n" + "#"*80)
@@ -523,5 +838,24 @@ def run_all_queries():
     print("#" + " "*25 + "ALL QUERIES COMPLETED" + " "*32 + "#")
     print("#"*80 + "\n")
 
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run the Part 2 queries. Without options every report runs, including the "
+                    "updates and deletes; --format, --output or --report stream only the read-only "
+                    "reports (5.1 to 8)."
+    )
+    parser.add_argument("--format", choices=REPORT_FORMATS, help="output format (default text)")
+    parser.add_argument("--output", help="file to write, or a directory for CSV with several reports (default stdout)")
+    parser.add_argument("--report", action="append", choices=list(STREAMING_REPORTS),
+                        help="report to stream; repeat for several (default: all read-only reports)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    run_all_queries()
+    args = parse_args()
+    if args.format or args.output or args.report:
+        try:
+            stream_reports(args.report or list(STREAMING_REPORTS), args.format or 'text', args.output)
+        except ValueError as e:
+            sys.exit(str(e))
+    else:
+        run_all_queries()
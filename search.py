@@ -0,0 +1,182 @@
+"""
+Full-text search over job requirements, user profiles and member house rules
+/ dependent descriptions.
+
+PostgreSQL matches the to_tsvector() documents declared in models.py, which
+have GIN expression indexes, and ranks them with ts_rank. The indexes always
+reflect the current rows, so nothing has to be refreshed.
+
+SQLite keeps a search_index FTS5 table with one row per document and ranks
+with bm25(). Triggers on jobs, users and members keep it up to date on every
+write, including bulk Core inserts. The table is created with the schema (or
+by ensure_search_index() on an existing database).
+
+Other databases, or SQLite builds without FTS5, fall back to unindexed LIKE
+matching.
+"""
+
+import re
+from typing import NamedTuple
+from sqlalchemy import and_, event, func, literal, literal_column, select, text, union_all
+from database import Base
+from models import User, Member, Job, JOB_SEARCH_DOCUMENT, USER_SEARCH_DOCUMENT, MEMBER_SEARCH_DOCUMENT
+
+SEARCH_KINDS = ('job', 'user', 'member')
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+
+class SearchResult(NamedTuple):
+    kind: str
+    ref: int
+    text: str
+    rank: float
+
+
+def search_terms(query):
+    """Words of a free-text query, lower-cased (punctuation is dropped)"""
+    return re.findall(r'\w+', query.lower())
+
+
+# ==================== SQLITE FTS5 ====================
+
+# rowid = ref * 3 + kind code, so a document is replaced or deleted by rowid
+SQLITE_DOCUMENTS = {
+    'job': (0, 'jobs', 'job_id', "coalesce({row}.other_requirements, '')", 'other_requirements'),
+    'user': (1, 'users', 'user_id', "coalesce({row}.profile_description, '')", 'profile_description'),
+    'member': (2, 'members', 'member_user_id',
+               "coalesce({row}.house_rules, '') || ' ' || coalesce({row}.dependent_description, '')",
+               'house_rules, dependent_description'),
+}
+
+
+def _sqlite_ddl():
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index "
+        "USING fts5(kind UNINDEXED, ref UNINDEXED, body, tokenize = 'porter unicode61')"
+    ]
+    for kind, (code, table, key, body, columns) in SQLITE_DOCUMENTS.items():
+        insert = (f"INSERT INTO search_index (rowid, kind, ref, body) "
+                  f"VALUES (new.{key} * 3 + {code}, '{kind}', new.{key}, {body.format(row='new')})")
+        delete = f"DELETE FROM search_index WHERE rowid = old.{key} * 3 + {code}"
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN {insert}; END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {key}, {columns} ON {table} "
+            f"BEGIN {delete}; {insert}; END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN {delete}; END",
+        ]
+    return statements
+
+
+def sqlite_has_fts5(connection):
+    options = {row[0] for row in connection.exec_driver_sql('PRAGMA compile_options')}
+    return 'ENABLE_FTS5' in options
+
+
+def _sqlite_search_index_exists(connection):
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+    ).first() is not None
+
+
+def rebuild_search_index(connection):
+    """Refill search_index from jobs, users and members (SQLite)"""
+    connection.exec_driver_sql("DELETE FROM search_index")
+    for kind, (code, table, key, body, _) in SQLITE_DOCUMENTS.items():
+        connection.exec_driver_sql(
+            f"INSERT INTO search_index (rowid, kind, ref, body) "
+            f"SELECT {key} * 3 + {code}, '{kind}', {key}, {body.format(row=table)} FROM {table}"
+        )
+
+
+def ensure_search_index(connection, rebuild=True):
+    """Create the SQLite FTS5 table and triggers if missing; returns True when available"""
+    if connection.dialect.name != 'sqlite' or not sqlite_has_fts5(connection):
+        return False
+    for statement in _sqlite_ddl():
+        connection.exec_driver_sql(statement)
+    if rebuild:
+        rebuild_search_index(connection)
+    return True
+
+
+@event.listens_for(Base.metadata, 'after_create')
+def _create_search_index(metadata, connection, **kw):
+    ensure_search_index(connection, rebuild=False)
+
+
+@event.listens_for(Base.metadata, 'before_drop')
+def _drop_search_index(metadata, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql("DROP TABLE IF EXISTS search_index")
+
+
+def _sqlite_search(db, terms, kinds, limit):
+    # Quote every word so FTS5 never parses user input as query syntax
+    match = ' '.join(f'"{term}"' for term in terms)
+    kind_filter = ' AND kind IN (%s)' % ', '.join(f"'{kind}'" for kind in kinds)
+    rows = db.execute(text(
+        "SELECT kind, ref, body, bm25(search_index) AS rank FROM search_index "
+        "WHERE search_index MATCH :match" + kind_filter + " ORDER BY rank LIMIT :limit"
+    ), {'match': match, 'limit': limit})
+    # bm25() is lower for better matches; negate it so higher is better everywhere
+    return [SearchResult(kind, ref, body, -rank) for kind, ref, body, rank in rows]
+
+
+# ==================== POSTGRESQL / FALLBACK ====================
+
+def _documents():
+    """(kind, id column, text expression, indexed tsvector SQL) for each searchable table"""
+    return [
+        ('job', Job.job_id, Job.other_requirements, JOB_SEARCH_DOCUMENT),
+        ('user', User.user_id, User.profile_description, USER_SEARCH_DOCUMENT),
+        ('member', Member.member_user_id,
+         func.coalesce(Member.house_rules, '') + ' ' + func.coalesce(Member.dependent_description, ''),
+         MEMBER_SEARCH_DOCUMENT),
+    ]
+
+
+def _postgresql_search(db, terms, kinds, limit):
+    query = func.plainto_tsquery(literal_column("'english'"), ' '.join(terms))
+    selects = []
+    for kind, key, body, document in _documents():
+        if kind not in kinds:
+            continue
+        vector = literal_column(document)
+        selects.append(
+            select(literal(kind).label('kind'), key.label('ref'), body.label('body'),
+                   func.ts_rank(vector, query).label('rank'))
+            .where(vector.op('@@')(query))
+        )
+    ranked = union_all(*selects).subquery()
+    rows = db.execute(select(ranked).order_by(ranked.c.rank.desc(), ranked.c.kind, ranked.c.ref).limit(limit))
+    return [SearchResult(row.kind, row.ref, row.body, float(row.rank)) for row in rows]
+
+
+def _like_search(db, terms, kinds, limit):
+    selects = []
+    for kind, key, body, _ in _documents():
+        if kind not in kinds:
+            continue
+        # No relevance score without an index; every match ranks the same
+        selects.append(
+            select(literal(kind).label('kind'), key.label('ref'), body.label('body'), literal(0.0).label('rank'))
+            .where(and_(*(func.lower(body).contains(term, autoescape=True) for term in terms)))
+        )
+    ranked = union_all(*selects).subquery()
+    rows = db.execute(select(ranked).order_by(ranked.c.kind, ranked.c.ref).limit(limit))
+    return [SearchResult(row.kind, row.ref, row.body, float(row.rank)) for row in rows]
+
+
+def search(db, query, kinds=SEARCH_KINDS, limit=DEFAULT_SEARCH_LIMIT):
+    """Documents matching every word of `query`, best first, as SearchResult rows"""
+    terms = search_terms(query)
+    kinds = [kind for kind in kinds if kind in SEARCH_KINDS]
+    if not terms or not kinds:
+        return []
+    connection = db.connection()
+    if connection.dialect.name == 'postgresql':
+        return _postgresql_search(db, terms, kinds, limit)
+    if connection.dialect.name == 'sqlite' and _sqlite_search_index_exists(connection):
+        return _sqlite_search(db, terms, kinds, limit)
+    return _like_search(db, terms, kinds, limit)
@@ -0,0 +1,117 @@
+"""
+Dashboard statistics cache.
+The row counts shown on the home page are computed in one statement and kept
+for STATS_CACHE_TTL seconds. Inserting or deleting a counted model through
+the ORM invalidates the cache when the session commits. With
+STATS_USE_ESTIMATES on PostgreSQL, tables the planner believes hold at least
+STATS_ESTIMATE_MIN_ROWS rows are reported from pg_class.reltuples instead of
+being counted, so the dashboard costs the same however large they grow.
+"""
+
+import threading
+import time
+from sqlalchemy import bindparam, event, func, select, text
+from sqlalchemy.orm import Session, object_session
+from database import env_bool, env_int
+from models import Caregiver, Member, Job, Appointment
+
+STATS_CACHE_TTL = env_int('STATS_CACHE_TTL', 60)                    # seconds, 0 disables caching
+STATS_USE_ESTIMATES = env_bool('STATS_USE_ESTIMATES')
+STATS_ESTIMATE_MIN_ROWS = env_int('STATS_ESTIMATE_MIN_ROWS', 1000000)
+
+# Dashboard key -> counted model
+STATS_MODELS = {
+    'caregivers': Caregiver,
+    'members': Member,
+    'jobs': Job,
+    'appointments': Appointment,
+}
+
+PLANNER_ESTIMATES = text(
+    "SELECT relname, reltuples FROM pg_class "
+    "WHERE relname IN :tables AND relkind IN ('r', 'p') AND pg_table_is_visible(oid)"
+).bindparams(bindparam('tables', expanding=True))
+
+
+def planner_estimates(db, min_rows=STATS_ESTIMATE_MIN_ROWS):
+    """{key: estimated rows} for PostgreSQL tables with at least min_rows, from pg_class"""
+    if db.get_bind().dialect.name != 'postgresql':
+        return {}
+    keys = {model.__tablename__: key for key, model in STATS_MODELS.items()}
+    rows = db.execute(PLANNER_ESTIMATES, {'tables': list(keys)})
+    # reltuples is -1 (or 0) until the table has been vacuumed or analyzed
+    return {keys[name]: int(reltuples) for name, reltuples in rows if reltuples >= max(min_rows, 1)}
+
+
+def count_stats(db, use_estimates=STATS_USE_ESTIMATES):
+    """Row counts for the dashboard: estimates where allowed, the rest counted in one SELECT
+
+    Returns (stats, estimated) where estimated is the set of approximate keys.
+    """
+    stats = planner_estimates(db) if use_estimates else {}
+    estimated = set(stats)
+    counted = [key for key in STATS_MODELS if key not in stats]
+    if counted:
+        row = db.execute(select(*(
+            select(func.count()).select_from(STATS_MODELS[key]).scalar_subquery().label(key)
+            for key in counted
+        ))).one()
+        stats.update(row._mapping)
+    return stats, estimated
+
+
+class StatsCache:
+    """Thread-safe TTL cache around count_stats()"""
+
+    def __init__(self, ttl=STATS_CACHE_TTL, use_estimates=STATS_USE_ESTIMATES):
+        self.ttl = ttl
+        self.use_estimates = use_estimates
+        self._lock = threading.Lock()
+        self._value = None
+        self._expires_at = 0.0
+        self._generation = 0
+
+    def get(self, db):
+        """Cached (stats, estimated), recomputed when expired or invalidated"""
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires_at:
+                return self._value
+            generation = self._generation
+        value = count_stats(db, self.use_estimates)
+        with self._lock:
+            # Don't keep counts that an invalidation overtook while they ran
+            if generation == self._generation:
+                self._value = value
+                self._expires_at = time.monotonic() + self.ttl
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._generation += 1
+
+
+dashboard_stats = StatsCache()
+
+
+def _flag_session(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info['stats_changed'] = True
+
+
+for _model in STATS_MODELS.values():
+    event.listen(_model, 'after_insert', _flag_session)
+    event.listen(_model, 'after_delete', _flag_session)
+
+
+# Invalidate only once the change is visible to other sessions
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    if session.info.pop('stats_changed', False):
+        dashboard_stats.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('stats_changed', None)
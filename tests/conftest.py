@@ -0,0 +1,86 @@
+"""
+Shared fixtures. The tests always run against their own database,
+TEST_DATABASE_URL or a SQLite file in a temporary directory, never against
+DATABASE_URL: its tables are dropped and rebuilt.
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager, redirect_stdout
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['DATABASE_URL'] = (os.getenv('TEST_DATABASE_URL')
+                              or 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='caregivers-test-'), 'test.db'))
+os.environ.setdefault('SEED_PASSWORD_METHOD', 'pbkdf2:sha256:1000')   # sample passwords are throwaway
+os.environ['ADMIN_TOKEN'] = 'test-admin-token'
+
+from app import app as flask_app
+from cache import entity_cache
+from database import SessionLocal
+from nplusone import NPLUSONE_THRESHOLD, NPlusOneError, assert_no_n_plus_one
+from stats import dashboard_stats
+import init_db
+
+
+def _reset_caches():
+    entity_cache.clear()
+    dashboard_stats.invalidate()
+
+
+def _rebuild(load):
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        init_db.drop_all_tables()
+        init_db.create_all_tables()
+        load()
+    _reset_caches()
+
+
+@pytest.fixture
+def sample_data():
+    """The sample dataset of init_db.py, rebuilt for every test"""
+    _rebuild(init_db.insert_sample_data)
+    yield
+    _reset_caches()
+
+
+@pytest.fixture
+def synthetic_data():
+    """Rebuild the database with a generated dataset: synthetic_data(users=...)"""
+    def build(users, seed=42):
+        _rebuild(lambda: init_db.generate_synthetic_data(users=users, seed=seed))
+    yield build
+    _reset_caches()
+
+
+@pytest.fixture
+def db():
+    """A session on the test database, rolled back and closed afterwards"""
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+@pytest.fixture
+def client():
+    return flask_app.test_client()
+
+
+@pytest.fixture
+def no_n_plus_one():
+    """assert_no_n_plus_one() that fails the test with the detector's report
+
+    with no_n_plus_one('label') as log: ...
+    """
+    @contextmanager
+    def check(label, threshold=NPLUSONE_THRESHOLD):
+        try:
+            with assert_no_n_plus_one(label, threshold) as log:
+                yield log
+        except NPlusOneError as e:
+            pytest.fail(str(e), pytrace=False)
+    return check
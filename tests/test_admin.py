@@ -0,0 +1,58 @@
+"""
+The exports and admin endpoints fail closed: they need X-Admin-Token to
+match ADMIN_TOKEN, and refuse everyone while no token is configured.
+"""
+
+import pytest
+
+from app import app
+
+EXPORT_URLS = ['/export/users?format=json', '/export/caregivers', '/export/appointments?format=csv']
+
+
+def status(client, url, token=None):
+    """Status of a GET, with the (possibly streamed) body read and closed"""
+    with client.get(url, headers={} if token is None else {'X-Admin-Token': token}) as response:
+        response.get_data()
+        return response.status_code
+
+
+@pytest.fixture
+def no_token(monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN')
+
+
+@pytest.mark.parametrize('url', EXPORT_URLS)
+def test_export_refused_without_a_configured_token(sample_data, client, no_token, url):
+    assert status(client, url) == 403
+    assert status(client, url, '') == 403
+
+
+@pytest.mark.parametrize('url', EXPORT_URLS)
+def test_export_needs_the_matching_token(sample_data, client, url):
+    assert status(client, url) == 403
+    assert status(client, url, 'wrong') == 403
+    assert status(client, url, 'test-admin-token') == 200
+
+
+def test_export_open_in_debug_mode_without_a_token(sample_data, client, no_token, monkeypatch):
+    monkeypatch.setattr(app, 'debug', True)
+    with client.get('/export/users?format=json') as response:
+        assert response.status_code == 200
+        assert response.get_json()
+
+
+ADMIN_URLS = ['/admin/pool', '/admin/cache', '/admin/slow-queries', '/metrics']
+
+
+@pytest.mark.parametrize('url', ADMIN_URLS)
+def test_admin_endpoints_refused_without_a_configured_token(client, no_token, url):
+    assert status(client, url) == 403
+    assert status(client, url, '') == 403
+
+
+@pytest.mark.parametrize('url', ADMIN_URLS)
+def test_admin_endpoints_need_the_matching_token(client, url):
+    assert status(client, url) == 403
+    assert status(client, url, 'wrong') == 403
+    assert status(client, url, 'test-admin-token') == 200
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+APPOINTMENT = {'caregiver_user_id': 1, 'member_user_id': 11, 'appointment_date': '2030-01-01',
+               'appointment_time': '10:00', 'work_hours': '2', 'status': 'accepted'}
+
+
+def post_json(client, url, body, method='post'):
+    # json.dumps writes NaN / Infinity literals, which the request parser accepts
+    return getattr(client, method)(url, data=json.dumps(body), content_type='application/json')
+
+
+def test_create_and_read_appointment(sample_data, client):
+    response = post_json(client, '/api/v1/appointments', APPOINTMENT)
+    assert response.status_code == 201
+    created = response.get_json()
+    assert client.get(f'/api/v1/appointments/{created["appointment_id"]}').get_json() == created
+
+
+@pytest.mark.parametrize('value', ['NaN', 'sNaN', 'Infinity', '-Infinity', float('nan'), float('inf')])
+def test_non_finite_numbers_are_rejected(sample_data, client, value):
+    response = post_json(client, '/api/v1/appointments', {**APPOINTMENT, 'work_hours': value})
+    assert response.status_code == 400
+    assert 'work_hours' in response.get_json()['error']
+
+    response = post_json(client, '/api/v1/caregivers/1', {'hourly_rate': value}, method='patch')
+    assert response.status_code == 400
+    assert 'hourly_rate' in response.get_json()['error']
@@ -0,0 +1,136 @@
+"""
+Appointment conflict checks: a booking occupies [start, start + work_hours),
+only pending and accepted appointments block, and the same checks gate the
+appointment create and edit pages.
+"""
+
+from datetime import date, time
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+
+from availability import (ScheduleConflict, appointment_window, conflicts, ensure_available, free_caregivers,
+                          is_available)
+from database import SessionLocal
+from models import Appointment
+
+DAY = date(2030, 1, 1)
+NEXT_DAY = date(2030, 1, 2)
+
+
+def book(db, caregiver_id=1, day=DAY, at=time(10), hours=2, status='accepted'):
+    appointment = Appointment(caregiver_user_id=caregiver_id, member_user_id=11, appointment_date=day,
+                              appointment_time=at, work_hours=Decimal(hours), status=status)
+    db.add(appointment)
+    db.flush()
+    return appointment
+
+
+def test_overlap_is_rejected(sample_data, db):
+    booked = book(db)
+    with pytest.raises(ScheduleConflict) as e:
+        ensure_available(db, 1, DAY, time(11), 2)
+    assert [row.appointment_id for row in e.value.conflicts] == [booked.appointment_id]
+    # A window inside the booking, and one around it
+    assert not is_available(db, 1, DAY, time(10, 30), 1)
+    assert not is_available(db, 1, DAY, time(9), 4)
+
+
+def test_back_to_back_is_allowed(sample_data, db):
+    book(db)
+    ensure_available(db, 1, DAY, time(12), 1)
+    ensure_available(db, 1, DAY, time(8), 2)
+    assert is_available(db, 2, DAY, time(10), 2)
+
+
+def test_windows_crossing_midnight(sample_data, db):
+    book(db, at=time(22), hours=4)
+    assert not is_available(db, 1, NEXT_DAY, time(1), 1)
+    assert is_available(db, 1, NEXT_DAY, time(2), 1)
+
+    early = book(db, day=date(2030, 2, 2), at=time(0, 30), hours=1)
+    assert [row.appointment_id for row in conflicts(db, 1, date(2030, 2, 1), time(23), 2)] == [early.appointment_id]
+    assert is_available(db, 1, date(2030, 2, 1), time(23), Decimal('1.5'))
+
+
+@pytest.mark.parametrize('status, blocks', [('accepted', True), ('pending', True), ('declined', False)])
+def test_only_pending_and_accepted_block(sample_data, db, status, blocks):
+    book(db, status=status)
+    assert is_available(db, 1, DAY, time(11), 1) is not blocks
+
+
+def test_an_edit_does_not_conflict_with_itself(sample_data, db):
+    booked = book(db)
+    ensure_available(db, 1, DAY, time(11), 2, exclude_appointment_id=booked.appointment_id)
+
+
+@pytest.mark.parametrize('work_hours', ['NaN', 'sNaN', 'Infinity', '-Infinity', 'abc', 0, -1, 25])
+def test_invalid_work_hours(sample_data, db, work_hours):
+    with pytest.raises(ValueError):
+        appointment_window(DAY, time(10), work_hours)
+    with pytest.raises(ValueError):
+        ensure_available(db, 1, DAY, time(10), work_hours)
+    with pytest.raises(ValueError):
+        free_caregivers(db, DAY, time(10), work_hours)
+
+
+def test_free_caregivers(sample_data, db):
+    # Babysitters by rate: 4 (11.00), 10 (12.00), 1 (12.50), 7 (13.00)
+    book(db, caregiver_id=4)
+    book(db, caregiver_id=1, status='pending')
+    book(db, caregiver_id=7, status='declined')
+    book(db, caregiver_id=10, at=time(12))
+
+    free = free_caregivers(db, DAY, time(10), 2, caregiving_type='Babysitter')
+    assert [row.caregiver_user_id for row in free] == [10, 7]
+    assert free[0].hourly_rate == Decimal('12.00') and free[0].caregiving_type == 'Babysitter'
+    assert [row.caregiver_user_id for row in free_caregivers(db, DAY, time(10), 2, 'Babysitter', limit=1)] == [10]
+    assert [row.caregiver_user_id for row in free_caregivers(db, DAY, time(10), 2, limit=3)] == [2, 3, 5]
+
+
+def appointment_form(day=DAY, at='11:00', hours='2', status='accepted'):
+    return {'caregiver_user_id': '1', 'member_user_id': '11', 'appointment_date': day.isoformat(),
+            'appointment_time': at, 'work_hours': hours, 'status': status}
+
+
+def count(caregiver_id=1):
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(Appointment)
+                         .where(Appointment.caregiver_user_id == caregiver_id))
+
+
+@pytest.fixture
+def booked(sample_data):
+    with SessionLocal() as db:
+        appointment = book(db)
+        db.commit()
+        return appointment.appointment_id
+
+
+@pytest.mark.parametrize('form, created', [
+    (appointment_form(), False),
+    (appointment_form(hours='NaN'), False),
+    (appointment_form(status='declined'), True),
+    (appointment_form(at='12:00'), True),
+])
+def test_create_page_checks_availability(booked, client, form, created):
+    before = count()
+    response = client.post('/appointments/create', data=form)
+    assert response.status_code == 302
+    assert count() == before + created
+
+
+def test_edit_page_checks_availability(booked, client):
+    with SessionLocal() as db:
+        other = book(db, at=time(14))
+        db.commit()
+        other_id = other.appointment_id
+
+    client.post(f'/appointments/{other_id}/edit', data=appointment_form(at='11:00'))
+    with SessionLocal() as db:
+        assert db.get(Appointment, other_id).appointment_time == time(14)
+
+    client.post(f'/appointments/{other_id}/edit', data=appointment_form(at='12:00'))
+    with SessionLocal() as db:
+        assert db.get(Appointment, other_id).appointment_time == time(12)
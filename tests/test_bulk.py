@@ -0,0 +1,92 @@
+from datetime import date, time
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+import bulk
+from bulk import create_appointments, update_appointments
+from earnings import refresh_caregiver_earnings
+from models import Appointment, CaregiverEarnings, JobApplication
+
+
+def booking(caregiver_id=1, member_id=11, day='2030-01-01', at='10:00', hours=2, status='accepted'):
+    return {'caregiver_user_id': caregiver_id, 'member_user_id': member_id, 'appointment_date': day,
+            'appointment_time': at, 'work_hours': hours, 'status': status}
+
+
+def earnings(db):
+    return {row.caregiver_user_id: tuple(row[1:]) for row in db.execute(select(
+        CaregiverEarnings.caregiver_user_id, CaregiverEarnings.accepted_appointments,
+        CaregiverEarnings.total_hours, CaregiverEarnings.total_earnings))}
+
+
+def test_bulk_create_reports_bad_rows_and_writes_the_rest(sample_data, client, db):
+    before = db.scalar(select(func.count()).select_from(Appointment))
+    rows = [
+        booking(),
+        booking(hours='NaN'),                               # malformed
+        booking(hours='sNaN', status='declined'),           # malformed, even though it does not block
+        booking(at='11:00'),                                # overlaps row 1
+        booking(caregiver_id=99999),                        # unknown caregiver
+        booking(day='2030-01-02', hours=30),                # too long
+        booking(day='2030-01-02', status='declined'),
+    ]
+    response = client.post('/api/v1/appointments/bulk', json=rows)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [error['row'] for error in body['errors']] == [2, 3, 4, 5, 6]
+    assert 'appointment #' not in body['errors'][2]['error'] and 'row 1' in body['errors'][2]['error']
+    assert len(body['created']) == 2
+    assert db.scalar(select(func.count()).select_from(Appointment)) == before + 2
+
+    created = [db.get(Appointment, key['appointment_id']) for key in body['created']]
+    assert [(a.appointment_date, a.status) for a in created] == [
+        (date(2030, 1, 1), 'accepted'), (date(2030, 1, 2), 'declined')]
+
+
+def test_bulk_create_ids_follow_row_order(sample_data, db):
+    rows = [(number, {
+        'caregiver_user_id': 1 + number % 5, 'member_user_id': 11 + number % 5,
+        'appointment_date': date(2031, 1, 1 + number), 'appointment_time': time(8 + number % 10),
+        'work_hours': Decimal('1'), 'status': 'pending',
+    }) for number in range(1, 26)]
+    result = create_appointments(db, rows)
+
+    assert result.errors == []
+    for (number, fields), appointment_id in zip(rows, result.written):
+        appointment = db.get(Appointment, appointment_id)
+        assert (appointment.appointment_date, appointment.appointment_time) == (
+            fields['appointment_date'], fields['appointment_time'])
+
+
+def test_bulk_update_skips_bad_rows_and_keeps_earnings(sample_data, db):
+    first, second = db.scalars(select(Appointment).where(Appointment.status == 'accepted').limit(2))
+    accepted = earnings(db)[second.caregiver_user_id][0]
+    result = update_appointments(db, [
+        (1, {'appointment_id': first.appointment_id, 'work_hours': Decimal('NaN')}),
+        (2, {'appointment_id': second.appointment_id, 'status': 'declined'}),
+        (3, {'appointment_id': 424242, 'status': 'declined'}),
+    ])
+
+    assert result.written == [second.appointment_id]
+    assert [number for number, message in result.errors] == [1, 3]
+    summary = earnings(db)
+    assert summary[second.caregiver_user_id][0] == accepted - 1
+    refresh_caregiver_earnings(db)
+    assert summary == earnings(db)
+
+
+def test_bulk_create_of_a_row_taken_since_validation_is_a_conflict(sample_data, client, db, monkeypatch):
+    """Another request applies between the duplicate check and the INSERT: 409, and nothing is written"""
+    before = db.scalar(select(func.count()).select_from(JobApplication))
+    monkeypatch.setattr(bulk, '_application_keys', lambda db, keys: set())
+    response = client.post('/api/v1/applications/bulk', json=[
+        {'caregiver_user_id': 2, 'job_id': 1, 'date_applied': '2030-01-01'},
+        {'caregiver_user_id': 1, 'job_id': 1, 'date_applied': '2030-01-01'},     # already applied
+    ])
+
+    assert response.status_code == 409
+    assert 'error' in response.get_json()
+    db.expire_all()
+    assert db.scalar(select(func.count()).select_from(JobApplication)) == before
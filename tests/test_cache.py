@@ -0,0 +1,156 @@
+"""
+Randomized check of entity cache invalidation: edits and deletes through the
+ORM, bulk purges and the commission run, some rolled back, interleaved with
+cached lookups. After every step each key looked up so far must match a
+fresh read of the database.
+"""
+
+import random
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import inspect, select, update
+
+from cache import EntityCache, FakeSharedClient, LocalBackend, SharedBackend, entity_cache, get_entity
+from database import SessionLocal
+from models import User, Caregiver, Member, Job
+from pricing import apply_commission
+from purge import purge_job_ids, purge_member_ids
+
+MODELS = (User, Caregiver, Member, Job)
+
+
+def columns(obj):
+    if obj is None:
+        return None
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(type(obj)).column_attrs}
+
+
+def fresh(model, pk):
+    with SessionLocal() as db:
+        return columns(db.get(model, pk))
+
+
+def cached(model, pk):
+    with SessionLocal() as db:
+        return columns(get_entity(db, model, pk))
+
+
+def ids(db, model):
+    return list(db.scalars(select(inspect(model).primary_key[0]).order_by(inspect(model).primary_key[0])))
+
+
+def edit(db, rng):
+    model = rng.choice(MODELS)
+    pks = ids(db, model)
+    if not pks:
+        return
+    obj = db.get(model, rng.choice(pks))
+    if model is User:
+        obj.phone_number = f'555-{rng.randrange(10000):04d}'
+    elif model is Caregiver:
+        obj.hourly_rate = Decimal(rng.randrange(500, 5000)) / 100
+    elif model is Member:
+        obj.house_rules = f'rule {rng.random()}'
+    else:
+        obj.other_requirements = f'requirement {rng.random()}'
+
+
+def delete_job(db, rng):
+    pks = ids(db, Job)
+    if pks:
+        db.delete(db.get(Job, rng.choice(pks)))
+
+
+def delete_member_user(db, rng):
+    pks = ids(db, Member)
+    if pks:
+        db.delete(db.get(User, rng.choice(pks)))
+
+
+def purge_jobs(db, rng):
+    pks = ids(db, Job)
+    purge_job_ids(db, rng.sample(pks, min(len(pks), rng.randint(1, 3))))
+
+
+def purge_members(db, rng):
+    pks = ids(db, Member)
+    purge_member_ids(db, rng.sample(pks, min(len(pks), rng.randint(1, 2))), delete_users=rng.random() < 0.5)
+
+
+def commission(db, rng):
+    apply_commission(db)
+
+
+OPERATIONS = [edit, edit, edit, delete_job, delete_member_user, purge_jobs, purge_members, commission]
+
+
+@pytest.fixture(params=['local', 'shared'])
+def backend(request, monkeypatch):
+    """The entity cache on a backend whose entries never expire"""
+    backend = LocalBackend(ttl=0) if request.param == 'local' else SharedBackend(FakeSharedClient(), ttl=0)
+    monkeypatch.setattr(entity_cache, 'backend', backend)
+    return backend
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_cached_entities_match_the_database(sample_data, backend, seed):
+    rng = random.Random(seed)
+    with SessionLocal() as db:
+        seen = [(model, pk) for model in MODELS for pk in ids(db, model)]
+
+    for step in range(30):
+        for model, pk in rng.sample(seen, 10):
+            cached(model, pk)
+
+        operation = rng.choice(OPERATIONS)
+        with SessionLocal() as db:
+            operation(db, rng)
+            if rng.random() < 0.2:
+                db.rollback()
+            else:
+                db.commit()
+
+        for model, pk in seen:
+            assert cached(model, pk) == fresh(model, pk), f'step {step} ({operation.__name__}): {model.__name__} {pk}'
+
+
+@pytest.mark.parametrize('other_process', [False, True])
+def test_lookup_racing_an_invalidation_does_not_store_the_old_row(sample_data, monkeypatch, other_process):
+    """A miss reads the row, then another request commits a change before the store"""
+    client = FakeSharedClient()
+    monkeypatch.setattr(entity_cache, 'backend', SharedBackend(client, ttl=0) if other_process else LocalBackend(ttl=0))
+    # Another worker shares only the backend (and its client), not this process's EntityCache
+    other = EntityCache(SharedBackend(client, ttl=0)) if other_process else entity_cache
+
+    def commit_change_then_invalidate():
+        # A Core UPDATE, so that only `other` invalidates (the ORM events would use entity_cache)
+        with SessionLocal() as writer:
+            writer.execute(update(Caregiver).where(Caregiver.caregiver_user_id == 1).values(hourly_rate=Decimal('99.00')))
+            writer.commit()
+        other.invalidate(Caregiver, 1)
+
+    with SessionLocal() as db:
+        read = db.get
+        def racing_get(model, pk):
+            obj = read(model, pk)
+            commit_change_then_invalidate()
+            return obj
+        monkeypatch.setattr(db, 'get', racing_get)
+        entity_cache.get(db, Caregiver, 1)
+
+    assert cached(Caregiver, 1)['hourly_rate'] == Decimal('99.00')
+
+
+@pytest.mark.parametrize('backend', ['local', 'shared'], indirect=True)
+def test_password_hashes_are_not_cached(sample_data, backend):
+    with SessionLocal() as db:
+        password = db.get(User, 1).password
+    cached(User, 1)
+
+    stored = backend.get('users:1')
+    assert stored['email'] and 'password' not in stored
+    if isinstance(backend, SharedBackend):
+        assert password.encode() not in backend.client.get('entity:users:1')
+    with SessionLocal() as db:
+        assert get_entity(db, User, 1).password == password
@@ -0,0 +1,112 @@
+"""
+Randomized check of the incremental caregiver_earnings maintenance: appointments
+are created, edited, reassigned and deleted, and hourly rates changed, through
+the ORM, several changes per flush and some rolled back. After every step the
+summary must equal an aggregate computed from scratch.
+"""
+
+import random
+from collections import defaultdict
+from datetime import date, time
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from database import SessionLocal
+from models import Caregiver, Member, Appointment, CaregiverEarnings
+
+STATUSES = ['accepted', 'accepted', 'pending', 'declined']
+CENT = Decimal('0.01')
+
+
+def hours(rng):
+    return Decimal(rng.randrange(1, 33)) / 4
+
+
+def summary(db):
+    return {row.caregiver_user_id: (row.accepted_appointments, Decimal(row.total_hours).quantize(CENT),
+                                    Decimal(row.total_earnings).quantize(CENT))
+            for row in db.execute(select(CaregiverEarnings.caregiver_user_id, CaregiverEarnings.accepted_appointments,
+                                         CaregiverEarnings.total_hours, CaregiverEarnings.total_earnings))}
+
+
+def aggregate(db):
+    """The summary recomputed in Python from appointments and current rates"""
+    rates = {caregiver.caregiver_user_id: caregiver.hourly_rate for caregiver in db.scalars(select(Caregiver))}
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for caregiver_id, work_hours in db.execute(select(Appointment.caregiver_user_id, Appointment.work_hours)
+                                               .where(Appointment.status == 'accepted')):
+        totals[caregiver_id][0] += 1
+        totals[caregiver_id][1] += Decimal(str(work_hours))
+    return {caregiver_id: (totals[caregiver_id][0], totals[caregiver_id][1].quantize(CENT),
+                           (totals[caregiver_id][1] * Decimal(str(rate))).quantize(CENT))
+            for caregiver_id, rate in rates.items()}
+
+
+def create(db, rng):
+    db.add(Appointment(
+        caregiver_user_id=rng.choice(db.scalars(select(Caregiver.caregiver_user_id)).all()),
+        member_user_id=rng.choice(db.scalars(select(Member.member_user_id)).all()),
+        appointment_date=date(2030, rng.randint(1, 12), rng.randint(1, 28)),
+        appointment_time=time(rng.randint(6, 20)),
+        work_hours=hours(rng),
+        status=rng.choice(STATUSES),
+    ))
+
+
+def pick(db, rng):
+    ids = db.scalars(select(Appointment.appointment_id)).all()
+    return db.get(Appointment, rng.choice(ids)) if ids else None
+
+
+def edit(db, rng):
+    appointment = pick(db, rng)
+    if appointment is None:
+        return
+    if rng.random() < 0.5:
+        appointment.status = rng.choice(STATUSES)
+    if rng.random() < 0.5:
+        # The edit form assigns strings
+        appointment.work_hours = str(hours(rng))
+
+
+def reassign(db, rng):
+    appointment = pick(db, rng)
+    if appointment is not None:
+        appointment.caregiver_user_id = rng.choice(db.scalars(select(Caregiver.caregiver_user_id)).all())
+
+
+def delete(db, rng):
+    appointment = pick(db, rng)
+    if appointment is not None:
+        db.delete(appointment)
+
+
+def reprice(db, rng):
+    caregiver = db.get(Caregiver, rng.choice(db.scalars(select(Caregiver.caregiver_user_id)).all()))
+    caregiver.hourly_rate = Decimal(rng.randrange(800, 4000)) / 100
+
+
+OPERATIONS = [create, create, edit, edit, reassign, delete, reprice]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_summary_matches_a_fresh_aggregate(sample_data, seed):
+    rng = random.Random(seed)
+    for step in range(40):
+        names = []
+        with SessionLocal() as db:
+            for _ in range(rng.randint(1, 4)):
+                operation = rng.choice(OPERATIONS)
+                names.append(operation.__name__)
+                operation(db, rng)
+                if rng.random() < 0.5:
+                    db.flush()
+            if rng.random() < 0.2:
+                db.rollback()
+            else:
+                db.commit()
+
+        with SessionLocal() as db:
+            assert summary(db) == aggregate(db), f'step {step}: {", ".join(names)}'
@@ -0,0 +1,50 @@
+"""
+Every list view (HTML and /api/v1) must issue the same number of statements
+whatever the dataset size: a count that grows with the rows on the page is an
+N+1. The small dataset fills less than a page, the large one fills it.
+"""
+
+import pytest
+from flask import url_for
+from sqlalchemy import event
+
+from app import app
+from database import engine
+
+SMALL, LARGE = 20, 400
+
+LIST_VIEWS = sorted(endpoint for endpoint in app.view_functions if endpoint.endswith('_list'))
+
+
+def list_url(endpoint):
+    with app.test_request_context():
+        return url_for(endpoint)
+
+
+def count_statements(client, url):
+    count = 0
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        nonlocal count
+        count += 1
+
+    event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        response = client.get(url)
+        body = response.get_data()
+    finally:
+        event.remove(engine, 'before_cursor_execute', _count)
+    assert response.status_code == 200
+    return count, len(body)
+
+
+@pytest.mark.parametrize('endpoint', LIST_VIEWS)
+def test_statement_count_does_not_grow_with_the_data(synthetic_data, client, endpoint):
+    url = list_url(endpoint)
+    synthetic_data(users=SMALL)
+    small, small_size = count_statements(client, url)
+    synthetic_data(users=LARGE)
+    large, large_size = count_statements(client, url)
+
+    assert large_size > small_size, f'{url} shows as many rows for {LARGE} users as for {SMALL}'
+    assert small == large, f'{url}: {small} statements for {SMALL} users, {large} for {LARGE}'
@@ -0,0 +1,22 @@
+import pytest
+
+from matching import match_caregivers
+
+
+@pytest.mark.parametrize('argument', ['min_rate', 'max_rate'])
+@pytest.mark.parametrize('value', ['NaN', 'sNaN', 'Infinity', '-Infinity', 'abc'])
+def test_rate_must_be_a_finite_number(sample_data, client, argument, value):
+    assert client.get(f'/api/jobs/1/matches?{argument}={value}').status_code == 400
+
+
+@pytest.mark.parametrize('value', ['NaN', 'Infinity'])
+def test_hours_must_be_a_finite_number(sample_data, client, value):
+    assert client.get(f'/api/caregivers/1/availability?date=2030-01-01&time=10:00&hours={value}').status_code == 400
+
+
+def test_matches_within_the_rate_range(sample_data, client, db):
+    response = client.get('/api/jobs/1/matches?min_rate=10&max_rate=20')
+    assert response.status_code == 200
+    ids = [match['caregiver_user_id'] for match in response.get_json()['caregivers']]
+    assert ids == [match.caregiver_user_id for match in match_caregivers(db, 1, 10, 20, 20)]
+    assert client.get('/api/jobs/424242/matches').status_code == 404
@@ -0,0 +1,37 @@
+"""
+queries.search_members (one statement, EXISTS semi-join) must return the
+members the original report 5.4 loop found with one Job query per candidate.
+"""
+
+import pytest
+
+from benchmarks.member_search import search_members_per_row
+from database import SessionLocal
+from queries import search_members
+
+USERS = 300
+
+CRITERIA = [
+    ('Elderly Care', 'Astana', 'No pets.'),
+    ('Babysitter', 'Almaty', 'No smoking.'),
+    ('Playmate', 'Astana', 'pets'),
+    ('Babysitter', 'Astana', '100%'),                   # a LIKE wildcard, matched literally
+    ('Gardening', 'Astana', 'No pets.'),
+]
+
+
+def member_ids(rows):
+    return sorted(member.member_user_id for user, member in rows)
+
+
+@pytest.mark.parametrize('criteria', CRITERIA, ids=['-'.join(criteria) for criteria in CRITERIA])
+def test_same_members_as_the_per_row_loop_in_one_statement(synthetic_data, no_n_plus_one, criteria):
+    synthetic_data(users=USERS)
+    with SessionLocal() as db:
+        expected = member_ids(search_members_per_row(db, *criteria))
+    with SessionLocal() as db:
+        with no_n_plus_one('search_members') as log:
+            found = search_members(db, *criteria)
+        assert log.total == 1
+
+    assert member_ids(found) == expected               # a member with several matching jobs appears once
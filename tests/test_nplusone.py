@@ -0,0 +1,50 @@
+"""
+The N+1 check of python -m benchmarks.nplusone under pytest: every GET route
+and every queries.py report must run without repeating a statement
+NPLUSONE_THRESHOLD times, on a synthetic dataset large enough to fill a page.
+"""
+
+import os
+
+import pytest
+
+from benchmarks.nplusone import route_urls, sample_arguments
+from database import SessionLocal
+from queries import REPORTS
+
+USERS = 300
+
+
+class Placeholders(dict):
+    """Path arguments left as {name}, filled in once the dataset exists"""
+
+    def __missing__(self, name):
+        return '{' + name + '}'
+
+
+ROUTES = route_urls(Placeholders())
+
+
+@pytest.fixture
+def dataset(synthetic_data):
+    synthetic_data(users=USERS)
+
+
+@pytest.mark.parametrize('endpoint, url', ROUTES, ids=[url for endpoint, url in ROUTES])
+def test_route(dataset, client, no_n_plus_one, endpoint, url):
+    with SessionLocal() as db:
+        url = url.format(**sample_arguments(db))
+    with no_n_plus_one(url):
+        response = client.get(url, headers={'X-Admin-Token': os.environ['ADMIN_TOKEN']})
+        response.get_data()     # streamed bodies run their queries here
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('name, report', REPORTS, ids=[name for name, report in REPORTS])
+def test_report(dataset, no_n_plus_one, name, report):
+    with SessionLocal() as db:
+        try:
+            with no_n_plus_one(f'report {name}'):
+                report(db)
+        finally:
+            db.rollback()
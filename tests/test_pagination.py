@@ -0,0 +1,55 @@
+import base64
+import json
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor
+
+
+def token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+TAMPERED = [
+    'eyJrIjpbe31dLCJkIjoibmV4dCJ9',             # {"k":[{}],"d":"next"}
+    token({'k': [[1]], 'd': 'next'}),
+    token({'k': [True], 'd': 'next'}),
+    token({'k': [1.5], 'd': 'prev'}),
+    token({'k': ['1'], 'd': 'next'}),           # a string for an integer key
+    token({'k': [1, 2], 'd': 'next'}),          # more values than key columns
+    token({'k': [], 'd': 'next'}),
+    token({'k': 1, 'd': 'next'}),
+    token({'k': [1], 'd': 'sideways'}),
+    token([1]),
+    'not base64!',
+]
+
+
+@pytest.mark.parametrize('cursor', TAMPERED)
+def test_tampered_cursor_is_a_bad_request(sample_data, client, cursor):
+    assert client.get(f'/api/v1/users?cursor={cursor}').status_code == 400
+    assert client.get(f'/users?cursor={cursor}').status_code == 400
+
+
+def test_decode_cursor_round_trip():
+    assert decode_cursor(encode_cursor([3, 'Main St', None], 'prev')) == ([3, 'Main St', None], 'prev')
+    with pytest.raises(ValueError):
+        decode_cursor('eyJrIjpbe31dLCJkIjoibmV4dCJ9')
+
+
+@pytest.mark.parametrize('resource, key', [('users', ['user_id']),
+                                           ('addresses', ['member_user_id', 'house_number', 'street', 'town'])])
+def test_pages_cover_every_row_once(sample_data, client, resource, key):
+    everything = client.get(f'/api/v1/{resource}?limit=500').get_json()['items']
+    seen, cursor = [], None
+    while True:
+        page = client.get(f'/api/v1/{resource}?limit=3' + (f'&cursor={cursor}' if cursor else '')).get_json()
+        seen.extend(page['items'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert [[item[column] for column in key] for item in seen] == \
+           [[item[column] for column in key] for item in everything]
+
+    back = client.get(f'/api/v1/{resource}?limit=3&cursor={encode_cursor([everything[-1][c] for c in key], "prev")}')
+    assert back.get_json()['items'] == everything[-4:-1]
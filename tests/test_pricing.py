@@ -0,0 +1,87 @@
+"""
+The commission run: each tier's result at the cent boundaries, rounded half
+up to cents, and the dry-run figures against what the UPDATE writes.
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+import pytest
+from sqlalchemy import select, update
+
+from models import Caregiver
+from pricing import apply_commission, commission_changes, commission_preview
+
+CENT = Decimal('0.01')
+
+# (rate before, rate after): +0.30 below 10.00, +10% from 10.00, half cents rounded up
+BOUNDARIES = [
+    ('0.01', '0.31'),
+    ('9.69', '9.99'),
+    ('9.70', '10.00'),
+    ('9.99', '10.29'),
+    ('10.00', '11.00'),
+    ('10.01', '11.01'),
+    ('10.05', '11.06'),
+    ('10.15', '11.17'),
+    ('10.25', '11.28'),
+    ('99.95', '109.95'),
+]
+
+
+def set_rates(db, rates):
+    for caregiver_id, rate in enumerate(rates, 1):
+        db.execute(update(Caregiver).where(Caregiver.caregiver_user_id == caregiver_id)
+                   .values(hourly_rate=Decimal(rate)))
+
+
+def rates(db):
+    return {caregiver_id: Decimal(str(rate)).quantize(CENT) for caregiver_id, rate in
+            db.execute(select(Caregiver.caregiver_user_id, Caregiver.hourly_rate).execution_options(populate_existing=True))}
+
+
+def expected(rate):
+    if rate < Decimal('10.00'):
+        return rate + Decimal('0.30')
+    return (rate * Decimal('1.1')).quantize(CENT, ROUND_HALF_UP)
+
+
+def money(value):
+    return Decimal(str(value)).quantize(CENT)
+
+
+def test_tiers_at_the_cent_boundaries(sample_data, db):
+    set_rates(db, [before for before, after in BOUNDARIES])
+    before = rates(db)
+    assert apply_commission(db) == len(before)
+
+    after = rates(db)
+    for caregiver_id, (rate, new_rate) in enumerate(BOUNDARIES, 1):
+        assert after[caregiver_id] == Decimal(new_rate) == expected(Decimal(rate)), f'{rate} -> {after[caregiver_id]}'
+    assert after == {caregiver_id: expected(rate) for caregiver_id, rate in before.items()}
+
+
+@pytest.mark.parametrize('threshold, flat_fee, percentage', [
+    ('10.00', '0.30', '10'),
+    ('12.50', '1.00', '7.5'),
+    ('0', '0', '0'),
+])
+def test_dry_run_matches_what_is_written(sample_data, db, threshold, flat_fee, percentage):
+    terms = dict(threshold=Decimal(threshold), flat_fee=Decimal(flat_fee), percentage=Decimal(percentage))
+    set_rates(db, [before for before, after in BOUNDARIES])
+    before = rates(db)
+
+    preview = apply_commission(db, dry_run=True, **terms)
+    changes = commission_changes(db, **terms)
+    assert preview == commission_preview(db, **terms)
+    assert rates(db) == before
+
+    apply_commission(db, **terms)
+    after = rates(db)
+    assert {row.caregiver_user_id: money(row.new_rate) for row in changes} == after
+    assert {row.caregiver_user_id: money(row.hourly_rate) for row in changes} == before
+    assert preview['caregivers'] == len(after)
+    assert preview['tiers']['flat'] == sum(rate < terms['threshold'] for rate in before.values())
+    assert money(preview['after']['min']) == min(after.values())
+    assert money(preview['after']['max']) == max(after.values())
+    assert money(preview['after']['total']) == sum(after.values())
+    assert money(preview['before']['total']) == sum(before.values())